@@ -0,0 +1,512 @@
+"""
+Caching for the telex server.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+from tempfile import mkstemp
+from threading import Event
+from threading import Lock
+import time
+import weakref
+
+from pyramid.compat import bytes_
+from pyramid.compat import iteritems_
+from pyramid.threadlocal import get_current_registry
+import transaction
+
+from telex.interfaces import IResultCache
+from telex.utils import get_setting
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['CachedResult',
+           'CommandDefinitionCache',
+           'CommandDefinitionInfo',
+           'ResultCache',
+           'SingleFlight',
+           'get_result_cache',
+           'make_result_key',
+           ]
+
+
+class CommandDefinitionInfo(object):
+    """
+    Snapshot of the parameter definitions and parameter options of a
+    command definition.
+
+    Building the snapshot walks all parameter definitions and their
+    options once; after that, lookups do not touch the repository.
+    """
+    def __init__(self, command_definition):
+        #: ID of the command definition.
+        self.id = command_definition.id
+        self.__options = {}
+        self.__validators = {}
+        for prm_def in command_definition.parameter_definitions:
+            self.__options[prm_def.name] = dict(prm_def.options)
+            self.__validators[prm_def.name] = prm_def.validator
+        #: Names of all parameter definitions.
+        self.parameter_names = frozenset(self.__options.keys())
+        #: Names of all mandatory parameter definitions.
+        self.mandatory_parameter_names = \
+            frozenset([name for (name, opts) in self.__options.items()
+                       if opts.get('is_mandatory')])
+        #: Time at which the snapshot was taken.
+        self.timestamp = time.time()
+
+    def get_option(self, parameter_name, option_name, default_value=None):
+        """
+        Returns the value of the given option of the given parameter
+        definition.
+        """
+        return self.__options[parameter_name].get(option_name, default_value)
+
+    def get_default_value(self, parameter_name):
+        """
+        Returns the default value of the given parameter definition (`None`
+        if it does not have one).
+        """
+        return self.__validators[parameter_name].default_value
+
+    def validate(self, parameter_name, value):
+        """
+        Validates the given value for the given parameter definition and
+        returns it converted to its Python type.
+
+        :raises telex.validation.InvalidParameterValue: If the value is
+          invalid.
+        """
+        return self.__validators[parameter_name](value)
+
+
+class CommandDefinitionCache(object):
+    """
+    Process-wide read-through cache of :class:`CommandDefinitionInfo`
+    snapshots, keyed by application registry and command definition name
+    (so applications sharing the process do not see each other's
+    definitions).
+
+    Entries are invalidated by the views modifying or deleting command
+    definitions and parameter definitions (both immediately and once the
+    modifying transaction has been committed). Since other server
+    processes do not see these invalidations, entries also expire after
+    the number of seconds configured with the
+    "telex.cache.definitions.max_age" setting (if set).
+    """
+    #: Maps registry IDs to tuples holding a weak reference to the
+    #: registry and a map of definition names to snapshots.
+    __entries = {}
+    __hits = 0
+    __misses = 0
+    __lock = Lock()
+
+    @classmethod
+    def get(cls, command_definition):
+        """
+        Returns the snapshot for the given command definition, creating it
+        on a cache miss. Snapshots are only cached for persisted command
+        definitions.
+        """
+        cmd_def = command_definition
+        max_age = get_setting('telex.cache.definitions.max_age', None, int)
+        with cls.__lock:
+            entries = cls.__get_entries()
+            info = entries.get(cmd_def.name)
+            if not info is None \
+               and (info.id != cmd_def.id
+                    or (max_age and time.time() - info.timestamp > max_age)):
+                info = None
+            if info is None:
+                cls.__misses += 1
+            else:
+                cls.__hits += 1
+        if info is None:
+            info = CommandDefinitionInfo(cmd_def)
+            if not cmd_def.id is None:
+                with cls.__lock:
+                    entries[cmd_def.name] = info
+        return info
+
+    @classmethod
+    def invalidate(cls, name):
+        """
+        Removes the entry for the command definition with the given name,
+        now and again after the current transaction has been committed
+        (so a concurrent request can not leave a stale entry behind).
+        """
+        with cls.__lock:
+            entries = cls.__get_entries()
+
+        def remove(success): # unused arg pylint: disable=W0613
+            with cls.__lock:
+                entries.pop(name, None)
+        remove(True)
+        transaction.get().addAfterCommitHook(remove)
+
+    @classmethod
+    def clear(cls):
+        """
+        Removes all entries (for all registries) and resets the statistics.
+        """
+        with cls.__lock:
+            cls.__entries.clear()
+            cls.__hits = 0
+            cls.__misses = 0
+
+    @classmethod
+    def get_statistics(cls):
+        """
+        Returns a dictionary with the number of cache hits, cache misses and
+        cached entries (for the current registry).
+        """
+        with cls.__lock:
+            return dict(hits=cls.__hits,
+                        misses=cls.__misses,
+                        size=len(cls.__get_entries()))
+
+    @classmethod
+    def __get_entries(cls):
+        # Called with the lock held. Registry IDs may be reused once a
+        # registry has been garbage collected, so the entries of dead
+        # registries are dropped here.
+        reg = get_current_registry()
+        reg_entry = cls.__entries.get(id(reg))
+        if reg_entry is None or not reg_entry[0]() is reg:
+            for reg_id, (reg_ref, _) in list(cls.__entries.items()):
+                if reg_ref() is None:
+                    del cls.__entries[reg_id]
+            reg_entry = (weakref.ref(reg), {})
+            cls.__entries[id(reg)] = reg_entry
+        return reg_entry[1]
+
+
+class CachedResult(object):
+    """
+    Result of a shell command run held by a :class:`ResultCache`.
+    """
+    def __init__(self, exit_code, output, errors):
+        #: Exit code of the command.
+        self.exit_code = exit_code
+        #: Standard output bytes.
+        self.output = output
+        #: Standard error bytes.
+        self.errors = errors
+
+    @property
+    def size(self):
+        "Number of output and error bytes."
+        return len(self.output) + len(self.errors)
+
+    def to_bytes(self):
+        """
+        Serializes this result (a JSON header line followed by the output
+        and error bytes).
+        """
+        header = json.dumps(dict(exit_code=self.exit_code,
+                                 output_size=len(self.output)))
+        return bytes_(header) + b'\n' + self.output + self.errors
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Deserializes a result serialized with :meth:`to_bytes`.
+        """
+        pos = data.index(b'\n')
+        header = json.loads(data[:pos].decode('utf-8'))
+        output_end = pos + 1 + header['output_size']
+        return cls(header['exit_code'], data[pos + 1:output_end],
+                   data[output_end:])
+
+
+class ResultCache(object):
+    """
+    Size bounded least-recently-used cache of shell command results with
+    optional expiry.
+
+    Results are kept in memory or, if a directory is configured, in files
+    in that directory (which survive server restarts and can be shared by
+    the processes of one host); only an index of the entries is held in
+    memory then.
+    """
+    def __init__(self, max_size=64 * 1024 * 1024, max_age=None,
+                 directory=None):
+        """
+        :param int max_size: Maximum total number of output and error bytes
+          to cache. Results larger than this are not cached.
+        :param int max_age: Number of seconds after which entries expire;
+          `None` keeps entries until they are evicted.
+        :param str directory: Directory to store the results in; `None`
+          keeps them in memory.
+        """
+        self.max_size = max_size
+        self.max_age = max_age
+        self.__directory = directory
+        #: Maps keys to (timestamp, size, data) tuples in LRU order; data is
+        #: `None` for entries stored in the directory.
+        self.__index = OrderedDict()
+        self.__size = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__bytes_saved = 0
+        self.__lock = Lock()
+        if not directory is None:
+            self.__scan_directory()
+
+    def get(self, key):
+        """
+        Returns the cached result for the given key or `None` if there is
+        no (unexpired) entry for it.
+        """
+        with self.__lock:
+            entry = self.__index.get(key)
+            if not entry is None and self.__is_expired(entry):
+                self.__remove(key)
+                entry = None
+            if not entry is None:
+                # Move to the most recently used end.
+                del self.__index[key]
+                self.__index[key] = entry
+        result = None
+        if not entry is None:
+            data = entry[2]
+            if data is None:
+                try:
+                    with open(self.__get_path(key), 'rb') as result_file:
+                        data = result_file.read()
+                except (IOError, OSError):
+                    # Removed by another process.
+                    with self.__lock:
+                        self.__remove(key)
+            if not data is None:
+                result = CachedResult.from_bytes(data)
+        with self.__lock:
+            if result is None:
+                self.__misses += 1
+            else:
+                self.__hits += 1
+                self.__bytes_saved += result.size
+        return result
+
+    def put(self, key, result):
+        """
+        Caches the given :class:`CachedResult` under the given key, evicting
+        the least recently used entries as needed.
+        """
+        size = result.size
+        if size > self.max_size:
+            return
+        data = result.to_bytes()
+        if not self.__directory is None:
+            fd, tmp_path = mkstemp(dir=self.__directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as result_file:
+                result_file.write(data)
+            os.rename(tmp_path, self.__get_path(key))
+            data = None
+        with self.__lock:
+            if key in self.__index:
+                self.__size -= self.__index.pop(key)[1]
+            self.__index[key] = (time.time(), size, data)
+            self.__size += size
+            while self.__size > self.max_size:
+                self.__remove(next(iter(self.__index)))
+
+    def clear(self):
+        """
+        Removes all entries and resets the statistics.
+        """
+        with self.__lock:
+            for key in list(self.__index.keys()):
+                self.__remove(key)
+            self.__hits = 0
+            self.__misses = 0
+            self.__bytes_saved = 0
+
+    def get_statistics(self):
+        """
+        Returns a dictionary with the number of cache hits and misses, the
+        hit rate, the number of output bytes served from the cache instead
+        of running commands, and the number and total size of the cached
+        entries.
+        """
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+            return dict(hits=self.__hits,
+                        misses=self.__misses,
+                        hit_rate=float(self.__hits) / lookups
+                                 if lookups else 0.0,
+                        bytes_saved=self.__bytes_saved,
+                        size=len(self.__index),
+                        bytes=self.__size)
+
+    def __is_expired(self, entry):
+        return not self.max_age is None \
+               and time.time() - entry[0] > self.max_age
+
+    def __remove(self, key):
+        entry = self.__index.pop(key, None)
+        if not entry is None:
+            self.__size -= entry[1]
+            if entry[2] is None:
+                try:
+                    os.remove(self.__get_path(key))
+                except OSError:
+                    pass
+
+    def __get_path(self, key):
+        return os.path.join(self.__directory, '%s.result' % key)
+
+    def __scan_directory(self):
+        entries = []
+        for file_name in os.listdir(self.__directory):
+            if not file_name.endswith('.result'):
+                continue
+            path = os.path.join(self.__directory, file_name)
+            try:
+                stat = os.stat(path)
+                with open(path, 'rb') as result_file:
+                    size = CachedResult.from_bytes(result_file.read()).size
+            except (IOError, OSError, ValueError):
+                continue
+            entries.append((stat.st_mtime, file_name[:-len('.result')],
+                            size))
+        for timestamp, key, size in sorted(entries):
+            self.__index[key] = (timestamp, size, None)
+            self.__size += size
+
+
+class _Flight(object):
+    """
+    A call in flight in a :class:`SingleFlight` group.
+    """
+    def __init__(self):
+        self.done = Event()
+        self.value = None
+        self.has_failed = False
+        #: Events of the waiting threads (set when the call has finished).
+        self.waiters = []
+
+
+class SingleFlight(object):
+    """
+    Process-wide registry coalescing concurrent calls with the same key:
+    while a call is in flight, further calls with its key wait for it to
+    finish and share its return value instead of making the call again.
+
+    If the call raises an exception, it is re-raised in the calling thread
+    only; the waiting threads then make the call themselves. The same
+    happens if the return value can not be shared, the call does not
+    finish within the waiting timeout or the wait is interrupted.
+    """
+    __flights = {}
+    __coalesced = 0
+    __lock = Lock()
+
+    @classmethod
+    def run(cls, key, func, timeout=None, is_shareable=None, waiter=None):
+        """
+        Calls the given callable unless a call with the same key is already
+        in flight; in that case, waits for that call to finish.
+
+        :param float timeout: Maximum number of seconds to wait for the
+          call in flight; `None` waits until it has finished.
+        :param is_shareable: Optional callable checking if the return value
+          of the call in flight can be shared with the waiting threads.
+        :param waiter: Optional :class:`threading.Event` to wait on for the
+          call in flight. It is set when the call has finished; setting it
+          from elsewhere interrupts the wait.
+        :returns: Tuple holding the return value of the call and a flag
+          indicating if the call was made by this thread.
+        """
+        if waiter is None:
+            waiter = Event()
+        with cls.__lock:
+            flight = cls.__flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = _Flight()
+                cls.__flights[key] = flight
+            else:
+                flight.waiters.append(waiter)
+                cls.__coalesced += 1
+        if is_leader:
+            try:
+                flight.value = func()
+            except BaseException: # catch BaseException pylint: disable=W0703
+                # The error is re-raised in this thread only; the waiting
+                # threads make the call themselves.
+                flight.has_failed = True
+                raise
+            finally:
+                with cls.__lock:
+                    del cls.__flights[key]
+                flight.done.set()
+                for flight_waiter in flight.waiters:
+                    flight_waiter.set()
+            result = flight.value, True
+        elif waiter.wait(timeout) and flight.done.is_set() \
+             and not flight.has_failed \
+             and (is_shareable is None or is_shareable(flight.value)):
+            result = flight.value, False
+        else:
+            # The call is made without coalescing.
+            result = func(), True
+        return result
+
+    @classmethod
+    def get_statistics(cls):
+        """
+        Returns a dictionary with the number of calls in flight and the
+        number of calls which were coalesced with a call in flight.
+        """
+        with cls.__lock:
+            return dict(in_flight=len(cls.__flights),
+                        coalesced=cls.__coalesced)
+
+
+def make_result_key(execution_mode, args, cwd, environment):
+    """
+    Returns the result cache key for running the given shell command line.
+
+    The key is a hash of the execution mode, the command line (a string
+    for the shell execution mode, an argument list otherwise) as it is
+    passed to the process, the working directory and the environment. As
+    the command line is built from the parameter definitions, changing
+    how a parameter is passed (or its default value) changes the key.
+    """
+    if isinstance(environment, dict):
+        environment = sorted(iteritems_(environment))
+    data = json.dumps([execution_mode, args, cwd, environment],
+                      default=repr)
+    return hashlib.sha256(bytes_(data, 'utf-8')).hexdigest()
+
+
+_result_cache_lock = Lock()
+
+
+def get_result_cache():
+    """
+    Returns the result cache registered with the current registry,
+    creating it from the "telex.cache.results.*" application settings on
+    first use.
+    """
+    reg = get_current_registry()
+    result_cache = reg.queryUtility(IResultCache)
+    if result_cache is None:
+        with _result_cache_lock:
+            result_cache = reg.queryUtility(IResultCache)
+            if result_cache is None:
+                result_cache = ResultCache(
+                    max_size=get_setting('telex.cache.results.max_size',
+                                         64 * 1024 * 1024, int),
+                    max_age=get_setting('telex.cache.results.max_age',
+                                        None, int),
+                    directory=get_setting('telex.cache.results.directory'))
+                reg.registerUtility(result_cache, IResultCache)
+    return result_cache
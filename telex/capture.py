@@ -0,0 +1,461 @@
+"""
+Output capturing for the telex server.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import os
+from tempfile import mkstemp
+from threading import Condition
+from threading import Lock
+from threading import Thread
+import zlib
+
+from pyramid.compat import bytes_
+from pyramid.compat import native_
+
+from telex.utils import get_setting
+try:
+    import zstandard # pylint: disable=F0401
+except ImportError:
+    zstandard = None
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['CaptureRegistry',
+           'OutputCapture',
+           'OutputSpool',
+           'StoredOutput',
+           ]
+
+
+class OutputSpool(object):
+    """
+    Byte buffer for the output of a command.
+
+    Output is kept in memory until it exceeds the configured memory
+    threshold; after that, all output is spooled to a temporary file in
+    the configured spool directory and only a short head and tail are kept
+    in memory. The spool file is removed when the spool is garbage
+    collected.
+
+    Writing and reading may happen concurrently from different threads.
+    """
+    #: Default number of bytes to keep in memory.
+    DEFAULT_MEMORY_THRESHOLD = 1024 * 1024
+    #: Number of bytes to keep in memory for the head and for the tail of a
+    #: spooled output.
+    PREVIEW_SIZE = 4096
+    #: Encoding used to decode the output.
+    ENCODING = 'utf-8'
+
+    def __init__(self, memory_threshold=None, spool_directory=None):
+        if memory_threshold is None:
+            memory_threshold = self.DEFAULT_MEMORY_THRESHOLD
+        self.__memory_threshold = memory_threshold
+        self.__spool_directory = spool_directory
+        self.__chunks = []
+        self.__size = 0
+        self.__path = None
+        self.__file = None
+        self.__head = b''
+        self.__tail = b''
+        self.__is_closed = False
+        self.__cond = Condition()
+
+    @classmethod
+    def from_string(cls, value):
+        """
+        Creates a closed, in-memory spool holding the given string.
+        """
+        spool = cls(memory_threshold=-1)
+        data = bytes_(value, cls.ENCODING)
+        spool.__chunks.append(data)
+        spool.__size = len(data)
+        spool.__is_closed = True
+        return spool
+
+    def write(self, data):
+        """
+        Appends the given bytes to the spool.
+        """
+        with self.__cond:
+            if self.__file is None \
+               and self.__size + len(data) > self.__memory_threshold:
+                self.__spool()
+            if self.__file is None:
+                self.__chunks.append(data)
+            else:
+                self.__file.write(data)
+                self.__file.flush()
+                if len(self.__head) < self.PREVIEW_SIZE:
+                    self.__head = (self.__head + data)[:self.PREVIEW_SIZE]
+                self.__tail = (self.__tail + data)[-self.PREVIEW_SIZE:]
+            self.__size += len(data)
+            self.__cond.notify_all()
+
+    def close(self):
+        """
+        Signals that no more output will be written.
+        """
+        with self.__cond:
+            if not self.__file is None:
+                self.__file.close()
+                self.__file = None
+            self.__is_closed = True
+            self.__cond.notify_all()
+
+    def wait(self, size, timeout=None):
+        """
+        Blocks until the spool holds more than the given number of bytes or
+        is closed (or until the timeout has expired).
+        """
+        with self.__cond:
+            if self.__size <= size and not self.__is_closed:
+                self.__cond.wait(timeout)
+
+    def read(self, offset=0, size=-1):
+        """
+        Reads up to `size` bytes starting at the given byte offset (all
+        remaining bytes if `size` is negative).
+        """
+        with self.__cond:
+            if size < 0:
+                size = self.__size - offset
+            size = max(0, min(size, self.__size - offset))
+            if size == 0:
+                data = b''
+            elif self.__path is None:
+                if len(self.__chunks) > 1:
+                    self.__chunks = [b''.join(self.__chunks)]
+                data = self.__chunks[0][offset:offset + size]
+            else:
+                with open(self.__path, 'rb') as spool_file:
+                    spool_file.seek(offset)
+                    data = spool_file.read(size)
+        return data
+
+    def iter_chunks(self, offset=0, follow=True, chunk_size=65536,
+                    poll_interval=1.0, align_lines=False, size=None):
+        """
+        Iterates over the output starting at the given byte offset, yielding
+        tuples of a chunk of bytes and the offset following that chunk.
+
+        :param bool follow: If set, waits for more output until the spool
+          is closed; otherwise, stops at the current end of the output.
+        :param int chunk_size: Maximum number of bytes per chunk.
+        :param float poll_interval: Maximum number of seconds to wait for
+          new output before checking the spool again.
+        :param bool align_lines: If set, chunks are cut after the last
+          complete line while more output is expected (unless a full chunk
+          holds no line break).
+        :param int size: If set, stops after this number of bytes.
+        """
+        end = None if size is None else offset + size
+        while end is None or offset < end:
+            # Check before reading so we do not miss output that is written
+            # just before the spool is closed.
+            is_closed = self.__is_closed
+            if end is None:
+                data = self.read(offset, chunk_size)
+            else:
+                data = self.read(offset, min(chunk_size, end - offset))
+            available = len(data)
+            if align_lines and follow and not is_closed:
+                pos = data.rfind(b'\n')
+                if pos != -1:
+                    data = data[:pos + 1]
+                elif len(data) < chunk_size:
+                    # Wait for the rest of the line.
+                    data = b''
+            if data:
+                offset += len(data)
+                yield data, offset
+            elif is_closed or not follow:
+                break
+            else:
+                self.wait(offset + available, poll_interval)
+
+    def getvalue(self):
+        """
+        Returns the complete output as a native string, decoded with the
+        :attr:`ENCODING` and with universal newline translation.
+        """
+        return self.__decode(self.read())
+
+    @property
+    def size(self):
+        "Number of bytes written to this spool."
+        return self.__size
+
+    @property
+    def is_closed(self):
+        "Flag indicating that no more output will be written."
+        return self.__is_closed
+
+    @property
+    def is_spooled(self):
+        "Flag indicating that the output was spooled to disk."
+        return not self.__path is None
+
+    @property
+    def head(self):
+        "First bytes of the output (native string)."
+        if self.__path is None:
+            value = self.read(0, self.PREVIEW_SIZE)
+        else:
+            value = self.__head
+        return self.__decode(value)
+
+    @property
+    def tail(self):
+        "Last bytes of the output (native string)."
+        if self.__path is None:
+            value = self.read(max(0, self.__size - self.PREVIEW_SIZE))
+        else:
+            value = self.__tail
+        return self.__decode(value)
+
+    def __spool(self):
+        fd, self.__path = mkstemp(prefix='telex-', suffix='.spool',
+                                  dir=self.__spool_directory)
+        self.__file = os.fdopen(fd, 'wb')
+        data = b''.join(self.__chunks)
+        self.__file.write(data)
+        self.__head = data[:self.PREVIEW_SIZE]
+        self.__tail = data[-self.PREVIEW_SIZE:]
+        self.__chunks = None
+
+    def __decode(self, value):
+        text = native_(value, self.ENCODING, 'replace')
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def __del__(self):
+        if not self.__path is None:
+            try:
+                if not self.__file is None:
+                    self.__file.close()
+                os.remove(self.__path)
+            except OSError:
+                pass
+
+
+class OutputCapture(object):
+    """
+    Captures the standard output and standard error streams of a child
+    process incrementally into two :class:`OutputSpool` instances.
+
+    Both pipes are read in fixed size chunks as the output is produced,
+    so the memory footprint does not depend on the amount of output.
+    """
+    #: Default number of bytes to read from a pipe at a time.
+    DEFAULT_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, chunk_size=None, memory_threshold=None,
+                 spool_directory=None):
+        if chunk_size is None:
+            chunk_size = self.DEFAULT_CHUNK_SIZE
+        self.__chunk_size = chunk_size
+        #: Spool for the standard output stream.
+        self.output = OutputSpool(memory_threshold=memory_threshold,
+                                  spool_directory=spool_directory)
+        #: Spool for the standard error stream.
+        self.errors = OutputSpool(memory_threshold=memory_threshold,
+                                  spool_directory=spool_directory)
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Creates a new output capture configured from the "telex.capture.*"
+        application settings.
+        """
+        return cls(chunk_size=get_setting('telex.capture.chunk_size',
+                                          None, int),
+                   memory_threshold=
+                        get_setting('telex.capture.memory_threshold',
+                                    None, int),
+                   spool_directory=
+                        get_setting('telex.capture.spool_directory'))
+
+    def capture(self, child):
+        """
+        Reads the stdout and stderr pipes of the given child process until
+        both are closed.
+
+        :param child: :class:`subprocess.Popen` instance created with
+          `stdout=PIPE` and `stderr=PIPE`.
+        """
+        err_thread = Thread(target=self.__pump,
+                            args=(child.stderr, self.errors))
+        err_thread.daemon = True
+        err_thread.start()
+        self.__pump(child.stdout, self.output)
+        err_thread.join()
+
+    def __pump(self, stream, spool):
+        fd = stream.fileno()
+        try:
+            while True:
+                data = os.read(fd, self.__chunk_size)
+                if not data:
+                    break
+                spool.write(data)
+        finally:
+            stream.close()
+            spool.close()
+
+
+class CaptureRegistry(object):
+    """
+    Process-wide registry of the output captures of running commands.
+
+    This gives requests other than the one running a command access to
+    its output while it is being produced.
+    """
+    __captures = {}
+    __lock = Lock()
+
+    @classmethod
+    def register(cls, key, capture):
+        with cls.__lock:
+            cls.__captures[key] = capture
+
+    @classmethod
+    def unregister(cls, key):
+        with cls.__lock:
+            cls.__captures.pop(key, None)
+
+    @classmethod
+    def get(cls, key):
+        with cls.__lock:
+            return cls.__captures.get(key)
+
+
+class StoredOutput(object):
+    """
+    Compressed copy of an output stream of a command for persistence.
+
+    Output exceeding the maximum size is truncated: the first and the last
+    half of the allowed bytes are kept, joined by a marker line stating the
+    number of bytes left out.
+    """
+    #: Name of the standard output stream.
+    OUTPUT = 'OUTPUT'
+    #: Name of the standard error stream.
+    ERRORS = 'ERRORS'
+    #: Supported compression methods ("zstd" requires the zstandard
+    #: package).
+    COMPRESSION_METHODS = ('none', 'zlib', 'zstd')
+    #: Marker inserted where truncated output was left out.
+    TRUNCATION_MARKER = '\n[... %d bytes truncated ...]\n'
+
+    def __init__(self, stream):
+        #: Name of the stream (:attr:`OUTPUT` or :attr:`ERRORS`).
+        self.stream = stream
+        #: Compression method of :attr:`data`.
+        self.compression = 'none'
+        #: Compressed bytes.
+        self.data = b''
+        #: Number of bytes in the original output.
+        self.size = 0
+        #: Flag indicating that the original output was truncated.
+        self.is_truncated = False
+
+    def store(self, spool, max_size=None, compression='zlib'):
+        """
+        Stores the contents of the given (closed) spool.
+
+        :param int max_size: Maximum number of bytes of output to store;
+          `None` stores the whole output.
+        :param str compression: One of :attr:`COMPRESSION_METHODS`.
+        """
+        if not compression in self.COMPRESSION_METHODS:
+            raise ValueError('Invalid compression method "%s" (valid '
+                             'methods: %s).'
+                             % (compression,
+                                ', '.join(self.COMPRESSION_METHODS)))
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError('The zstd compression method requires the '
+                             'zstandard package.')
+        size = spool.size
+        # The parts of the spool to store, as (offset, size) tuples or
+        # marker bytes.
+        if not max_size is None and size > max_size:
+            head_size = max_size // 2
+            tail_size = max_size - head_size
+            marker = bytes_(self.TRUNCATION_MARKER % (size - max_size))
+            parts = [(0, head_size), marker, (size - tail_size, tail_size)]
+            raw_size = max_size + len(marker)
+            self.is_truncated = True
+        else:
+            parts = [(0, size)]
+            raw_size = size
+            self.is_truncated = False
+        # The spool is compressed chunk by chunk so the output never has to
+        # be held in memory as a whole.
+        if compression == 'zlib':
+            compressor = zlib.compressobj()
+        elif compression == 'zstd':
+            # Passing the size writes it to the frame header, which the
+            # one-shot decompression in get_bytes relies on.
+            compressor = \
+                zstandard.ZstdCompressor().compressobj(size=raw_size)
+        else:
+            compressor = None
+        chunks = []
+        for part in parts:
+            if isinstance(part, tuple):
+                offset, part_size = part
+                raw_chunks = (chunk for (chunk, _) in
+                              spool.iter_chunks(offset=offset, follow=False,
+                                                size=part_size))
+            else:
+                raw_chunks = [part]
+            for raw in raw_chunks:
+                if not compressor is None:
+                    raw = compressor.compress(raw)
+                chunks.append(raw)
+        if not compressor is None:
+            chunks.append(compressor.flush())
+        self.data = b''.join(chunks)
+        self.compression = compression
+        self.size = size
+
+    def store_from_settings(self, spool, max_size=None):
+        """
+        Stores the contents of the given spool with the compression method
+        configured with the "telex.output.*" application settings.
+
+        :param int max_size: Maximum number of bytes of output to store;
+          defaults to the configured "telex.output.max_size".
+        """
+        if max_size is None:
+            max_size = get_setting('telex.output.max_size', None, int)
+        self.store(spool,
+                   max_size=max_size,
+                   compression=get_setting('telex.output.compression',
+                                           'zlib'))
+
+    def get_bytes(self):
+        """
+        Returns the stored (possibly truncated) output bytes.
+        """
+        if self.compression == 'zlib':
+            raw = zlib.decompress(self.data)
+        elif self.compression == 'zstd':
+            if zstandard is None:
+                raise ValueError('Decompressing zstd compressed output '
+                                 'requires the zstandard package.')
+            raw = zstandard.ZstdDecompressor().decompress(self.data)
+        else:
+            raw = self.data
+        return raw
+
+    def to_spool(self):
+        """
+        Returns a closed, in-memory :class:`OutputSpool` holding the stored
+        output.
+        """
+        return OutputSpool.from_string(self.get_bytes())
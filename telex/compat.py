@@ -6,12 +6,22 @@ Created on Jul 9, 2014.
 """
 
 __docformat__ = 'reStructuredText en'
-__all__ = ['quote',
+__all__ = ['Empty',
+           'Queue',
+           'quote',
            ]
 
 from pyramid.compat import PY3
 
 
+if PY3:
+    from queue import Empty # pylint: disable=F0401
+    from queue import Queue # pylint: disable=F0401
+else:
+    from Queue import Empty # pylint: disable=F0401
+    from Queue import Queue # pylint: disable=F0401
+
+
 if PY3:
     import shlex
     quote = shlex.quote # pylint: disable=E1101
@@ -8,7 +8,9 @@ from everest.constants import ConstantGroup
 
 
 __docformat__ = 'reStructuredText en'
-__all__ = ['VALUE_TYPES',
+__all__ = ['COMMAND_STATUS',
+           'EXECUTION_MODES',
+           'VALUE_TYPES',
            ]
 
 
@@ -25,6 +27,43 @@ class VALUE_TYPES(ConstantGroup):
     URL = 'URL'
 
 
+class COMMAND_STATUS(ConstantGroup):
+    """
+    Group of command execution status constants.
+    """
+    #: The command was created, but has not been run yet.
+    PENDING = 'PENDING'
+    #: The command was submitted for asynchronous execution.
+    QUEUED = 'QUEUED'
+    #: The command is currently being executed.
+    RUNNING = 'RUNNING'
+    #: The command ran to completion (regardless of its exit code).
+    FINISHED = 'FINISHED'
+    #: The command could not be run.
+    FAILED = 'FAILED'
+    #: The command was killed because it exceeded its wall clock time.
+    TIMED_OUT = 'TIMED_OUT'
+    #: The command was terminated because it exceeded a resource limit
+    #: enforced with a signal (CPU time or file size).
+    LIMIT_EXCEEDED = 'LIMIT_EXCEEDED'
+    #: The command was cancelled by the user.
+    CANCELLED = 'CANCELLED'
+
+
+class EXECUTION_MODES(ConstantGroup):
+    """
+    Group of shell command execution mode constants.
+    """
+    #: The command line is run through the shell (/bin/sh).
+    SHELL = 'SHELL'
+    #: The executable is run directly with the command line arguments
+    #: passed as argument vector (no shell expansions or redirections).
+    ARGV = 'ARGV'
+    #: The Python script (or module) in the argument vector is run in a
+    #: process forked from a pool of warm Python interpreters.
+    PYTHON_POOL = 'PYTHON_POOL'
+
+
 class ParameterOptionRegistry(object):
     __option_name_map = {}
     __option_names = set()
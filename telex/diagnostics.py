@@ -0,0 +1,134 @@
+"""
+Diagnostics for the telex server.
+
+The diagnostics classifier scans the standard error output of a shell
+command for error and warning lines. The output is processed line by line
+as it is fed in, so it never has to be held in memory as a whole, and the
+scan stops at the first error line.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import re
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['DiagnosticsClassifier',
+           ]
+
+
+class DiagnosticsClassifier(object):
+    """
+    Incremental classifier for diagnostic output lines.
+
+    A line is an error line if the error pattern is found in it and a
+    warning line if (only) the warning pattern is found in it; both
+    patterns are matched case insensitively. Only the classified lines are
+    kept.
+    """
+    #: Default error pattern: an " ERROR " marker.
+    DEFAULT_ERROR_PATTERN = ' error '
+    #: Default warning pattern: a " WARN " marker.
+    DEFAULT_WARNING_PATTERN = ' warn '
+    #: Maximum number of warning lines to keep.
+    MAX_WARNINGS = 1000
+    #: Encoding used to decode the output.
+    ENCODING = 'utf-8'
+
+    def __init__(self, error_pattern=None, warning_pattern=None):
+        """
+        :param str error_pattern: Regular expression (searched for in each
+          line) marking error lines. Defaults to
+          :attr:`DEFAULT_ERROR_PATTERN`.
+        :param str warning_pattern: Regular expression marking warning
+          lines. Defaults to :attr:`DEFAULT_WARNING_PATTERN`.
+        :raises ValueError: If a pattern is not a valid regular expression.
+        """
+        if error_pattern is None:
+            error_pattern = self.DEFAULT_ERROR_PATTERN
+        if warning_pattern is None:
+            warning_pattern = self.DEFAULT_WARNING_PATTERN
+        try:
+            # Both patterns are combined into one so each line is only
+            # scanned once.
+            self.__pattern = re.compile('(?P<error>%s)|(?P<warning>%s)'
+                                        % (error_pattern, warning_pattern),
+                                        re.I)
+            self.__error_pattern = re.compile(error_pattern, re.I)
+        except re.error as err:
+            raise ValueError('Invalid diagnostics pattern: %s.' % err)
+        #: Error lines found so far (at most one).
+        self.errors = []
+        #: Warning lines found so far.
+        self.warnings = []
+        self.__remainder = b''
+
+    @classmethod
+    def from_command_definition(cls, command_definition):
+        """
+        Creates a classifier using the patterns configured in the given
+        shell command definition.
+        """
+        return cls(error_pattern=command_definition.error_pattern,
+                   warning_pattern=command_definition.warning_pattern)
+
+    @property
+    def has_error(self):
+        "Flag indicating that an error line was found."
+        return len(self.errors) > 0
+
+    def feed(self, data):
+        """
+        Classifies the complete lines in the given chunk of bytes; an
+        incomplete last line is kept until more data are fed or the
+        classifier is closed.
+
+        :returns: `True` if an error line was found (and no more data need
+          to be fed).
+        """
+        if not self.has_error:
+            lines = (self.__remainder + data).split(b'\n')
+            self.__remainder = lines.pop()
+            for line in lines:
+                if self.__classify(line):
+                    break
+        return self.has_error
+
+    def close(self):
+        """
+        Classifies the remaining incomplete line, if any.
+        """
+        if self.__remainder and not self.has_error:
+            self.__classify(self.__remainder)
+        self.__remainder = b''
+
+    def classify(self, spool):
+        """
+        Feeds the output held by the given
+        :class:`telex.capture.OutputSpool` chunk by chunk, stopping at the
+        first error line.
+
+        :returns: `True` if an error line was found.
+        """
+        for chunk, _ in spool.iter_chunks(follow=False):
+            if self.feed(chunk):
+                break
+        self.close()
+        return self.has_error
+
+    def __classify(self, line):
+        line = line.rstrip(b'\r').decode(self.ENCODING, 'replace')
+        match = self.__pattern.search(line)
+        is_error = False
+        if not match is None:
+            # The combined pattern finds the leftmost marker; an error
+            # marker further right still makes this an error line.
+            is_error = not match.group('error') is None \
+                       or not self.__error_pattern.search(line) is None
+            if is_error:
+                self.errors.append(line)
+            elif len(self.warnings) < self.MAX_WARNINGS:
+                self.warnings.append(line)
+        return is_error
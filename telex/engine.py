@@ -0,0 +1,362 @@
+"""
+Concurrent REST command execution for the telex server.
+
+The REST engine runs the remote calls of many REST commands concurrently
+on a shared pool of worker threads, limiting the number of concurrent
+calls to each target host. Callers submit commands and get a handle they
+can wait on (with a timeout) or cancel.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from collections import deque
+import logging
+from threading import Condition
+from threading import Event
+from threading import Lock
+from threading import Thread
+import time
+
+from pyramid.threadlocal import get_current_registry
+from pyramid.threadlocal import manager
+from requests.compat import urlparse
+
+from telex.constants import COMMAND_STATUS
+from telex.interfaces import IRestEngine
+from telex.metrics import record_command_run
+from telex.utils import get_setting
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['RestCall',
+           'RestCallCancelled',
+           'RestCallTimeout',
+           'RestEngine',
+           'get_rest_engine',
+           ]
+
+
+class RestCallTimeout(Exception):
+    """
+    Raised when waiting for a REST call times out.
+    """
+    pass
+
+
+class RestCallCancelled(Exception):
+    """
+    Raised when waiting for a REST call that was cancelled.
+    """
+    pass
+
+
+class RestCall(object):
+    """
+    Handle for a REST command submitted to a :class:`RestEngine`.
+
+    The worker making the call does not touch the command (whose
+    repository session belongs to the submitting thread); the outcome of
+    the call is applied to the command when it is waited for.
+    """
+    def __init__(self, command, threadlocals):
+        #: The REST command entity.
+        self.command = command
+        #: Target host ("netloc") of the call.
+        self.host = urlparse(command.command_definition.url).netloc
+        #: Headers and body of the request (built in the submitting
+        #: thread).
+        self.request = command.make_request()
+        #: Exception raised by the call, if any.
+        self.exception = None
+        #: Flag indicating that the call was cancelled.
+        self.is_cancelled = False
+        self.threadlocals = threadlocals
+        self.__result = None
+        self.__duration = None
+        self.__response = None
+        self.__is_applied = False
+        self.__done = Event()
+        self.__lock = Lock()
+
+    @property
+    def is_done(self):
+        "Flag indicating that the call has finished or was cancelled."
+        return self.__done.is_set()
+
+    def wait(self, timeout=None, cancel_on_timeout=False):
+        """
+        Waits for the call to finish and applies its outcome to the command:
+        the command gets the response and the status FINISHED, the status
+        FAILED (and the exception of the call is re-raised) or the status
+        CANCELLED. This needs to be called in the thread owning the
+        repository session of the command.
+
+        :param float timeout: Maximum number of seconds to wait.
+        :param bool cancel_on_timeout: If set, the call is cancelled if it
+          has not finished in time.
+        :raises RestCallTimeout: If the call has not finished in time.
+        :raises RestCallCancelled: If the call was cancelled.
+        """
+        is_timed_out = not self.__done.wait(timeout)
+        if is_timed_out and cancel_on_timeout:
+            # The call may have finished in the meantime.
+            is_timed_out = self.cancel()
+        if self.is_done:
+            self.__apply()
+        if is_timed_out:
+            raise RestCallTimeout('Timeout waiting for REST call.')
+        if self.is_cancelled:
+            raise RestCallCancelled('REST call was cancelled.')
+        if not self.exception is None:
+            raise self.exception # raising None pylint: disable=E0702
+
+    def cancel(self):
+        """
+        Cancels the call. A call waiting for a worker is not made at all; a
+        call in progress is stopped by closing its response if the response
+        headers have been received already (otherwise, its result is
+        discarded). The command status is set when the call is waited for.
+
+        :returns: `True` if the call was cancelled; `False` if it had
+          already finished.
+        """
+        rsp = None
+        with self.__lock:
+            if self.is_done:
+                result = False
+            else:
+                self.is_cancelled = True
+                rsp = self.__response
+                self.__done.set()
+                result = True
+        if result and not rsp is None:
+            rsp.close()
+        return result
+
+    def set_response(self, response):
+        """
+        Records the response of the call in progress (so it can be closed
+        when the call is cancelled).
+        """
+        with self.__lock:
+            if not self.is_cancelled:
+                self.__response = response
+                response = None
+        if not response is None:
+            response.close()
+
+    def set_result(self, result, exception=None, duration=None):
+        """
+        Records the :class:`telex.entities.RestCommandResult` or the
+        exception and the duration of the finished call (unless it was
+        cancelled).
+        """
+        with self.__lock:
+            if not self.is_cancelled:
+                self.__result = result
+                self.exception = exception
+                self.__duration = duration
+                self.__done.set()
+
+    def __apply(self):
+        if self.__is_applied:
+            return
+        self.__is_applied = True
+        if self.is_cancelled:
+            self.command.status = COMMAND_STATUS.CANCELLED
+        elif not self.exception is None:
+            self.command.status = COMMAND_STATUS.FAILED
+            record_command_run(self.command, self.__duration,
+                               has_failed=True)
+        else:
+            self.command.apply_result(self.__result)
+
+
+class RestEngine(object):
+    """
+    Runs the remote calls of REST commands concurrently in a pool of
+    worker threads.
+
+    Calls are started in submission order, skipping calls to hosts which
+    already have :attr:`max_per_host` calls in progress, so a slow host
+    can not starve the calls to other hosts.
+    """
+    def __init__(self, max_workers=64, max_per_host=8):
+        """
+        :param int max_workers: Maximum number of calls in progress.
+        :param int max_per_host: Maximum number of calls in progress to the
+          same host.
+        """
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.__pending = deque()
+        self.__active = {}
+        self.__workers = []
+        self.__is_shut_down = False
+        self.__cond = Condition(Lock())
+        self.__logger = logging.getLogger(__name__)
+
+    def submit(self, command):
+        """
+        Submits the given REST command entity for execution and sets its
+        status to RUNNING. The worker sees the registry of the calling
+        thread.
+
+        :returns: :class:`RestCall` instance.
+        """
+        call = RestCall(command, dict(registry=manager.get()['registry'],
+                                      request=None))
+        command.status = COMMAND_STATUS.RUNNING
+        with self.__cond:
+            if self.__is_shut_down:
+                raise RuntimeError('REST engine was shut down.')
+            self.__pending.append(call)
+            self.__start_workers()
+            self.__cond.notify_all()
+        return call
+
+    def run(self, commands, timeout=None):
+        """
+        Runs the given REST commands concurrently and waits until all of
+        them have finished (see :meth:`wait_all`).
+
+        :returns: List of :class:`RestCall` instances.
+        """
+        return self.wait_all([self.submit(cmd) for cmd in commands],
+                             timeout=timeout)
+
+    def wait_all(self, calls, timeout=None):
+        """
+        Waits until all of the given calls have finished or the timeout has
+        expired; unfinished calls are cancelled then. The outcomes of the
+        calls are applied to the commands in the calling thread (see
+        :meth:`RestCall.wait`). Errors set the status of the failing
+        command to FAILED; they do not affect the other commands.
+
+        :param float timeout: Maximum number of seconds to wait for all
+          calls.
+        :returns: The given calls.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        for call in calls:
+            if not deadline is None:
+                timeout = max(0, deadline - time.time())
+            try:
+                call.wait(timeout, cancel_on_timeout=True)
+            except Exception: # catch Exception pylint: disable=W0703
+                pass
+        return calls
+
+    def get_statistics(self):
+        """
+        Returns a dictionary with the number of pending calls and the
+        numbers of calls in progress per host.
+        """
+        with self.__cond:
+            return dict(pending=len(self.__pending),
+                        active=dict(self.__active))
+
+    def shutdown(self):
+        """
+        Stops all worker threads after the calls in progress have finished;
+        pending calls are cancelled.
+        """
+        with self.__cond:
+            self.__is_shut_down = True
+            pending = list(self.__pending)
+            self.__pending.clear()
+            workers = self.__workers
+            self.__workers = []
+            self.__cond.notify_all()
+        for call in pending:
+            call.cancel()
+        for worker in workers:
+            worker.join()
+
+    def __start_workers(self):
+        # Called with the lock held; workers are started on demand.
+        num_busy = sum(self.__active.values())
+        if len(self.__workers) < self.max_workers \
+           and len(self.__workers) < num_busy + len(self.__pending):
+            worker = Thread(target=self.__work,
+                            name='telex-rest-worker-%d' % len(self.__workers))
+            worker.daemon = True
+            worker.start()
+            self.__workers.append(worker)
+
+    def __next_call(self):
+        # Called with the lock held.
+        for idx, call in enumerate(self.__pending):
+            if call.is_cancelled:
+                continue
+            if self.__active.get(call.host, 0) < self.max_per_host:
+                del self.__pending[idx]
+                self.__active[call.host] = \
+                                    self.__active.get(call.host, 0) + 1
+                return call
+        # Drop cancelled calls.
+        for call in [call for call in self.__pending if call.is_cancelled]:
+            self.__pending.remove(call)
+        return None
+
+    def __work(self):
+        while True:
+            with self.__cond:
+                call = self.__next_call()
+                while call is None and not self.__is_shut_down:
+                    self.__cond.wait()
+                    call = self.__next_call()
+            if call is None:
+                break
+            try:
+                self.__call(call)
+            finally:
+                with self.__cond:
+                    self.__active[call.host] -= 1
+                    if self.__active[call.host] == 0:
+                        del self.__active[call.host]
+                    # A call to this host may be runnable now.
+                    self.__cond.notify_all()
+
+    def __call(self, call):
+        manager.push(call.threadlocals)
+        start = time.time()
+        try:
+            result = call.command.execute(request=call.request,
+                                          response_callback=
+                                                call.set_response)
+        except Exception as err: # catch Exception pylint: disable=W0703
+            if not call.is_cancelled:
+                self.__logger.debug('Error running command %s.',
+                                    call.command, exc_info=True)
+            call.set_result(None, exception=err,
+                            duration=time.time() - start)
+        else:
+            call.set_result(result)
+        finally:
+            manager.pop()
+
+
+_rest_engine_lock = Lock()
+
+
+def get_rest_engine():
+    """
+    Returns the REST engine registered with the current registry, creating
+    it from the "telex.rest.*" application settings on first use.
+    """
+    reg = get_current_registry()
+    rest_engine = reg.queryUtility(IRestEngine)
+    if rest_engine is None:
+        with _rest_engine_lock:
+            rest_engine = reg.queryUtility(IRestEngine)
+            if rest_engine is None:
+                rest_engine = RestEngine(
+                    max_workers=get_setting('telex.rest.max_workers', 64,
+                                            int),
+                    max_per_host=get_setting('telex.rest.max_per_host', 8,
+                                             int))
+                reg.registerUtility(rest_engine, IRestEngine)
+    return rest_engine
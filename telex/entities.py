@@ -9,19 +9,47 @@ Created on Jul 7, 2014.
 import datetime
 import json
 import os
-from subprocess import PIPE
-from subprocess import Popen
+import shlex
+from threading import Timer
+import time
 
 from pyramid.threadlocal import get_current_request
 from pytz import timezone
-import requests
 
 from everest.constants import RequestMethods
 from everest.entities.base import Entity
 from everest.representers.converters import ConverterRegistry
+from telex.cache import CachedResult
+from telex.cache import CommandDefinitionCache
+from telex.cache import SingleFlight
+from telex.cache import get_result_cache
+from telex.cache import make_result_key
+from telex.capture import CaptureRegistry
+from telex.capture import OutputCapture
+from telex.capture import OutputSpool
+from telex.capture import StoredOutput
 from telex.compat import quote
+from telex.constants import COMMAND_STATUS
+from telex.constants import EXECUTION_MODES
 from telex.constants import ParameterOptionRegistry
-from telex.constants import VALUE_TYPES
+from telex.forkserver import get_fork_server_pool
+from telex.metrics import MetricsRegistry
+from telex.metrics import record_command_run
+from telex.process import ChildProcess
+from telex.process import ProcessPlaceholder
+from telex.process import ProcessRegistry
+from telex.process import ResourceLimits
+from telex.process import spawn
+from telex.process import wait_for_child
+from telex.profiling import Profiler
+from telex.sessions import is_text_content_type
+from telex.sessions import send_request
+from telex.sessions import spool_response_body
+from telex.tracing import Tracer
+from telex.utils import get_setting
+from telex.validation import VALUE_TYPE_MAP
+from telex.validation import format_value
+from telex.validation import make_validator
 
 
 __docformat__ = 'reStructuredText en'
@@ -49,11 +77,18 @@ class CommandDefinition(Entity):
     description = None
     #: List of parameter definitions for this command definition.
     parameter_definitions = None
+    #: Number of days to keep commands for this definition. Optional;
+    #: defaults to the "telex.retention.max_age" setting.
+    retention_days = None
+    #: Maximum number of commands to keep for this definition. Optional;
+    #: defaults to the "telex.retention.max_count" setting.
+    retention_count = None
     #:
     command_definition_type = None
 
     def __init__(self, name, label, submitter, category=None,
-                 description=None, parameter_definitions=None, **kw):
+                 description=None, parameter_definitions=None,
+                 retention_days=None, retention_count=None, **kw):
         if type(self) is CommandDefinition:
             raise NotImplementedError('Abstract class.')
         Entity.__init__(self, **kw)
@@ -65,6 +100,8 @@ class CommandDefinition(Entity):
         if parameter_definitions is None:
             parameter_definitions = []
         self.parameter_definitions = parameter_definitions
+        self.retention_days = retention_days
+        self.retention_count = retention_count
 
     @property
     def slug(self):
@@ -90,14 +127,66 @@ class ShellCommandDefinition(CommandDefinition):
     environment = None
     #: Working directory to run the command in. Optional.
     working_directory = None
+    #: Maximum wall clock time in seconds. Optional.
+    timeout = None
+    #: Maximum CPU time in seconds. Optional.
+    cpu_time_limit = None
+    #: Maximum size of the virtual address space in bytes. Optional. Note
+    #: that commands failing to allocate memory beyond this limit are not
+    #: reported with the status LIMIT_EXCEEDED.
+    memory_limit = None
+    #: Maximum number of open file descriptors. Optional.
+    open_files_limit = None
+    #: Maximum number of bytes of each output stream to persist. Optional;
+    #: defaults to the "telex.output.max_size" setting.
+    max_output_size = None
+    #: Execution mode (one of the :class:`EXECUTION_MODES` constants).
+    execution_mode = None
+    #: Flag indicating if the command is idempotent, i.e., if its results
+    #: can be served from the result cache.
+    cacheable = None
+    #: Regular expression marking error lines in the error output. Optional.
+    error_pattern = None
+    #: Regular expression marking warning lines in the error output.
+    #: Optional.
+    warning_pattern = None
+    #: Cached tuple holding the executable string and its argument list.
+    __argv_cache = None
 
     def __init__(self, name, label, submitter, executable,
-                 environment=None, working_directory=None, **kw):
+                 environment=None, working_directory=None, timeout=None,
+                 cpu_time_limit=None, memory_limit=None,
+                 open_files_limit=None, max_output_size=None,
+                 execution_mode=None, cacheable=False, error_pattern=None,
+                 warning_pattern=None, **kw):
         CommandDefinition.__init__(self, name, label, submitter, **kw)
         self.command_definition_type = 'SHELL'
         self.executable = executable
         self.environment = environment
         self.working_directory = working_directory
+        self.timeout = timeout
+        self.cpu_time_limit = cpu_time_limit
+        self.memory_limit = memory_limit
+        self.open_files_limit = open_files_limit
+        self.max_output_size = max_output_size
+        if execution_mode is None:
+            execution_mode = EXECUTION_MODES.SHELL
+        self.execution_mode = execution_mode
+        self.cacheable = cacheable
+        self.error_pattern = error_pattern
+        self.warning_pattern = warning_pattern
+
+    @property
+    def executable_argv(self):
+        """
+        The executable split into an argument list using shell-like syntax.
+        The list is cached until the executable changes.
+        """
+        cache = self.__argv_cache
+        if cache is None or cache[0] != self.executable:
+            cache = (self.executable, shlex.split(self.executable))
+            self.__argv_cache = cache
+        return cache[1]
 
 
 class RestCommandDefinition(CommandDefinition):
@@ -109,10 +198,24 @@ class RestCommandDefinition(CommandDefinition):
     response_content_type = None
     #: HTML operation.
     operation = None
+    #: Maximum number of pooled connections to the target host.
+    pool_size = None
+    #: Flag indicating if connections to the target host are kept alive.
+    keep_alive = None
+    #: Connect timeout in seconds. Optional.
+    connect_timeout = None
+    #: Read timeout in seconds. Optional.
+    read_timeout = None
+    #: Maximum number of retries for failed requests.
+    max_retries = None
+    #: Backoff factor for retries in seconds.
+    retry_backoff = None
 
     def __init__(self, name, label, submitter, url,
                  request_content_type, response_content_type=None,
-                 operation=RequestMethods.POST, **kw):
+                 operation=RequestMethods.POST, pool_size=10,
+                 keep_alive=True, connect_timeout=None, read_timeout=None,
+                 max_retries=0, retry_backoff=0, **kw):
         CommandDefinition.__init__(self, name, label, submitter, **kw)
         self.command_definition_type = 'REST'
         self.url = url
@@ -121,6 +224,12 @@ class RestCommandDefinition(CommandDefinition):
             response_content_type = request_content_type
         self.response_content_type = response_content_type
         self.operation = operation
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
 
 
 class ParameterDefinition(Entity):
@@ -142,12 +251,8 @@ class ParameterDefinition(Entity):
     parameter_options = None
     #: Dictionary mapping parameter option names to their values.
     __po_map = None
-    #: Dictionary mapping parameter option types to their Python types.
-    __type_map = {VALUE_TYPES.BOOLEAN : bool,
-                  VALUE_TYPES.INT : int,
-                  VALUE_TYPES.DOUBLE : float,
-                  VALUE_TYPES.DATETIME : datetime.datetime,
-                  }
+    #: Validator compiled from the parameter options.
+    __validator = None
 
     def __init__(self, name, label, command_definition, value_type,
                  description=None, parameter_options=None, **kw):
@@ -185,7 +290,7 @@ class ParameterDefinition(Entity):
             for po in data['parameter_options']:
                 if po.value is None:
                     continue
-                py_type = cls.__type_map.get(po_type_map[po.name])
+                py_type = VALUE_TYPE_MAP.get(po_type_map[po.name])
                 if not py_type is None:
                     py_value = ConverterRegistry.convert_from_representation(
                                                         po.value,
@@ -200,6 +305,7 @@ class ParameterDefinition(Entity):
         po = ParameterOption.create_from_data(init_data)
         self.__validate_option(po)
         self.__get_option_map()[po.name] = po.value
+        self.__validator = None
         self.parameter_options.append(po)
         if po.parameter_definition is None:
             po.parameter_definition = self
@@ -215,6 +321,17 @@ class ParameterDefinition(Entity):
     def options(self):
         return self.__get_option_map()
 
+    @property
+    def validator(self):
+        """
+        Validator for values of this parameter, compiled from the parameter
+        options on first access (see :func:`telex.validation.make_validator`).
+        """
+        if self.__validator is None:
+            self.__validator = make_validator(self.name, self.value_type,
+                                              self.__get_option_map())
+        return self.__validator
+
     def __get_option_map(self):
         if self.__po_map is None:
             self.__po_map = {}
@@ -266,18 +383,27 @@ class Command(Entity):
     submitter = None
     #:
     command_type = None
+    #: Execution status (one of the :class:`COMMAND_STATUS` constants).
+    status = None
 
     @classmethod
     def create_from_data(cls, data):
+        with Tracer.span('validate'):
+            cls.__validate_data(data)
+        return cls(**data)
+
+    @classmethod
+    def __validate_data(cls, data):
         cmd_def = data.get('command_definition')
         if not isinstance(cmd_def, CommandDefinition):
             raise ValueError('The `command_definition` argument needs to be '
                              'an instance of `CommandDefinition`.')
         # Check for parameters with names that we do not have in the
-        # definitions.
+        # definitions. The parameter definitions are looked up in the
+        # definition cache rather than loaded for every command.
         do_check_missing_mandatory = True
-        prm_def_map = dict([(prm_def.name, prm_def)
-                            for prm_def in cmd_def.parameter_definitions])
+        cmd_def_info = CommandDefinitionCache.get(cmd_def)
+        prm_names = set(cmd_def_info.parameter_names)
         prms = data.get('parameters')
         if not prms is None:
             try:
@@ -286,28 +412,52 @@ class Command(Entity):
                 raise TypeError('The `parameters` argument needs to be an '
                                 'iterable.')
             for prm in prm_it:
+                prm_name = prm.parameter_definition.name
                 try:
-                    prm_def = prm_def_map.pop(prm.parameter_definition.name)
+                    prm_names.remove(prm_name)
                 except KeyError:
-                    raise KeyError('Invalid parameter "%s".'
-                                   % prm.parameter_definition.name)
-                if prm_def.name == 'help':
+                    raise KeyError('Invalid parameter "%s".' % prm_name)
+                # Raises an InvalidParameterValue error if the value does not
+                # satisfy the parameter options. The command gets the
+                # converted value in its canonical representation (the
+                # parameter values are persisted as strings).
+                prm.value = format_value(
+                            prm.parameter_definition.value_type,
+                            cmd_def_info.validate(prm_name, prm.value))
+                if prm_name == 'help':
                     # This is an invocation with --help.
                     do_check_missing_mandatory = False
+        dflt_prm_names = [prm_name for prm_name in prm_names
+                          if not cmd_def_info.get_default_value(prm_name)
+                                                                    is None]
+        if dflt_prm_names:
+            # Add parameters for the missing parameters with a default value.
+            prm_def_map = dict([(prm_def.name, prm_def)
+                                for prm_def in cmd_def.parameter_definitions])
+            prms = list(prms or [])
+            for prm_name in dflt_prm_names:
+                # Default values get the same canonical representation as
+                # submitted values.
+                prm_def = prm_def_map[prm_name]
+                value = format_value(
+                            prm_def.value_type,
+                            cmd_def_info.validate(
+                                prm_name,
+                                cmd_def_info.get_default_value(prm_name)))
+                prms.append(Parameter(prm_def, value))
+                prm_names.remove(prm_name)
+            data['parameters'] = prms
         if do_check_missing_mandatory:
             # Check for missing mandatory parameters.
-            missing_cmnd_prms = [prm_def
-                                 for prm_def in prm_def_map.values()
-                                 if prm_def.get_option('is_mandatory')]
-            if len(missing_cmnd_prms) > 0:
+            missing_cmnd_prm_names = \
+                    prm_names & cmd_def_info.mandatory_parameter_names
+            if len(missing_cmnd_prm_names) > 0:
                 raise TypeError('No values were given for the following '
                                 'mandatory parameters: %s.'
-                                % ','.join([prm.name
-                                            for prm in missing_cmnd_prms]))
-        return cls(**data)
+                                % ','.join(sorted(missing_cmnd_prm_names)))
 
     def __init__(self, command_definition, submitter, parameters,
-                 timestamp=None, **kw):
+                 timestamp=None, status=None, **kw):
         if type(self) is Command:
             raise NotImplementedError('Abstract class.')
         Entity.__init__(self, **kw)
@@ -318,20 +468,76 @@ class Command(Entity):
             utc = timezone('UTC')
             timestamp = datetime.datetime.now(utc)
         self.timestamp = timestamp
+        if status is None:
+            status = COMMAND_STATUS.PENDING
+        self.status = status
 
     def run(self):
         raise NotImplementedError('Abstract method.')
 
 
+class ShellCommandResult(object):
+    """
+    Result of running the process of a shell command (see
+    :meth:`ShellCommand.execute`).
+    """
+    def __init__(self, status, exit_code, output, errors, wall_time=None,
+                 resource_usage=None):
+        #: Final status (one of the :class:`COMMAND_STATUS` constants).
+        self.status = status
+        #: Exit code of the process.
+        self.exit_code = exit_code
+        #: Spool holding the output of the process.
+        self.output = output
+        #: Spool holding the errors of the process.
+        self.errors = errors
+        #: Number of seconds the process ran (`None` for results which were
+        #: shared or served from the result cache).
+        self.wall_time = wall_time
+        #: :class:`telex.process.ResourceUsage` of the process (`None` if
+        #: not available).
+        self.resource_usage = resource_usage
+        #: Number of seconds the run took (set by
+        #: :meth:`ShellCommand.execute`).
+        self.duration = None
+
+    @classmethod
+    def from_cached_result(cls, cached_result, status):
+        """
+        Creates a result with the given status holding the exit code and
+        output of the given :class:`telex.cache.CachedResult`.
+        """
+        return cls(status, cached_result.exit_code,
+                   OutputSpool.from_string(cached_result.output),
+                   OutputSpool.from_string(cached_result.errors))
+
+
 class ShellCommand(Command):
     #: Environment variables to set for this command. Optional.
     environment = None
-    #: Output generated during the execution.
-    output_string = None
-    #: Errors generated during the execution.
-    error_string = None
     #: Exit code of the command.
     exit_code = None
+    #: Number of seconds the command process ran.
+    wall_time = None
+    #: CPU time in seconds the command process spent in user mode.
+    user_time = None
+    #: CPU time in seconds the command process spent in system mode.
+    system_time = None
+    #: Maximum resident set size of the command process in bytes.
+    max_rss = None
+    #: Number of bytes the command wrote to its standard output.
+    stdout_bytes = None
+    #: Number of bytes the command wrote to its standard error.
+    stderr_bytes = None
+    #: Map of stream names to :class:`telex.capture.StoredOutput`
+    #: instances holding the persisted output of the command.
+    stored_outputs = None
+    #: Spool holding the output generated during the execution.
+    __output = None
+    #: Spool holding the errors generated during the execution.
+    __errors = None
+    #: Names of the streams whose spools have not been stored yet.
+    __unstored_streams = frozenset()
 
     def __init__(self, command_definition, submitter, parameters,
                  environment=None, **kw):
@@ -341,33 +547,350 @@ class ShellCommand(Command):
         if environment is None:
             environment = {}
         self.environment = environment
+        self.stored_outputs = {}
 
     def run(self):
-        cwd = self.command_definition.working_directory
+        start = time.time()
+        try:
+            result = self.execute()
+        except Exception:
+            record_command_run(self, time.time() - start, has_failed=True)
+            raise
+        self.apply_result(result)
+
+    def execute(self):
+        """
+        Runs the process of this command (or serves its result from the
+        result cache) and returns a :class:`ShellCommandResult`.
+
+        This does not modify the command, so it can be called in a thread
+        other than the one owning the repository session of the command;
+        the result is then applied with :meth:`apply_result` in the owning
+        thread. The command needs to have an ID.
+        """
+        start = time.time()
+        with Tracer.span('run', definition=self.command_definition.name):
+            result = self.__run()
+        result.duration = time.time() - start
+        return result
+
+    def apply_result(self, result):
+        """
+        Sets the status, exit code, resource usage and output of the given
+        :class:`ShellCommandResult` on this command and records the
+        metrics for the run.
+        """
+        self.status = result.status
+        self.exit_code = result.exit_code
+        self.wall_time = result.wall_time
+        usage = result.resource_usage
+        if not usage is None:
+            self.user_time = usage.user_time
+            self.system_time = usage.system_time
+            self.max_rss = usage.max_rss
+        self.__output = result.output
+        self.__errors = result.errors
+        self.stdout_bytes = result.output.size
+        self.stderr_bytes = result.errors.size
+        self.__unstored_streams = frozenset([StoredOutput.OUTPUT,
+                                             StoredOutput.ERRORS])
+        record_command_run(self, result.duration,
+                           output_sizes={StoredOutput.OUTPUT:
+                                                    result.output.size,
+                                         StoredOutput.ERRORS:
+                                                    result.errors.size})
+
+    def __run(self):
+        cmd_def = self.command_definition
+        if cmd_def.cacheable:
+            # Idempotent commands are served from the result cache if
+            # possible; identical commands submitted while one of them is
+            # running share its result.
+            result_cache = get_result_cache()
+            args, cwd = self.__make_command_line()
+            key = make_result_key(cmd_def.execution_mode, args, cwd,
+                                  self.environment)
+            cached = result_cache.get(key)
+            if cached is None:
+                result = self.__execute_coalesced(result_cache, key)
+            else:
+                result = ShellCommandResult.from_cached_result(
+                                                cached, COMMAND_STATUS.FINISHED)
+        else:
+            result = self.__execute()
+        return result
+
+    def __execute_coalesced(self, result_cache, key):
+        # The placeholder allows cancelling the command while it waits for
+        # an identical command; killing it interrupts the wait.
+        placeholder = ProcessPlaceholder()
+        ProcessRegistry.register(self.id, placeholder)
+        timeout = self.command_definition.timeout
+        if not timeout is None:
+            # The wait counts against the timeout of this command.
+            timer = Timer(timeout, placeholder.kill,
+                          args=(COMMAND_STATUS.TIMED_OUT,))
+            timer.daemon = True
+            timer.start()
+        try:
+            shared, is_leader = \
+                SingleFlight.run(key,
+                                 lambda: self.__execute_cacheable(
+                                                result_cache, key,
+                                                placeholder),
+                                 is_shareable=lambda result: result.status
+                                            == COMMAND_STATUS.FINISHED,
+                                 waiter=placeholder.killed)
+        finally:
+            if not timeout is None:
+                timer.cancel()
+            ProcessRegistry.unregister(self.id)
+        if not is_leader and not placeholder.kill_status is None:
+            result = self.__make_killed_result(placeholder.kill_status)
+        elif not is_leader:
+            # The spools of the finished command are not written to any
+            # more and can be shared.
+            result = ShellCommandResult(shared.status, shared.exit_code,
+                                        shared.output, shared.errors)
+        else:
+            result = shared
+        return result
+
+    def __execute_cacheable(self, result_cache, key, placeholder):
+        if not placeholder.kill_status is None:
+            # Killed while waiting for an identical command.
+            result = self.__make_killed_result(placeholder.kill_status)
+        else:
+            result = self.__execute()
+            # Large results are not read into memory just to be rejected
+            # by the cache.
+            if result.status == COMMAND_STATUS.FINISHED \
+               and result.output.size + result.errors.size \
+                    <= result_cache.max_size:
+                result_cache.put(key, CachedResult(result.exit_code,
+                                                   result.output.read(),
+                                                   result.errors.read()))
+        return result
+
+    def __make_killed_result(self, status):
+        return ShellCommandResult(status, None, OutputSpool.from_string(''),
+                                  OutputSpool.from_string(''))
+
+    def __execute(self):
+        cmd_def = self.command_definition
+        use_shell = cmd_def.execution_mode == EXECUTION_MODES.SHELL
+        args, cwd = self.__make_command_line()
+        # The child runs in its own process group with the resource limits
+        # from the command definition applied.
+        limits = ResourceLimits.from_command_definition(cmd_def)
+        start = time.time()
+        spawn_histogram = \
+            MetricsRegistry.histogram('telex_command_spawn_seconds',
+                                      'Time taken to spawn the process of '
+                                      'shell commands.',
+                                      ('definition', 'execution_mode'))
+        with spawn_histogram.time(definition=cmd_def.name,
+                                  execution_mode=cmd_def.execution_mode), \
+             Tracer.span('spawn', execution_mode=cmd_def.execution_mode):
+            if cmd_def.execution_mode == EXECUTION_MODES.PYTHON_POOL:
+                # The script is run in a process forked from a warm
+                # interpreter for the executable.
+                pool = get_fork_server_pool(args[0])
+                child = pool.spawn(args[1:], limits, cwd=cwd,
+                                   env=self.environment)
+            else:
+                child = spawn(args, limits, shell=use_shell, cwd=cwd,
+                              env=self.environment)
+        proc = ChildProcess(child, is_shell=use_shell)
+        timeout = cmd_def.timeout
+        if not timeout is None:
+            timer = Timer(timeout, proc.kill, args=(COMMAND_STATUS.TIMED_OUT,))
+            timer.daemon = True
+            timer.start()
+        # The output is read incrementally and spooled to disk if it gets
+        # large (rather than being buffered in memory by communicate()).
+        capture = OutputCapture.from_settings()
+        # Make the output and the process available to other requests
+        # while the command is running.
+        CaptureRegistry.register(self.id, capture)
+        ProcessRegistry.register(self.id, proc)
+        try:
+            with Tracer.span('capture'):
+                capture.capture(child)
+                # The process is reaped with its resource usage.
+                exit_code, usage = wait_for_child(child)
+            wall_time = time.time() - start
+        finally:
+            ProcessRegistry.unregister(self.id)
+            CaptureRegistry.unregister(self.id)
+            if not timeout is None:
+                timer.cancel()
+            if cmd_def.execution_mode == EXECUTION_MODES.PYTHON_POOL:
+                # Returns the pool worker if capturing failed before the
+                # script was waited for.
+                child.release()
+        if not proc.kill_status is None:
+            status = proc.kill_status
+        elif proc.exceeded_limit(exit_code):
+            status = COMMAND_STATUS.LIMIT_EXCEEDED
+        else:
+            status = COMMAND_STATUS.FINISHED
+        return ShellCommandResult(status, exit_code, capture.output,
+                                  capture.errors, wall_time=wall_time,
+                                  resource_usage=usage)
+
+    def cancel(self):
+        """
+        Cancels this command. If the command is running, its process group
+        is killed; if it is waiting to be run, it is not run at all.
+
+        :returns: `True` if the command was cancelled; `False` if it is
+          not running or waiting to be run.
+        """
+        proc = ProcessRegistry.get(self.id)
+        if not proc is None:
+            result = proc.kill(COMMAND_STATUS.CANCELLED)
+        elif self.status in (COMMAND_STATUS.PENDING, COMMAND_STATUS.QUEUED):
+            self.status = COMMAND_STATUS.CANCELLED
+            result = True
+        else:
+            result = False
+        return result
+
+    @property
+    def output_string(self):
+        "Output generated during the execution (read lazily)."
+        spool = self.output_spool
+        return None if spool is None else spool.getvalue()
+
+    @output_string.setter
+    def output_string(self, value):
+        self.__output = None if value is None \
+                        else OutputSpool.from_string(value)
+        self.__unstored_streams |= frozenset([StoredOutput.OUTPUT])
+
+    @property
+    def error_string(self):
+        "Errors generated during the execution (read lazily)."
+        spool = self.error_spool
+        return None if spool is None else spool.getvalue()
+
+    @error_string.setter
+    def error_string(self, value):
+        self.__errors = None if value is None \
+                        else OutputSpool.from_string(value)
+        self.__unstored_streams |= frozenset([StoredOutput.ERRORS])
+
+    @property
+    def output_spool(self):
+        """
+        Spool holding the output generated during the execution (restored
+        from the persisted output, if necessary).
+        """
+        if self.__output is None:
+            self.__output = self.__load_output(StoredOutput.OUTPUT)
+        return self.__output
+
+    @property
+    def error_spool(self):
+        """
+        Spool holding the errors generated during the execution (restored
+        from the persisted output, if necessary).
+        """
+        if self.__errors is None:
+            self.__errors = self.__load_output(StoredOutput.ERRORS)
+        return self.__errors
+
+    @property
+    def is_output_truncated(self):
+        "Flag indicating that the persisted output was truncated."
+        return self.__is_truncated(StoredOutput.OUTPUT)
+
+    @property
+    def is_error_truncated(self):
+        "Flag indicating that the persisted errors were truncated."
+        return self.__is_truncated(StoredOutput.ERRORS)
+
+    def store_outputs(self):
+        """
+        Stores the spools of the output streams which were produced by a
+        run or set since the last call in the :attr:`stored_outputs`.
+
+        The output is only compressed for persistence when this is called
+        (by the RDB repository, before the command is flushed).
+        """
+        max_size = self.command_definition.max_output_size
+        for stream in sorted(self.__unstored_streams):
+            if stream == StoredOutput.OUTPUT:
+                spool = self.__output
+            else:
+                spool = self.__errors
+            self.__store_output(stream, spool, max_size)
+        self.__unstored_streams = frozenset()
+
+    def __store_output(self, stream, spool, max_size):
+        # Existing stored outputs are updated in place so the ORM does not
+        # have to replace the persisted row.
+        stored = self.stored_outputs.get(stream)
+        if spool is None:
+            if not stored is None:
+                del self.stored_outputs[stream]
+        else:
+            if stored is None:
+                stored = StoredOutput(stream)
+                self.stored_outputs[stream] = stored
+            stored.store_from_settings(spool, max_size=max_size)
+
+    def __load_output(self, stream):
+        if stream in self.__unstored_streams:
+            # The stored output is outdated.
+            result = None
+        else:
+            stored = (self.stored_outputs or {}).get(stream)
+            result = None if stored is None else stored.to_spool()
+        return result
+
+    def __is_truncated(self, stream):
+        stored = (self.stored_outputs or {}).get(stream)
+        if stored is None or stream in self.__unstored_streams:
+            result = False
+        else:
+            result = stored.is_truncated
+        return result
+
+    def __make_command_line(self):
+        # Returns the command line (a string for the shell execution mode,
+        # an argument list otherwise) and the working directory.
+        cmd_def = self.command_definition
+        use_shell = cmd_def.execution_mode == EXECUTION_MODES.SHELL
+        cwd = cmd_def.working_directory
         if cwd is None:
             # We use the path of the executable as default execution path.
-            exc = self.command_definition.executable
+            if use_shell:
+                exc = cmd_def.executable
+            else:
+                exc = cmd_def.executable_argv[0]
             cwd = os.path.dirname(exc)
             if cwd != '':
                 cwd = os.path.expandvars(cwd)
             else:
                 cwd = None
-        cmd_str = '%s %s' % (self.command_definition.executable,
-                             self.__format_parameters(self.parameters))
-        child = Popen(cmd_str,
-                      shell=True,
-                      cwd=cwd,
-                      env=self.environment,
-                      universal_newlines=True, stdout=PIPE, stderr=PIPE)
-        output_string, error_string = child.communicate()
-        self.output_string = output_string
-        self.error_string = error_string
-        self.exit_code = child.returncode
-
-    def __format_parameters(self, parameters):
+        if use_shell:
+            args = '%s %s' % (cmd_def.executable,
+                              ' '.join(self.__format_parameters(quote)))
+        else:
+            # In argv mode, we exec the target directly which saves the
+            # shell process and the quoting.
+            args = cmd_def.executable_argv \
+                   + self.__format_parameters(lambda value: value)
+        return args, cwd
+
+    def __format_parameters(self, quote_value):
+        cmd_def_info = CommandDefinitionCache.get(self.command_definition)
         prm_strings = []
-        for prm in parameters:
-            if not prm.parameter_definition.get_option('is_mandatory'):
+        for prm in self.parameters:
+            if not cmd_def_info.get_option(prm.parameter_definition.name,
+                                           'is_mandatory'):
                 # Optional argument (short or long).
                 if len(prm.parameter_definition.name) == 1:
                     prefix = '-%s' % prm.parameter_definition.name
@@ -376,12 +899,33 @@ class ShellCommand(Command):
             else:
                 # Positional argument.
                 prefix = ''
-            prm_strings.append(prefix + quote(str(prm.value)))
-        return ' '.join(prm_strings)
+            prm_strings.append(prefix + quote_value(str(prm.value)))
+        return prm_strings
+
+
+class RestCommandResult(object):
+    """
+    Result of the remote call of a REST command (see
+    :meth:`RestCommand.execute`).
+    """
+    def __init__(self, response, body, is_body_truncated):
+        #: The :class:`requests.Response` of the call.
+        self.response = response
+        #: Spool holding the (undecoded) response body.
+        self.body = body
+        #: Flag indicating that the response body was truncated.
+        self.is_body_truncated = is_body_truncated
+        #: Number of seconds the call took (set by
+        #: :meth:`RestCommand.execute`).
+        self.duration = None
 
 
 class RestCommand(Command):
     __response = None
+    #: Spool holding the response body.
+    __body = None
+    #: Flag indicating that the response body was truncated.
+    __is_body_truncated = False
 
     def __init__(self, command_definition, submitter, parameters, **kw):
         Command.__init__(self, command_definition, submitter, parameters,
@@ -389,18 +933,97 @@ class RestCommand(Command):
         self.command_type = 'REST'
 
     def run(self):
+        start = time.time()
+        try:
+            result = self.execute()
+        except Exception:
+            record_command_run(self, time.time() - start, has_failed=True)
+            raise
+        self.apply_result(result)
+
+    def make_request(self):
+        """
+        Returns a tuple holding the headers and the body of the request for
+        the remote call of this command.
+
+        The authorization of the current request is passed on, so this
+        needs to be called in the thread handling the current request.
+        """
         prms = dict([(prm.parameter_definition.name, prm.value)
                      for prm in self.parameters])
         headers = \
             {'content-type': self.command_definition.request_content_type,
              }
         cr = get_current_request()
-        if not cr.authorization is None:
+        if not cr is None and not cr.authorization is None:
             headers['authorization'] = ' '.join(cr.authorization)
-        self.__response = requests.request(self.command_definition.operation,
-                                           self.command_definition.url,
-                                           headers=headers,
-                                           data=json.dumps(prms))
+        return headers, json.dumps(prms)
+
+    def execute(self, request=None, response_callback=None):
+        """
+        Makes the remote call of this command and returns a
+        :class:`RestCommandResult`.
+
+        This does not modify the command, so it can be called in a thread
+        other than the one owning the repository session of the command;
+        the result is then applied with :meth:`apply_result` in the owning
+        thread.
+
+        :param tuple request: Headers and body of the request as returned
+          by :meth:`make_request` (called in the owning thread); built
+          here if not given.
+        :param response_callback: Optional callable which is passed the
+          response as soon as its headers have been read (before the body
+          is read).
+        """
+        if request is None:
+            request = self.make_request()
+        start = time.time()
+        cmd_def_name = self.command_definition.name
+        with Tracer.span('run', definition=cmd_def_name), \
+             Profiler.profile(cmd_def_name):
+            result = self.__execute(request, response_callback)
+        result.duration = time.time() - start
+        return result
+
+    def apply_result(self, result):
+        """
+        Sets the response of the given :class:`RestCommandResult` on this
+        command, sets the status to FINISHED and records the metrics for
+        the run.
+        """
+        self.__response = result.response
+        self.__body = result.body
+        self.__is_body_truncated = result.is_body_truncated
+        self.status = COMMAND_STATUS.FINISHED
+        record_command_run(self, result.duration,
+                           output_sizes=dict(response=result.body.size))
+
+    def __execute(self, request, response_callback):
+        headers, data = request
+        # Connections to the target host are pooled and reused. The
+        # response body is streamed into a spool (which goes to disk for
+        # large bodies) rather than being buffered in memory as a whole.
+        rsp = send_request(self.command_definition,
+                           self.command_definition.url,
+                           headers=dict(headers),
+                           data=data,
+                           stream=True)
+        if not response_callback is None:
+            response_callback(rsp)
+        body = OutputSpool(
+                    memory_threshold=
+                        get_setting('telex.capture.memory_threshold', None,
+                                    int),
+                    spool_directory=
+                        get_setting('telex.capture.spool_directory'))
+        is_body_truncated = spool_response_body(
+                    rsp, body,
+                    max_size=get_setting('telex.rest.max_body_size', None,
+                                         int),
+                    chunk_size=get_setting('telex.capture.chunk_size', 65536,
+                                           int))
+        return RestCommandResult(rsp, body, is_body_truncated)
 
     @property
     def response(self):
@@ -418,11 +1041,32 @@ class RestCommand(Command):
         rsp = self.__response
         return None if rsp is None else rsp.headers
 
+    @property
+    def response_spool(self):
+        "Spool holding the (undecoded) body from the REST call response."
+        return self.__body
+
+    @property
+    def is_response_truncated(self):
+        "Flag indicating that the response body was truncated."
+        return self.__is_body_truncated
+
     @property
     def response_body(self):
-        "Body from the REST call response (unicode)."
+        """
+        Body from the REST call response (unicode). This is `None` if the
+        response content type of the command definition is not textual
+        (use the :attr:`response_spool` to get at the raw body then).
+        """
         rsp = self.__response
-        return None if rsp is None else rsp.text
+        if rsp is None \
+           or not is_text_content_type(
+                        self.command_definition.response_content_type or ''):
+            body = None
+        else:
+            body = self.__body.read().decode(rsp.encoding or 'utf-8',
+                                             'replace')
+        return body
 
 
 class Parameter(Entity):
@@ -0,0 +1,453 @@
+"""
+Pool of warm Python interpreters for the telex server.
+
+Each pool worker is a long-running Python process which has its modules
+(and any configured preload modules) imported already. To run a script,
+the worker forks; the forked child applies the resource limits, connects
+its standard output and standard error streams to named pipes opened by
+the server and runs the script in the usual `__main__` environment. This
+saves the interpreter startup and import time for every command run.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import fcntl
+import json
+import os
+import random
+import runpy
+import shutil
+import signal
+from subprocess import PIPE
+from subprocess import Popen
+import sys
+from tempfile import mkdtemp
+from threading import Condition
+from threading import Lock
+import time
+import traceback
+
+from pyramid.compat import iteritems_
+from pyramid.compat import native_
+from pyramid.threadlocal import get_current_registry
+
+from telex.interfaces import IForkServerPool
+from telex.process import ResourceLimits
+from telex.process import ResourceUsage
+from telex.utils import get_setting
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['ForkServerError',
+           'ForkServerPool',
+           'PooledProcess',
+           'get_fork_server_pool',
+           'main',
+           ]
+
+
+class ForkServerError(Exception):
+    """
+    Raised when a pool worker fails to start a script.
+    """
+    pass
+
+
+class ForkServerPool(object):
+    """
+    Pool of fork server worker processes for one Python interpreter.
+
+    Workers are started on demand up to the configured pool size; each
+    worker runs one script at a time.
+    """
+    def __init__(self, interpreter=None, size=4, preload=None,
+                 checkout_timeout=None):
+        """
+        :param str interpreter: Python executable to run the workers with;
+          defaults to the interpreter running the server. The telex package
+          needs to be importable for this interpreter.
+        :param int size: Maximum number of worker processes.
+        :param list preload: Names of modules to import in the workers
+          before any script is run.
+        :param float checkout_timeout: Maximum number of seconds to wait
+          for an idle worker (no limit if `None`).
+        """
+        if interpreter is None:
+            interpreter = sys.executable
+        self.__interpreter = interpreter
+        self.__size = size
+        if preload is None:
+            preload = []
+        self.__preload = preload
+        self.__checkout_timeout = checkout_timeout
+        self.__workers = []
+        self.__idle = []
+        self.__cond = Condition()
+
+    def spawn(self, args, limits, cwd=None, env=None):
+        """
+        Runs the given Python script (or module, if the first argument is
+        "-m") in a worker of this pool.
+
+        :param list args: Argument vector without the interpreter, i.e.,
+          the script path followed by the script arguments.
+        :param limits: :class:`telex.process.ResourceLimits` instance.
+        :returns: :class:`PooledProcess` instance. Its worker is returned
+          to the pool by :meth:`PooledProcess.wait` or, if the script is
+          not waited for, by :meth:`PooledProcess.release`.
+        :raises ForkServerError: If no worker becomes available within the
+          checkout timeout or the worker fails to start the script.
+        """
+        if not args or (args[0].startswith('-') and args[0] != '-m'):
+            raise ValueError('Can only run a script or a module ("-m") in '
+                             'a Python interpreter pool.')
+        fifo_dir = mkdtemp(prefix='telex-')
+        paths = [os.path.join(fifo_dir, name)
+                 for name in ('stdout', 'stderr')]
+        fds = []
+        try:
+            for path in paths:
+                os.mkfifo(path, 0o600)
+                # Opening without blocking succeeds before the worker opens
+                # the writing end.
+                fds.append(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+            worker = self.__checkout()
+            try:
+                msg = worker.call(dict(args=args,
+                                       cwd=cwd,
+                                       env=env,
+                                       limits=dict(
+                                            cpu_time=limits.cpu_time,
+                                            address_space=
+                                                    limits.address_space,
+                                            open_files=limits.open_files),
+                                       stdout=paths[0],
+                                       stderr=paths[1]))
+                if 'error' in msg:
+                    raise ForkServerError(msg['error'])
+            except:
+                self.release(worker)
+                raise
+        except:
+            for fd in fds:
+                os.close(fd)
+            raise
+        finally:
+            shutil.rmtree(fifo_dir, ignore_errors=True)
+        for fd in fds:
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags & ~os.O_NONBLOCK)
+        return PooledProcess(self, worker, msg['pid'],
+                             os.fdopen(fds[0], 'rb'),
+                             os.fdopen(fds[1], 'rb'))
+
+    def release(self, worker):
+        """
+        Returns the given worker to the pool after a script has finished
+        (or failed to start). Broken workers are discarded.
+        """
+        with self.__cond:
+            if worker.is_alive:
+                self.__idle.append(worker)
+            else:
+                worker.terminate()
+                self.__workers.remove(worker)
+            self.__cond.notify()
+
+    def shutdown(self):
+        """
+        Terminates all idle workers. Busy workers exit when their script
+        has finished.
+        """
+        with self.__cond:
+            for worker in self.__idle:
+                worker.terminate()
+                self.__workers.remove(worker)
+            self.__idle = []
+
+    def __checkout(self):
+        if self.__checkout_timeout is None:
+            deadline = None
+        else:
+            deadline = time.time() + self.__checkout_timeout
+        with self.__cond:
+            while True:
+                if self.__idle:
+                    worker = self.__idle.pop()
+                    break
+                elif len(self.__workers) < self.__size:
+                    worker = _Worker(self.__interpreter, self.__preload)
+                    self.__workers.append(worker)
+                    break
+                if deadline is None:
+                    self.__cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise ForkServerError('No pool worker became '
+                                              'available within %s seconds.'
+                                              % self.__checkout_timeout)
+                    self.__cond.wait(remaining)
+        return worker
+
+
+class PooledProcess(object):
+    """
+    Handle for a script run by a pool worker.
+
+    Mimics the parts of the :class:`subprocess.Popen` interface used for
+    running shell commands (`pid`, `stdout`, `stderr`, `wait`). The
+    process runs in its own session, so it can be killed through its
+    process group like any other command process.
+    """
+    def __init__(self, pool, worker, pid, stdout, stderr):
+        self.__pool = pool
+        self.__worker = worker
+        #: Process ID of the process running the script.
+        self.pid = pid
+        #: Standard output stream of the process.
+        self.stdout = stdout
+        #: Standard error stream of the process.
+        self.stderr = stderr
+        #: Exit code of the process (`None` while the script is running).
+        self.returncode = None
+        #: :class:`telex.process.ResourceUsage` of the process (`None`
+        #: while the script is running).
+        self.resource_usage = None
+        self.__is_released = False
+
+    def wait(self):
+        """
+        Waits for the script to finish and returns its exit code. A
+        negative exit code -N indicates that the process was terminated
+        by signal N.
+        """
+        if self.returncode is None:
+            try:
+                msg = self.__worker.read()
+            finally:
+                self.__release_worker()
+            self.returncode = msg['exit_code']
+            self.resource_usage = \
+                        ResourceUsage.from_dict(msg['resource_usage'])
+        return self.returncode
+
+    def release(self):
+        """
+        Returns the worker to the pool if the script was not waited for
+        (e.g., because reading its output failed). A script that is still
+        running is killed first. Does nothing if the worker was returned
+        already.
+        """
+        if not self.__is_released:
+            try:
+                os.killpg(self.pid, signal.SIGKILL)
+            except OSError:
+                # The script has finished already.
+                pass
+            try:
+                self.wait()
+            except ForkServerError:
+                # The broken worker has been discarded.
+                pass
+
+    def __release_worker(self):
+        if not self.__is_released:
+            self.__is_released = True
+            self.__pool.release(self.__worker)
+
+
+class _Worker(object):
+    """
+    Server side of a fork server worker process.
+    """
+    def __init__(self, interpreter, preload):
+        env = os.environ.copy()
+        telex_path = os.path.dirname(os.path.dirname(
+                                            os.path.abspath(__file__)))
+        env['PYTHONPATH'] = os.pathsep.join(
+                                [telex_path] +
+                                [p for p in [env.get('PYTHONPATH')] if p])
+        self.__process = Popen([interpreter, '-m', 'telex.forkserver']
+                               + list(preload),
+                               stdin=PIPE, stdout=PIPE, close_fds=True,
+                               env=env)
+        self.__is_broken = False
+
+    def call(self, request):
+        """
+        Sends the given request and reads the response.
+        """
+        try:
+            self.__process.stdin.write(
+                            (json.dumps(request) + '\n').encode('utf-8'))
+            self.__process.stdin.flush()
+        except (IOError, OSError) as err:
+            self.__is_broken = True
+            raise ForkServerError('Could not send request to pool worker '
+                                  '(%s).' % err)
+        return self.read()
+
+    def read(self):
+        """
+        Reads the next message from the worker.
+        """
+        line = self.__process.stdout.readline()
+        if not line:
+            self.__is_broken = True
+            raise ForkServerError('Pool worker exited unexpectedly.')
+        return json.loads(line.decode('utf-8'))
+
+    def terminate(self):
+        if self.__process.poll() is None:
+            # Closing the request pipe makes the worker exit.
+            self.__process.stdin.close()
+            self.__process.wait()
+
+    @property
+    def is_alive(self):
+        return not self.__is_broken and self.__process.poll() is None
+
+
+_fork_server_pools_lock = Lock()
+
+
+def get_fork_server_pool(interpreter):
+    """
+    Returns the fork server pool for the given Python interpreter that is
+    registered with the current registry, creating it from the
+    "telex.forkserver.*" application settings on first use.
+    """
+    reg = get_current_registry()
+    pool = reg.queryUtility(IForkServerPool, name=interpreter)
+    if pool is None:
+        with _fork_server_pools_lock:
+            pool = reg.queryUtility(IForkServerPool, name=interpreter)
+            if pool is None:
+                pool = ForkServerPool(
+                        interpreter=interpreter,
+                        size=get_setting('telex.forkserver.pool_size',
+                                         4, int),
+                        preload=get_setting('telex.forkserver.preload',
+                                            '').split(),
+                        checkout_timeout=get_setting(
+                                    'telex.forkserver.checkout_timeout',
+                                    None, float))
+                reg.registerUtility(pool, IForkServerPool, name=interpreter)
+    return pool
+
+
+def _run_script(request, out_fd, err_fd, ready_fd):
+    # Runs in the forked child; never returns.
+    exit_code = 1
+    try:
+        os.dup2(out_fd, 1)
+        os.dup2(err_fd, 2)
+        os.close(out_fd)
+        os.close(err_fd)
+        # Start a new session and apply the limits before we let the
+        # worker report our PID.
+        ResourceLimits(**request['limits'])()
+        os.close(ready_fd)
+        if not request['cwd'] is None:
+            os.chdir(native_(request['cwd']))
+        if not request['env'] is None:
+            os.environ.clear()
+            for key, value in iteritems_(request['env']):
+                os.environ[native_(key)] = native_(value)
+        # Do not share the random state with the other children.
+        random.seed()
+        args = [native_(arg) for arg in request['args']]
+        if args[0] == '-m':
+            sys.argv = args[1:]
+            sys.path[0] = os.getcwd()
+            runpy.run_module(args[1], run_name='__main__', alter_sys=True)
+        else:
+            sys.argv = args
+            sys.path[0] = os.path.dirname(os.path.abspath(args[0]))
+            runpy.run_path(args[0], run_name='__main__')
+        exit_code = 0
+    except SystemExit as exc:
+        if exc.code is None:
+            exit_code = 0
+        elif isinstance(exc.code, int):
+            exit_code = exc.code
+        else:
+            sys.stderr.write('%s\n' % exc.code)
+    except BaseException: # pylint: disable=W0703
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code) # pylint: disable=W0212
+
+
+def main(preload):
+    """
+    Fork server worker main loop.
+
+    Reads JSON requests from stdin, one per line, and writes JSON
+    responses to stdout: for each script run, a message holding the PID
+    of the forked child followed by a message holding its exit code.
+    """
+    for name in preload:
+        __import__(name)
+    # Keep the request pipes for ourselves and point the standard streams
+    # at /dev/null so output from preloaded modules can not interfere.
+    ctl_in = os.fdopen(os.dup(0), 'rb')
+    ctl_out = os.fdopen(os.dup(1), 'wb')
+    null_fd = os.open(os.devnull, os.O_RDWR)
+    os.dup2(null_fd, 0)
+    os.dup2(null_fd, 1)
+    os.close(null_fd)
+
+    def respond(msg):
+        ctl_out.write((json.dumps(msg) + '\n').encode('utf-8'))
+        ctl_out.flush()
+    while True:
+        line = ctl_in.readline()
+        if not line:
+            break
+        request = json.loads(line.decode('utf-8'))
+        fds = []
+        try:
+            for name in ('stdout', 'stderr'):
+                fds.append(os.open(request[name], os.O_WRONLY))
+        except OSError as err:
+            for fd in fds:
+                os.close(fd)
+            respond(dict(error=str(err)))
+            continue
+        out_fd, err_fd = fds
+        ready_r, ready_w = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            ctl_in.close()
+            ctl_out.close()
+            _run_script(request, out_fd, err_fd, ready_w)
+        os.close(ready_w)
+        os.close(out_fd)
+        os.close(err_fd)
+        # Wait for the child to start its session.
+        os.read(ready_r, 1)
+        os.close(ready_r)
+        respond(dict(pid=pid))
+        _, status, rusage = os.wait4(pid, 0)
+        if os.WIFSIGNALED(status):
+            exit_code = -os.WTERMSIG(status)
+        else:
+            exit_code = os.WEXITSTATUS(status)
+        respond(dict(exit_code=exit_code,
+                     resource_usage=
+                        ResourceUsage.from_rusage(rusage).to_dict()))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -12,8 +12,13 @@ from zope.interface import Interface # pylint: disable=F0401
 __docformat__ = 'reStructuredText en'
 __all__ = ['ICommand',
            'ICommandDefinition',
+           'ICommandPruner',
+           'IForkServerPool',
+           'IJobQueue',
            'IParameter',
            'IParameterDefinition',
+           'IRestEngine',
+           'IResultCache',
            ]
 
 
@@ -52,5 +57,25 @@ class IRestCommand(ICommand):
 
 class IParameter(Interface):
     pass
+
+
+class IJobQueue(Interface):
+    pass
+
+
+class IForkServerPool(Interface):
+    pass
+
+
+class ICommandPruner(Interface):
+    pass
+
+
+class IResultCache(Interface):
+    pass
+
+
+class IRestEngine(Interface):
+    pass
 # pylint: enable=W0232
 
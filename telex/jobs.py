@@ -0,0 +1,344 @@
+"""
+Asynchronous command execution for the telex server.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import logging
+from threading import BoundedSemaphore
+from threading import Lock
+from threading import Thread
+import time
+
+from pyramid.threadlocal import get_current_registry
+from pyramid.threadlocal import manager
+import transaction
+
+from everest.resources.utils import get_root_collection
+from telex.compat import Empty
+from telex.compat import Queue
+from telex.constants import COMMAND_STATUS
+from telex.interfaces import IJobQueue
+from telex.metrics import MetricsRegistry
+from telex.metrics import record_command_run
+from telex.process import ProcessPlaceholder
+from telex.process import ProcessRegistry
+from telex.utils import get_setting
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['CommandJob',
+           'JobQueue',
+           'JobQueueFull',
+           'get_job_queue',
+           'run_commands',
+           ]
+
+
+class JobQueueFull(Exception):
+    """
+    Raised when a job queue can not accept any more jobs.
+    """
+    pass
+
+
+class JobQueue(object):
+    """
+    Bounded pool of worker threads executing jobs from a queue.
+
+    At most :attr:`max_workers` jobs run concurrently and at most
+    :attr:`max_queue_size` further jobs wait for a free worker. Callers
+    need to :meth:`reserve` a slot before they :meth:`submit` a job; the
+    slot is released when the job has been processed.
+    """
+    def __init__(self, max_workers=4, max_queue_size=16, retry_after=5):
+        #: Maximum number of concurrently running jobs.
+        self.max_workers = max_workers
+        #: Maximum number of jobs waiting for a free worker.
+        self.max_queue_size = max_queue_size
+        #: Number of seconds clients are asked to wait before resubmitting
+        #: when the queue is full.
+        self.retry_after = retry_after
+        self.__slots = BoundedSemaphore(max_workers + max_queue_size)
+        self.__queue = Queue()
+        self.__workers = []
+        self.__lock = Lock()
+        self.__logger = logging.getLogger(__name__)
+
+    def reserve(self):
+        """
+        Reserves a slot for a new job.
+
+        :raises JobQueueFull: If all slots are taken.
+        """
+        if not self.__slots.acquire(False):
+            raise JobQueueFull('Job queue is full.')
+
+    def release(self):
+        """
+        Releases a slot reserved with :meth:`reserve`.
+        """
+        self.__slots.release()
+
+    def submit(self, job):
+        """
+        Submits the given job (a callable taking no arguments) for
+        execution. A slot needs to have been reserved before.
+        """
+        self.__start_workers()
+        self.__queue.put(job)
+
+    def submit_on_commit(self, job):
+        """
+        Submits the given job once the current transaction has been
+        committed successfully; if the transaction is aborted, the reserved
+        slot is released again.
+        """
+        transaction.get().join(_JobSubmitter(self, job))
+
+    def shutdown(self):
+        """
+        Stops all worker threads after all queued jobs have been processed.
+        """
+        with self.__lock:
+            workers = self.__workers
+            self.__workers = []
+        for _ in workers:
+            self.__queue.put(None)
+        for worker in workers:
+            worker.join()
+
+    def __start_workers(self):
+        with self.__lock:
+            while len(self.__workers) < self.max_workers:
+                worker = Thread(target=self.__work,
+                                name='telex-job-worker-%d'
+                                     % len(self.__workers))
+                worker.daemon = True
+                worker.start()
+                self.__workers.append(worker)
+
+    def __work(self):
+        while True:
+            job = self.__queue.get()
+            if job is None:
+                break
+            try:
+                job()
+            except Exception: # catch Exception pylint: disable=W0703
+                self.__logger.exception('Error processing job %s.', job)
+            finally:
+                self.release()
+
+
+class _JobSubmitter(object):
+    """
+    Transaction data manager which submits a job to a job queue after the
+    transaction was committed.
+    """
+    def __init__(self, job_queue, job):
+        self.__job_queue = job_queue
+        self.__job = job
+        self.__is_done = False
+        self.transaction_manager = transaction.manager
+
+    def abort(self, trx): # unused arg pylint: disable=W0613
+        self.__release()
+
+    def tpc_begin(self, trx):
+        pass
+
+    def commit(self, trx):
+        pass
+
+    def tpc_vote(self, trx):
+        pass
+
+    def tpc_finish(self, trx): # unused arg pylint: disable=W0613
+        if not self.__is_done:
+            self.__is_done = True
+            self.__job_queue.submit(self.__job)
+
+    def tpc_abort(self, trx): # unused arg pylint: disable=W0613
+        self.__release()
+
+    def sortKey(self): # invalid name pylint: disable=C0103
+        # Sort last so the job only gets submitted after all other
+        # resources (in particular, the repositories) have committed.
+        return '~telex.jobs:%d' % id(self)
+
+    def __release(self):
+        # Both abort and tpc_abort may be called for a failed commit.
+        if not self.__is_done:
+            self.__is_done = True
+            self.__job_queue.release()
+
+
+class CommandJob(object):
+    """
+    Job running a previously persisted command in a worker thread.
+
+    The command is loaded from its root collection in a new transaction,
+    so the job can only run after the transaction that created the command
+    has been committed.
+    """
+    def __init__(self, registry, command_interface, command_name):
+        self.__registry = registry
+        self.__command_interface = command_interface
+        self.__command_name = command_name
+        self.__submitted = time.time()
+        self.__logger = logging.getLogger(__name__)
+
+    def __call__(self):
+        manager.push(dict(registry=self.__registry, request=None))
+        try:
+            self.__run()
+        finally:
+            manager.pop()
+
+    def __repr__(self):
+        return '<%s %s/%s>' % (self.__class__.__name__,
+                               self.__command_interface.__name__,
+                               self.__command_name)
+
+    def __run(self):
+        # The placeholder allows cancelling the command after its status
+        # was set to RUNNING and before its process is started.
+        placeholder = ProcessPlaceholder()
+        cmd_id = None
+        try:
+            with transaction.manager:
+                cmd_ent = self.__load()
+                if cmd_ent is None:
+                    return
+                MetricsRegistry.histogram(
+                            'telex_command_queue_wait_seconds',
+                            'Time asynchronous commands wait in the job '
+                            'queue.',
+                            ('definition', 'command_type')) \
+                        .observe(time.time() - self.__submitted,
+                                 definition=cmd_ent.command_definition.name,
+                                 command_type=cmd_ent.command_type)
+                # The command may have been cancelled while it was queued.
+                if cmd_ent.status == COMMAND_STATUS.CANCELLED:
+                    return
+                cmd_id = cmd_ent.id
+                ProcessRegistry.register(cmd_id, placeholder)
+                cmd_ent.status = COMMAND_STATUS.RUNNING
+            try:
+                with transaction.manager:
+                    cmd_ent = self.__load()
+                    if cmd_ent is None:
+                        return
+                    if not placeholder.kill_status is None:
+                        cmd_ent.status = placeholder.kill_status
+                    else:
+                        cmd_ent.run()
+            except Exception:
+                self.__update_status(COMMAND_STATUS.FAILED)
+                raise
+        finally:
+            if not cmd_id is None:
+                ProcessRegistry.unregister(cmd_id)
+
+    def __update_status(self, status):
+        with transaction.manager:
+            cmd_ent = self.__load()
+            if not cmd_ent is None:
+                cmd_ent.status = status
+
+    def __load(self):
+        # The command may have been deleted in the meantime.
+        coll = get_root_collection(self.__command_interface)
+        cmd_mb = coll.get(self.__command_name)
+        if cmd_mb is None:
+            self.__logger.info('Command %s was deleted before it was run.',
+                               self.__command_name)
+            cmd_ent = None
+        else:
+            cmd_ent = cmd_mb.get_entity()
+        return cmd_ent
+
+
+def run_commands(commands, max_workers):
+    """
+    Runs the given command entities concurrently in up to `max_workers`
+    threads and waits until all of them have finished.
+
+    The repository session of the commands is not thread-safe, so the
+    worker threads only run the command processes (see
+    :meth:`telex.entities.ShellCommand.execute`); the results are applied
+    to the commands in the calling thread. The commands need to have IDs
+    (i.e., they need to have been flushed to the repository). The worker
+    threads see the registry of the calling thread. Errors are logged and
+    set the status of the failing command to FAILED; they do not affect
+    the other commands.
+    """
+    commands = list(commands)
+    threadlocals = dict(registry=manager.get()['registry'], request=None)
+    cmd_queue = Queue()
+    for cmd in commands:
+        cmd_queue.put(cmd)
+    # Maps command indices to (result, duration) tuples; the result is
+    # `None` if running the command raised an error.
+    results = {}
+    indices = dict([(id(cmd), idx) for (idx, cmd) in enumerate(commands)])
+    logger = logging.getLogger(__name__)
+
+    def work():
+        manager.push(threadlocals)
+        try:
+            while True:
+                try:
+                    cmd = cmd_queue.get(False)
+                except Empty:
+                    break
+                start = time.time()
+                try:
+                    result = cmd.execute()
+                except Exception: # catch Exception pylint: disable=W0703
+                    logger.exception('Error running command %s.', cmd)
+                    result = None
+                results[indices[id(cmd)]] = (result, time.time() - start)
+        finally:
+            manager.pop()
+    workers = [Thread(target=work, name='telex-batch-worker-%d' % idx)
+               for idx in range(min(max_workers, len(commands)))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    for idx, cmd in enumerate(commands):
+        result, duration = results[idx]
+        if result is None:
+            cmd.status = COMMAND_STATUS.FAILED
+            record_command_run(cmd, duration, has_failed=True)
+        else:
+            cmd.apply_result(result)
+
+
+_job_queue_lock = Lock()
+
+
+def get_job_queue():
+    """
+    Returns the job queue registered with the current registry, creating
+    it from the "telex.jobs.*" application settings on first use.
+    """
+    reg = get_current_registry()
+    job_queue = reg.queryUtility(IJobQueue)
+    if job_queue is None:
+        with _job_queue_lock:
+            job_queue = reg.queryUtility(IJobQueue)
+            if job_queue is None:
+                job_queue = JobQueue(
+                    max_workers=get_setting('telex.jobs.max_workers',
+                                            4, int),
+                    max_queue_size=get_setting('telex.jobs.max_queue_size',
+                                               16, int),
+                    retry_after=get_setting('telex.jobs.retry_after',
+                                            5, int))
+                reg.registerUtility(job_queue, IJobQueue)
+    return job_queue
@@ -0,0 +1,275 @@
+"""
+Metrics for the telex server.
+
+Counters and histograms are kept in a process-wide registry and rendered
+in the Prometheus text exposition format by the "metrics" service view.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+import time
+
+from telex.constants import COMMAND_STATUS
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['Counter',
+           'DURATION_BUCKETS',
+           'Histogram',
+           'MetricsRegistry',
+           'SIZE_BUCKETS',
+           'record_command_run',
+           ]
+
+
+#: Default histogram buckets for durations (in seconds).
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0, 30.0, 60.0, 300.0)
+#: Default histogram buckets for sizes (in bytes).
+SIZE_BUCKETS = tuple([256 * 4 ** exp for exp in range(11)])
+
+
+class _Metric(object):
+    """
+    Base class for metrics with a fixed set of label names.
+    """
+    #: Metric type name in the exposition format.
+    type_name = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = Lock()
+
+    def _get_key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError('Metric "%s" needs the labels %s.'
+                             % (self.name, ', '.join(self.label_names)))
+        return tuple([str(labels[name]) for name in self.label_names])
+
+    def render(self):
+        """
+        Returns the lines for this metric in the text exposition format.
+        """
+        lines = ['# HELP %s %s' % (self.name, _escape(self.help_text, False)),
+                 '# TYPE %s %s' % (self.name, self.type_name)]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        raise NotImplementedError('Abstract method.')
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.label_names, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{%s}' % ','.join(['%s="%s"' % (name, _escape(value, True))
+                                  for (name, value) in pairs])
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count.
+    """
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        Increments the count for the given label values.
+        """
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """
+        Returns the count for the given label values.
+        """
+        with self._lock:
+            return self._values.get(self._get_key(labels), 0)
+
+    def _render_value(self, key, value):
+        return ['%s%s %s' % (self.name, self._format_labels(key),
+                             _format_number(value))]
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values over a fixed set of buckets.
+    """
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(),
+                 buckets=DURATION_BUCKETS):
+        _Metric.__init__(self, name, help_text, label_names=label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """
+        Records the given value for the given label values.
+        """
+        key = self._get_key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, (None, 0))
+            if counts is None:
+                # One count per bucket plus one for the "+Inf" bucket.
+                counts = [0] * (len(self.buckets) + 1)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Context manager observing the number of seconds spent in its
+        block.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - start, **labels)
+
+    def get_count(self, **labels):
+        """
+        Returns the number of values observed for the given label values.
+        """
+        with self._lock:
+            counts, _ = self._values.get(self._get_key(labels), ((), 0))
+            return sum(counts)
+
+    def _render_value(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (None,), counts):
+            cumulative += count
+            le = '+Inf' if bound is None else _format_number(bound)
+            lines.append('%s_bucket%s %d'
+                         % (self.name,
+                            self._format_labels(key, [('le', le)]),
+                            cumulative))
+        labels = self._format_labels(key)
+        lines.append('%s_sum%s %s' % (self.name, labels,
+                                      _format_number(total)))
+        lines.append('%s_count%s %d' % (self.name, labels, cumulative))
+        return lines
+
+
+class MetricsRegistry(object):
+    """
+    Process-wide registry of metrics.
+    """
+    __metrics = {}
+    __lock = Lock()
+
+    @classmethod
+    def counter(cls, name, help_text, label_names=()):
+        """
+        Returns the counter with the given name, creating it on first use.
+        """
+        return cls.__get(Counter, name, help_text, label_names)
+
+    @classmethod
+    def histogram(cls, name, help_text, label_names=(),
+                  buckets=DURATION_BUCKETS):
+        """
+        Returns the histogram with the given name, creating it on first
+        use.
+        """
+        return cls.__get(Histogram, name, help_text, label_names,
+                         buckets=buckets)
+
+    @classmethod
+    def render(cls):
+        """
+        Returns all metrics in the text exposition format.
+        """
+        with cls.__lock:
+            metrics = sorted(cls.__metrics.items())
+        lines = []
+        for _, metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def clear(cls):
+        """
+        Removes all metrics.
+        """
+        with cls.__lock:
+            cls.__metrics.clear()
+
+    @classmethod
+    def __get(cls, metric_class, name, help_text, label_names, **kw):
+        with cls.__lock:
+            metric = cls.__metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, help_text,
+                                      label_names=label_names, **kw)
+                cls.__metrics[name] = metric
+            elif not isinstance(metric, metric_class) \
+                 or metric.label_names != tuple(label_names):
+                raise ValueError('Metric "%s" is already registered with a '
+                                 'different type or labels.' % name)
+        return metric
+
+
+def record_command_run(command, duration, has_failed=False,
+                       output_sizes=None):
+    """
+    Records the metrics for a finished run of the given command entity.
+
+    :param float duration: Number of seconds the run took.
+    :param bool has_failed: Flag indicating that the run raised an
+      exception.
+    :param dict output_sizes: Maps output stream names to the number of
+      bytes the command produced on them.
+    """
+    labels = dict(definition=command.command_definition.name,
+                  command_type=command.command_type)
+    status = COMMAND_STATUS.FAILED if has_failed else command.status
+    MetricsRegistry.histogram('telex_command_run_seconds',
+                              'Duration of command runs.',
+                              ('definition', 'command_type')) \
+                   .observe(duration, **labels)
+    MetricsRegistry.counter('telex_command_runs_total',
+                            'Number of command runs by final status.',
+                            ('definition', 'command_type', 'status')) \
+                   .inc(status=status, **labels)
+    exit_code = getattr(command, 'exit_code', None)
+    if not exit_code is None and not has_failed:
+        MetricsRegistry.counter('telex_command_exit_codes_total',
+                                'Number of command runs by exit code.',
+                                ('definition', 'command_type', 'exit_code')) \
+                       .inc(exit_code=exit_code, **labels)
+    for stream, size in sorted((output_sizes or {}).items()):
+        MetricsRegistry.histogram('telex_command_output_bytes',
+                                  'Size of the command output.',
+                                  ('definition', 'command_type', 'stream'),
+                                  buckets=SIZE_BUCKETS) \
+                       .observe(size, stream=stream, **labels)
+
+
+def _escape(value, is_label_value):
+    value = str(value).replace('\\', '\\\\').replace('\n', '\\n')
+    if is_label_value:
+        value = value.replace('"', '\\"')
+    return value
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        result = repr(value)
+    else:
+        result = str(value)
+    return result
@@ -0,0 +1,84 @@
+"""
+Keyset paging for the telex server.
+
+Command collections are paged by the `(timestamp, id)` key of the last
+command on a page rather than by offset, so fetching a page costs the
+same no matter how deep into the command history it is.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import base64
+import json
+
+import iso8601
+from pyramid.compat import bytes_
+from pyramid.compat import integer_types
+from pyramid.compat import native_
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['InvalidCursor',
+           'decode_cursor',
+           'encode_cursor',
+           'make_keyset_specification',
+           ]
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a paging cursor can not be decoded.
+    """
+    pass
+
+
+def encode_cursor(timestamp, id): # pylint: disable=W0622
+    """
+    Encodes the given key of the last item on a page as opaque, URL safe
+    cursor string.
+    """
+    data = json.dumps([timestamp.isoformat(), id])
+    return native_(base64.urlsafe_b64encode(bytes_(data)))
+
+
+def decode_cursor(cursor):
+    """
+    Decodes the given cursor string into the `(timestamp, id)` key it was
+    created from.
+
+    :raises InvalidCursor: If the cursor is malformed.
+    """
+    try:
+        data = base64.urlsafe_b64decode(bytes_(cursor))
+        timestamp_string, id = json.loads(native_(data)) # pylint: disable=W0622
+        # Naive timestamps stay naive so they compare with the stored
+        # values.
+        timestamp = iso8601.parse_date(timestamp_string,
+                                       default_timezone=None)
+        if not isinstance(id, integer_types):
+            raise ValueError('Invalid ID.')
+    except Exception: # catch Exception pylint: disable=W0703
+        raise InvalidCursor('Invalid paging cursor "%s".' % cursor)
+    return timestamp, id
+
+
+def make_keyset_specification(spec_factory, timestamp, id, # pylint: disable=W0622
+                              descending=False):
+    """
+    Creates a filter specification selecting the items following the item
+    with the given key in `(timestamp, id)` order (or preceding it, if
+    `descending` is set).
+
+    :param spec_factory: Filter specification factory.
+    """
+    if descending:
+        create_op = spec_factory.create_less_than
+    else:
+        create_op = spec_factory.create_greater_than
+    return spec_factory.create_disjunction(
+                create_op('timestamp', timestamp),
+                spec_factory.create_conjunction(
+                        spec_factory.create_equal_to('timestamp', timestamp),
+                        create_op('id', id)))
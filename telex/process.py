@@ -0,0 +1,301 @@
+"""
+Child process management for the telex server.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import errno
+import os
+import resource
+import signal
+import sys
+from subprocess import PIPE
+from subprocess import Popen
+from threading import Event
+from threading import Lock
+
+from pyramid.compat import PY3
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['ChildProcess',
+           'ProcessPlaceholder',
+           'ProcessRegistry',
+           'ResourceLimits',
+           'ResourceUsage',
+           'spawn',
+           'wait_for_child',
+           ]
+
+
+class ResourceLimits(object):
+    """
+    Resource limits for a child process.
+
+    Instances are used as `preexec_fn` for :class:`subprocess.Popen`: in
+    the child, they start a new session (so the child and all processes
+    it spawns form a process group which can be killed as a whole) and
+    apply the configured limits with :func:`resource.setrlimit`.
+    """
+    def __init__(self, cpu_time=None, address_space=None, open_files=None):
+        #: Maximum CPU time in seconds.
+        self.cpu_time = cpu_time
+        #: Maximum size of the virtual address space in bytes.
+        self.address_space = address_space
+        #: Maximum number of open file descriptors.
+        self.open_files = open_files
+
+    @classmethod
+    def from_command_definition(cls, command_definition):
+        """
+        Creates resource limits from the limits configured in the given
+        shell command definition.
+        """
+        return cls(cpu_time=command_definition.cpu_time_limit,
+                   address_space=command_definition.memory_limit,
+                   open_files=command_definition.open_files_limit)
+
+    @property
+    def is_empty(self):
+        "Flag indicating that no limits were configured."
+        return self.cpu_time is None and self.address_space is None \
+               and self.open_files is None
+
+    def __call__(self):
+        os.setsid()
+        if not self.cpu_time is None:
+            # The soft limit triggers a SIGXCPU which allows us to tell
+            # that the limit was exceeded; the hard limit is a backstop.
+            self.__set_limit(resource.RLIMIT_CPU, self.cpu_time,
+                             self.cpu_time + 1)
+        if not self.address_space is None:
+            self.__set_limit(resource.RLIMIT_AS, self.address_space,
+                             self.address_space)
+        if not self.open_files is None:
+            self.__set_limit(resource.RLIMIT_NOFILE, self.open_files,
+                             self.open_files)
+
+    def __set_limit(self, rlimit, soft, hard):
+        cur_hard = resource.getrlimit(rlimit)[1]
+        if cur_hard != resource.RLIM_INFINITY:
+            # Unprivileged processes can not raise their hard limits.
+            hard = min(hard, cur_hard)
+            soft = min(soft, hard)
+        resource.setrlimit(rlimit, (soft, hard))
+
+
+class ResourceUsage(object):
+    """
+    Resources used by a terminated child process (as reported by
+    :func:`os.wait4`).
+    """
+    def __init__(self, user_time, system_time, max_rss):
+        #: CPU time spent in user mode in seconds.
+        self.user_time = user_time
+        #: CPU time spent in system mode in seconds.
+        self.system_time = system_time
+        #: Maximum resident set size in bytes. Note that on Linux, this
+        #: includes the memory the process had when it was forked (i.e.,
+        #: before it exec'ed the command), so it is never less than the
+        #: resident set size of the forking process.
+        self.max_rss = max_rss
+
+    @classmethod
+    def from_rusage(cls, rusage):
+        """
+        Creates a resource usage from the given :func:`resource.getrusage`
+        style result.
+        """
+        max_rss = rusage.ru_maxrss
+        if not sys.platform == 'darwin':
+            # The maximum resident set size is reported in kilobytes
+            # (except on OS X).
+            max_rss *= 1024
+        return cls(rusage.ru_utime, rusage.ru_stime, max_rss)
+
+    def to_dict(self):
+        """
+        Returns this resource usage as dictionary (e.g., for sending it to
+        another process).
+        """
+        return dict(user_time=self.user_time,
+                    system_time=self.system_time,
+                    max_rss=self.max_rss)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a resource usage from the given dictionary (see
+        :meth:`to_dict`).
+        """
+        return cls(data['user_time'], data['system_time'], data['max_rss'])
+
+
+class ChildProcess(object):
+    """
+    Handle for a child process running in its own process group.
+    """
+    #: Signals indicating that a resource limit was exceeded.
+    LIMIT_SIGNALS = frozenset([signal.SIGXCPU, signal.SIGXFSZ])
+
+    def __init__(self, child, is_shell=False):
+        #: The :class:`subprocess.Popen` instance.
+        self.child = child
+        #: Flag indicating that the child process is a shell running the
+        #: command.
+        self.is_shell = is_shell
+        #: Status to record for the command if the process was killed.
+        self.kill_status = None
+        self.__lock = Lock()
+
+    def kill(self, status):
+        """
+        Kills the whole process group of the child process and records the
+        given status as the reason. Only the first call has an effect.
+
+        :returns: `True` if the process group was killed by this call.
+        """
+        with self.__lock:
+            if not self.kill_status is None:
+                return False
+            self.kill_status = status
+        try:
+            os.killpg(self.child.pid, signal.SIGKILL)
+        except OSError as err:
+            # The process group may be gone already.
+            if err.errno != errno.ESRCH:
+                raise
+        return True
+
+    def exceeded_limit(self, exit_code):
+        """
+        Checks if the given exit code indicates that the child process
+        (or, when run through a shell, the command run by the shell) was
+        terminated because it exceeded a resource limit.
+
+        Only limits which are enforced with a signal (CPU time and file
+        size) are detected; exceeding the address space limit makes
+        allocations fail, which the command reports like any other error.
+        """
+        if exit_code < 0:
+            sig = -exit_code
+        elif exit_code > 128 and self.is_shell:
+            # The shell reports a command terminated by signal N with the
+            # exit code 128 + N; other commands may legitimately exit with
+            # such codes.
+            sig = exit_code - 128
+        else:
+            sig = None
+        return sig in self.LIMIT_SIGNALS
+
+
+class ProcessPlaceholder(object):
+    """
+    Stand-in registered for a command which has no child process (yet),
+    e.g. while it waits for the result of an identical command. Killing it
+    records the status and sets the :attr:`killed` event (which the
+    command may be waiting on).
+    """
+    def __init__(self):
+        #: Status to record for the command if it was killed.
+        self.kill_status = None
+        #: Event set when the command was killed.
+        self.killed = Event()
+        self.__lock = Lock()
+
+    def kill(self, status):
+        """
+        Records the given status as the reason for killing the command.
+        Only the first call has an effect.
+
+        :returns: `True` if the status was recorded by this call.
+        """
+        with self.__lock:
+            if not self.kill_status is None:
+                return False
+            self.kill_status = status
+        self.killed.set()
+        return True
+
+
+class ProcessRegistry(object):
+    """
+    Process-wide registry of the child processes of running commands.
+    """
+    __processes = {}
+    __lock = Lock()
+
+    @classmethod
+    def register(cls, key, process):
+        with cls.__lock:
+            cls.__processes[key] = process
+
+    @classmethod
+    def unregister(cls, key):
+        with cls.__lock:
+            cls.__processes.pop(key, None)
+
+    @classmethod
+    def get(cls, key):
+        with cls.__lock:
+            return cls.__processes.get(key)
+
+
+def spawn(args, limits, shell=False, cwd=None, env=None):
+    """
+    Starts a child process in a new session (and hence, process group) with
+    the given resource limits applied and its stdout and stderr connected
+    to pipes.
+
+    Without resource limits, the session is started with the
+    `start_new_session` option rather than through a `preexec_fn`
+    callable. This allows the interpreter to use its faster process
+    creation paths (vfork, where available) on Python 3.
+
+    :param args: Command line string (if `shell` is set) or argument list.
+    :param limits: :class:`ResourceLimits` instance.
+    :returns: :class:`subprocess.Popen` instance.
+    """
+    kw = dict(shell=shell, cwd=cwd, env=env, stdout=PIPE, stderr=PIPE)
+    if PY3 and limits.is_empty:
+        kw['start_new_session'] = True
+    else:
+        kw['preexec_fn'] = limits
+    return Popen(args, **kw)
+
+
+def wait_for_child(child):
+    """
+    Waits for the given child process to terminate.
+
+    For a :class:`subprocess.Popen` instance, the process is reaped with
+    :func:`os.wait4` to get its resource usage; other process handles
+    (e.g., for processes run by a fork server pool) may provide their
+    resource usage in a `resource_usage` attribute after waiting.
+
+    :returns: Tuple holding the exit code (-N if the process was terminated
+      by signal N) and a :class:`ResourceUsage` instance (`None` if the
+      resource usage is not available).
+    """
+    if isinstance(child, Popen) and child.returncode is None:
+        while True:
+            try:
+                _, status, rusage = os.wait4(child.pid, 0)
+            except OSError as err:
+                if err.errno == errno.EINTR:
+                    continue
+                raise
+            break
+        if os.WIFSIGNALED(status):
+            exit_code = -os.WTERMSIG(status)
+        else:
+            exit_code = os.WEXITSTATUS(status)
+        # Tell the Popen instance that the process is gone.
+        child.returncode = exit_code
+        usage = ResourceUsage.from_rusage(rusage)
+    else:
+        exit_code = child.wait()
+        usage = getattr(child, 'resource_usage', None)
+    return exit_code, usage
@@ -0,0 +1,304 @@
+"""
+Sampling profiler for the telex server.
+
+Profiling is switched on at runtime through the "profiler" service view
+for a number of seconds or a number of profiled requests, optionally only
+for the commands of one definition. While a profiling session is active, a
+sampler thread periodically records the Python call stacks of the threads
+executing profiled code (see :meth:`Profiler.profile`). The samples are
+returned as collapsed stacks (for flame graph tools) or as a pstats file
+(for :mod:`pstats` and its viewers).
+
+When no session is active, entering a profiled block costs one attribute
+lookup; no samples are taken.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from contextlib import contextmanager
+import marshal
+import sys
+from threading import Event
+from threading import Lock
+from threading import Thread
+from threading import current_thread
+import time
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['Profiler',
+           'ProfilerBusy',
+           'ProfilingSession',
+           ]
+
+
+class ProfilerBusy(Exception):
+    """
+    Raised when starting a profiling session while another one is active.
+    """
+    pass
+
+
+class ProfilingSession(object):
+    """
+    Samples the call stacks of the threads running profiled code until the
+    session expires, the maximum number of profiled requests have finished
+    or it is stopped.
+    """
+    def __init__(self, duration=None, max_requests=None, definition=None,
+                 interval=0.005):
+        """
+        :param float duration: Maximum number of seconds to profile for.
+        :param int max_requests: Maximum number of requests to profile.
+        :param str definition: If set, only commands of the command
+          definition with this name are profiled.
+        :param float interval: Number of seconds between samples.
+        """
+        if not duration is None and duration <= 0:
+            raise ValueError('The profiling duration must be positive.')
+        if not max_requests is None and max_requests <= 0:
+            raise ValueError('The number of requests to profile must be '
+                             'positive.')
+        if interval <= 0:
+            raise ValueError('The sampling interval must be positive.')
+        self.duration = duration
+        self.max_requests = max_requests
+        self.definition = definition
+        self.interval = interval
+        #: Start time (seconds since the epoch).
+        self.started = None
+        #: Stop time (seconds since the epoch; `None` while active).
+        self.stopped = None
+        #: Number of requests profiled so far.
+        self.num_requests = 0
+        #: Number of stack samples taken so far.
+        self.num_samples = 0
+        # Maps call stacks (tuples of (file name, line number, function
+        # name) tuples, outermost call first) to sample counts.
+        self.__stacks = {}
+        # Maps IDs of threads running profiled code to nesting depths.
+        self.__threads = {}
+        self.__lock = Lock()
+        self.__stop_event = Event()
+
+    @property
+    def is_active(self):
+        "Flag indicating that this session is collecting samples."
+        return not self.started is None and not self.__stop_event.is_set()
+
+    def start(self):
+        """
+        Starts the sampler thread.
+        """
+        self.started = time.time()
+        sampler = Thread(target=self.__sample, name='telex-profiler')
+        sampler.daemon = True
+        sampler.start()
+
+    def stop(self):
+        """
+        Stops collecting samples.
+        """
+        self.__stop_event.set()
+
+    def enter(self, definition_name):
+        """
+        Called when the current thread enters a profiled block for a command
+        of the given definition.
+
+        :returns: `True` if the block is profiled (and :meth:`exit` needs to
+          be called when it is left).
+        """
+        if not self.is_active or (not self.definition is None
+                                  and definition_name != self.definition):
+            return False
+        thread_id = current_thread().ident
+        with self.__lock:
+            depth = self.__threads.get(thread_id, 0)
+            if depth == 0:
+                if not self.max_requests is None \
+                   and self.num_requests >= self.max_requests:
+                    return False
+                self.num_requests += 1
+            self.__threads[thread_id] = depth + 1
+        return True
+
+    def exit(self):
+        """
+        Called when the current thread leaves a profiled block.
+        """
+        thread_id = current_thread().ident
+        with self.__lock:
+            depth = self.__threads.pop(thread_id) - 1
+            if depth > 0:
+                self.__threads[thread_id] = depth
+            is_done = not self.max_requests is None \
+                      and self.num_requests >= self.max_requests \
+                      and not self.__threads
+        if is_done:
+            self.stop()
+
+    def get_status(self):
+        """
+        Returns a dictionary describing this session.
+        """
+        if self.started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.stopped or time.time()) - self.started
+        return dict(active=self.is_active,
+                    definition=self.definition,
+                    duration=self.duration,
+                    max_requests=self.max_requests,
+                    interval=self.interval,
+                    elapsed=elapsed,
+                    requests=self.num_requests,
+                    samples=self.num_samples)
+
+    def to_collapsed(self):
+        """
+        Returns the samples as collapsed stacks: one line per distinct call
+        stack with the semicolon separated calls (outermost first) and the
+        number of samples.
+        """
+        with self.__lock:
+            items = list(self.__stacks.items())
+        lines = []
+        for stack, count in items:
+            calls = ['%s (%s:%d)' % (name, path, line)
+                     for (path, line, name) in stack]
+            lines.append('%s %d\n' % (';'.join(calls), count))
+        return ''.join(sorted(lines))
+
+    def to_pstats(self):
+        """
+        Returns the samples in the (marshalled) format of
+        :meth:`cProfile.Profile.dump_stats`, for loading with
+        :class:`pstats.Stats`. Call counts are sample counts; times are
+        estimated from the sample counts and the sampling interval.
+        """
+        with self.__lock:
+            items = list(self.__stacks.items())
+        entries = {}
+        for stack, count in items:
+            seconds = count * self.interval
+            seen = set()
+            for idx, func in enumerate(stack):
+                entry = entries.setdefault(func, [0, 0, 0.0, 0.0, {}])
+                if not func in seen:
+                    # Recursive calls count once towards the inclusive time.
+                    seen.add(func)
+                    entry[0] += count
+                    entry[1] += count
+                    entry[3] += seconds
+                if idx > 0:
+                    callers = entry[4]
+                    callers[stack[idx - 1]] = \
+                                callers.get(stack[idx - 1], 0) + count
+            entries[stack[-1]][2] += seconds
+        return marshal.dumps(dict([(func, tuple(entry))
+                                   for (func, entry) in entries.items()]))
+
+    def __sample(self):
+        deadline = None if self.duration is None \
+                   else self.started + self.duration
+        while not self.__stop_event.wait(self.interval):
+            if not deadline is None and time.time() >= deadline:
+                break
+            self.take_samples()
+        self.stopped = time.time()
+        self.__stop_event.set()
+
+    def take_samples(self):
+        """
+        Samples the call stacks of the threads currently running profiled
+        code once (called by the sampler thread every :attr:`interval`
+        seconds).
+        """
+        with self.__lock:
+            thread_ids = list(self.__threads)
+        if not thread_ids:
+            return
+        frames = sys._current_frames() # protected member pylint: disable=W0212
+        stacks = []
+        for thread_id in thread_ids:
+            frame = frames.get(thread_id)
+            stack = []
+            while not frame is None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno,
+                              code.co_name))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                stacks.append(tuple(stack))
+        with self.__lock:
+            for stack in stacks:
+                self.__stacks[stack] = self.__stacks.get(stack, 0) + 1
+            self.num_samples += len(stacks)
+
+
+class Profiler(object):
+    """
+    Process-wide access to the current (or last) profiling session.
+    """
+    __session = None
+    __lock = Lock()
+
+    @classmethod
+    def start(cls, duration=None, max_requests=None, definition=None,
+              interval=0.005):
+        """
+        Starts a new profiling session (see :class:`ProfilingSession` for
+        the parameters).
+
+        :raises ProfilerBusy: If a session is already active.
+        """
+        session = ProfilingSession(duration=duration,
+                                   max_requests=max_requests,
+                                   definition=definition,
+                                   interval=interval)
+        with cls.__lock:
+            if not cls.__session is None and cls.__session.is_active:
+                raise ProfilerBusy('A profiling session is already active.')
+            cls.__session = session
+            session.start()
+        return session
+
+    @classmethod
+    def stop(cls):
+        """
+        Stops the active profiling session, if any.
+
+        :returns: The current (or last) session or `None` if no session was
+          ever started.
+        """
+        session = cls.__session
+        if not session is None:
+            session.stop()
+        return session
+
+    @classmethod
+    def get_session(cls):
+        """
+        Returns the current (or last) profiling session or `None` if no
+        session was ever started.
+        """
+        return cls.__session
+
+    @classmethod
+    @contextmanager
+    def profile(cls, definition_name):
+        """
+        Context manager marking its block as profiled code run for a
+        command of the given definition.
+        """
+        session = cls.__session
+        is_profiled = not session is None and session.enter(definition_name)
+        try:
+            yield
+        finally:
+            if is_profiled:
+                session.exit()
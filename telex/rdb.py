@@ -6,17 +6,38 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 Created on Jul 31, 2014.
 """
+import json
+
+from sqlalchemy import BigInteger
+from sqlalchemy import Boolean
 from sqlalchemy import Column
 from sqlalchemy import DateTime
+from sqlalchemy import Float
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy import Integer
+from sqlalchemy import LargeBinary
 from sqlalchemy import MetaData
 from sqlalchemy import String
 from sqlalchemy import Table
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import event
+from sqlalchemy import inspect
+from sqlalchemy import literal
+from sqlalchemy.orm import Session
+from sqlalchemy.orm import deferred
+from sqlalchemy.orm import mapper as sa_mapper
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm import subqueryload
+from sqlalchemy.orm.collections import attribute_mapped_collection
+from sqlalchemy.schema import CheckConstraint
+from sqlalchemy.types import TypeDecorator
+try:
+    from sqlalchemy.orm import selectinload # pylint: disable=E0611
+except ImportError: # SQLAlchemy < 1.2
+    selectinload = subqueryload
 
 from everest.repositories.rdb.utils import mapper
+from telex.capture import StoredOutput
 from telex.entities import Command
 from telex.entities import CommandDefinition
 from telex.entities import Parameter
@@ -26,16 +47,37 @@ from telex.entities import RestCommand
 from telex.entities import RestCommandDefinition
 from telex.entities import ShellCommand
 from telex.entities import ShellCommandDefinition
-from sqlalchemy.schema import CheckConstraint
+from telex.retention import start_command_pruner
+from telex.utils import get_setting
 
 
-#from sqlalchemy.sql import literal
 #from sqlalchemy.sql import select
 __docformat__ = 'reStructuredText en'
-__all__ = ['create_metadata',
+__all__ = ['JsonDict',
+           'LOADER_STRATEGIES',
+           'create_metadata',
+           'get_loader_strategy',
+           'upgrade_schema',
            ]
 
 
+#: Supported relationship loader strategies:
+#:  * "select": lazy loading with one SELECT per instance (N+1 queries);
+#:  * "joined": eager loading in the same SELECT through a LEFT OUTER JOIN;
+#:  * "subquery": eager loading with one extra SELECT per relationship,
+#:    re-running the original query as subquery;
+#:  * "selectin": eager loading with one extra SELECT per relationship,
+#:    using an IN clause with the parent keys (falls back to "subquery"
+#:    for SQLAlchemy versions before 1.2).
+LOADER_STRATEGIES = ('select', 'joined', 'subquery', 'selectin')
+
+_LAZY_ARGUMENTS = dict(select='select',
+                       joined='joined',
+                       subquery='subquery',
+                       selectin='selectin' if selectinload is not subqueryload
+                                else 'subquery')
+
+
 def command_definition_slug(cls):
     return cls.name
 
@@ -48,7 +90,41 @@ def parameter_definition_slug(cls):
 #            .as_scalar()
 
 
+class JsonDict(TypeDecorator):
+    """
+    Dictionary stored as JSON string.
+    """
+    impl = String
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else json.dumps(value, sort_keys=True)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else json.loads(value)
+
+
+def get_loader_strategy(strategy=None):
+    """
+    Checks the given relationship loader strategy name. If no strategy is
+    given, the strategy configured with the "telex.rdb.loader_strategy"
+    setting is returned (defaults to "selectin").
+
+    :raises ValueError: If the strategy is not one of
+      :const:`LOADER_STRATEGIES`.
+    """
+    if strategy is None:
+        strategy = get_setting('telex.rdb.loader_strategy', 'selectin')
+    if not strategy in LOADER_STRATEGIES:
+        raise ValueError('Invalid loader strategy "%s" (valid strategies: '
+                         '%s).' % (strategy, ', '.join(LOADER_STRATEGIES)))
+    return strategy
+
+
 def create_metadata(engine):
+    # The loader strategy for the relationships needed to render members.
+    strategy = get_loader_strategy()
+    many = _LAZY_ARGUMENTS[strategy]
+    one = 'select' if strategy == 'select' else 'joined'
     # Table definitions.
     metadata = MetaData()
     command_definition_tbl = \
@@ -56,11 +132,14 @@ def create_metadata(engine):
               Column('command_definition_id', Integer, primary_key=True),
               Column('command_definition_type', String, nullable=False,
                      default='BASE'),
-              Column('name', String, nullable=False),
+              Column('name', String, nullable=False, index=True,
+                     unique=True),
               Column('label', String, nullable=False),
               Column('submitter', String, nullable=False),
               Column('category', String, nullable=True),
               Column('description', String, nullable=True),
+              Column('retention_days', Integer, nullable=True),
+              Column('retention_count', Integer, nullable=True),
               )
     shell_cmd_def_tbl = \
         Table('shell_command_definition', metadata,
@@ -72,6 +151,18 @@ def create_metadata(engine):
               Column('executable', String, nullable=False),
               Column('working_directory', String, nullable=True),
               Column('environment', String, nullable=True),
+              Column('timeout', Integer, nullable=True),
+              Column('cpu_time_limit', Integer, nullable=True),
+              Column('memory_limit', BigInteger, nullable=True),
+              Column('open_files_limit', Integer, nullable=True),
+              Column('max_output_size', BigInteger, nullable=True),
+              Column('execution_mode', String,
+                     CheckConstraint("execution_mode IN "
+                                     "('SHELL','ARGV','PYTHON_POOL')"),
+                     nullable=False, default='SHELL'),
+              Column('cacheable', Boolean, nullable=False, default=False),
+              Column('error_pattern', String, nullable=True),
+              Column('warning_pattern', String, nullable=True),
               )
     rest_cmd_def_tbl = \
         Table('rest_command_definition', metadata,
@@ -87,6 +178,12 @@ def create_metadata(engine):
                      nullable=False, default='POST'),
               Column('request_content_type', String, nullable=False),
               Column('response_content_type', String, nullable=False),
+              Column('pool_size', Integer, nullable=False, default=10),
+              Column('keep_alive', Boolean, nullable=False, default=True),
+              Column('connect_timeout', Float, nullable=True),
+              Column('read_timeout', Float, nullable=True),
+              Column('max_retries', Integer, nullable=False, default=0),
+              Column('retry_backoff', Float, nullable=False, default=0),
               )
     parameter_definition_tbl = \
         Table('parameter_definition', metadata,
@@ -100,15 +197,19 @@ def create_metadata(engine):
               Column('value_type', String, nullable=False),
               Column('description', String, nullable=True),
               )
-    UniqueConstraint(parameter_definition_tbl.c.command_definition_id,
-                     parameter_definition_tbl.c.name)
+    # Parameter definition names are unique within a command definition.
+    # This also serves as index on the command definition foreign key.
+    Index('ix_parameter_definition_command_definition_id_name',
+          parameter_definition_tbl.c.command_definition_id,
+          parameter_definition_tbl.c.name,
+          unique=True)
     parameter_option_tbl = \
         Table('parameter_option', metadata,
               Column('parameter_option_id', Integer, primary_key=True),
               Column('parameter_definition_id', Integer,
                      ForeignKey(
                         parameter_definition_tbl.c.parameter_definition_id),
-                     nullable=False),
+                     nullable=False, index=True),
               Column('name', String, nullable=False),
               Column('value', String, nullable=False),
               )
@@ -121,15 +222,59 @@ def create_metadata(engine):
                         command_definition_tbl.c.command_definition_id),
                      nullable=False),
               Column('timestamp', DateTime, nullable=False),
-              Column('submitter', String, nullable=False),
+              Column('submitter', String, nullable=False, index=True),
+              # Commands predating the status column have been run.
+              Column('status', String, nullable=False, default='PENDING',
+                     index=True, info=dict(upgrade_value='FINISHED')),
               )
+    # Command collections are ordered and paged by (timestamp, ID).
+    # This also serves as index on the timestamp.
+    Index('ix_command_timestamp_command_id',
+          command_tbl.c.timestamp,
+          command_tbl.c.command_id)
+    # The retention pruner selects the commands of a command definition
+    # by age. This also serves as index on the command definition foreign
+    # key.
+    Index('ix_command_command_definition_id_timestamp',
+          command_tbl.c.command_definition_id,
+          command_tbl.c.timestamp,
+          command_tbl.c.command_id)
     shell_cmd_tbl = \
         Table('shell_command', metadata,
               Column('command_id', Integer,
                      ForeignKey(command_tbl.c.command_id),
                      primary_key=True,
                      nullable=False),
-              Column('environment', String, nullable=True),
+              Column('environment', JsonDict, nullable=True),
+              Column('exit_code', Integer, nullable=True, index=True),
+              # Resource usage of the command process.
+              Column('wall_time', Float, nullable=True),
+              Column('user_time', Float, nullable=True),
+              Column('system_time', Float, nullable=True),
+              Column('max_rss', BigInteger, nullable=True),
+              Column('stdout_bytes', BigInteger, nullable=True),
+              Column('stderr_bytes', BigInteger, nullable=True),
+              )
+    # The (large) output of shell commands is kept in a table of its own so
+    # the command rows stay narrow.
+    shell_cmd_output_tbl = \
+        Table('shell_command_output', metadata,
+              Column('command_id', Integer,
+                     ForeignKey(shell_cmd_tbl.c.command_id),
+                     primary_key=True,
+                     nullable=False),
+              Column('stream', String,
+                     CheckConstraint("stream IN ('OUTPUT','ERRORS')"),
+                     primary_key=True,
+                     nullable=False),
+              Column('compression', String,
+                     CheckConstraint(
+                            "compression IN ('none','zlib','zstd')"),
+                     nullable=False, default='zlib'),
+              Column('size', BigInteger, nullable=False),
+              Column('is_truncated', Boolean, nullable=False,
+                     default=False),
+              Column('data', LargeBinary, nullable=False),
               )
     rest_cmd_tbl = \
         Table('rest_command', metadata,
@@ -147,7 +292,7 @@ def create_metadata(engine):
                      nullable=False),
               Column('command_id', Integer,
                      ForeignKey(command_tbl.c.command_id),
-                     nullable=False),
+                     nullable=False, index=True),
               Column('value', String, nullable=False)
               )
     # Mapper definitions.
@@ -158,12 +303,16 @@ def create_metadata(engine):
                properties=dict(parameter_definitions=
                                relationship(ParameterDefinition,
                                             cascade_backrefs=False,
+                                            lazy=many,
                                             back_populates=
                                                     'command_definition'),
                                ),
                polymorphic_on=
                     command_definition_tbl.c.command_definition_type,
-               polymorphic_identity='BASE'
+               polymorphic_identity='BASE',
+               # Load the subclass columns along with the base columns
+               # (also when loading through a relationship).
+               with_polymorphic='*'
                )
     mapper(ShellCommandDefinition, shell_cmd_def_tbl,
            inherits=cmd_def_mpr,
@@ -182,6 +331,7 @@ def create_metadata(engine):
                  parameter_options=
                     relationship(ParameterOption,
                                  cascade_backrefs=False,
+                                 lazy=many,
                                  back_populates='parameter_definition'),
                  )
            )
@@ -199,25 +349,40 @@ def create_metadata(engine):
                id_attribute='command_id',
                properties=dict(command_definition=
                                     relationship(CommandDefinition,
-                                                 uselist=False),
+                                                 uselist=False,
+                                                 lazy=one),
                                parameters=relationship(Parameter,
                                                        cascade_backrefs=False,
+                                                       lazy=many,
                                                        back_populates=
                                                                 'command'),
                                ),
                polymorphic_on=command_tbl.c.command_type,
                polymorphic_identity='BASE',
+               with_polymorphic='*'
                )
     mapper(ShellCommand, shell_cmd_tbl,
            inherits=cmd_mpr,
-           polymorphic_identity='SHELL')
+           polymorphic_identity='SHELL',
+           properties=dict(stored_outputs=
+                            relationship(StoredOutput,
+                                         collection_class=
+                                            attribute_mapped_collection(
+                                                                'stream'),
+                                         cascade='all, delete-orphan'),
+                           )
+           )
+    # The output is only loaded when it is accessed.
+    sa_mapper(StoredOutput, shell_cmd_output_tbl,
+              properties=dict(data=deferred(shell_cmd_output_tbl.c.data)))
     mapper(RestCommand, rest_cmd_tbl,
            inherits=cmd_mpr,
            polymorphic_identity='REST')
     mapper(Parameter, parameter_tbl,
            id_attribute='parameter_id',
            properties=dict(parameter_definition=
-                            relationship(ParameterDefinition, uselist=False),
+                            relationship(ParameterDefinition, uselist=False,
+                                         lazy=one),
                                command=
                                     relationship(Command, uselist=False,
                                                  back_populates='parameters')
@@ -226,4 +391,67 @@ def create_metadata(engine):
     # Configure and initialize metadata.
     metadata.bind = engine
     metadata.create_all()
+    upgrade_schema(metadata)
+    start_command_pruner(metadata)
     return metadata
+
+
+def upgrade_schema(metadata):
+    """
+    Brings the tables of an existing database up to date with the given
+    metadata by adding missing (nullable or defaulted) columns and missing
+    indexes. This is idempotent and is run every time the metadata is
+    created.
+
+    The existing rows get the default of an added column unless the
+    column has an "upgrade_value" in its `info` dictionary, which is then
+    set for them instead (the default still applies to new rows).
+
+    Creating a unique index fails if the existing data violate it (e.g.,
+    for duplicate command definition names); such rows need to be cleaned
+    up manually.
+    """
+    engine = metadata.bind
+    inspector = inspect(engine)
+    table_names = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if not table.name in table_names:
+            continue
+        column_names = set([col['name']
+                            for col in inspector.get_columns(table.name)])
+        for column in table.columns:
+            if not column.name in column_names:
+                engine.execute(_make_add_column_ddl(engine, column))
+                if 'upgrade_value' in column.info:
+                    engine.execute(
+                        table.update().values(
+                                {column.name: column.info['upgrade_value']}))
+        index_names = set([idx['name']
+                           for idx in inspector.get_indexes(table.name)])
+        for index in table.indexes:
+            if not index.name in index_names:
+                index.create(engine)
+
+
+def _make_add_column_ddl(engine, column):
+    ddl = 'ALTER TABLE %s ADD COLUMN %s %s' \
+          % (column.table.name, column.name,
+             column.type.compile(dialect=engine.dialect))
+    if not column.default is None and column.default.is_scalar:
+        dflt = literal(column.default.arg, column.type) \
+                    .compile(dialect=engine.dialect,
+                             compile_kwargs=dict(literal_binds=True))
+        ddl += ' DEFAULT %s' % dflt
+    if not column.nullable:
+        ddl += ' NOT NULL'
+    return ddl
+
+
+def _store_command_outputs(session, flush_context, instances): # pylint: disable=W0613
+    # The output of shell commands is only compressed into their stored
+    # outputs when they are about to be persisted.
+    for entity in list(session.new) + list(session.identity_map.values()):
+        if isinstance(entity, ShellCommand):
+            entity.store_outputs()
+
+event.listen(Session, 'before_flush', _store_command_outputs)
@@ -34,6 +34,8 @@ class CommandDefinitionMember(Member):
     description = terminal_attribute(str, 'description')
     parameter_definitions = collection_attribute(IParameterDefinition,
                                                  'parameter_definitions')
+    retention_days = terminal_attribute(int, 'retention_days')
+    retention_count = terminal_attribute(int, 'retention_count')
 
 
 class ShellCommandDefinitionMember(CommandDefinitionMember):
@@ -41,6 +43,15 @@ class ShellCommandDefinitionMember(CommandDefinitionMember):
     title = 'Shell Command Definition'
     executable = terminal_attribute(str, 'executable')
     working_directory = terminal_attribute(str, 'working_directory')
+    timeout = terminal_attribute(int, 'timeout')
+    cpu_time_limit = terminal_attribute(int, 'cpu_time_limit')
+    memory_limit = terminal_attribute(int, 'memory_limit')
+    open_files_limit = terminal_attribute(int, 'open_files_limit')
+    max_output_size = terminal_attribute(int, 'max_output_size')
+    execution_mode = terminal_attribute(str, 'execution_mode')
+    cacheable = terminal_attribute(bool, 'cacheable')
+    error_pattern = terminal_attribute(str, 'error_pattern')
+    warning_pattern = terminal_attribute(str, 'warning_pattern')
 
 
 class RestCommandDefinitionMember(CommandDefinitionMember):
@@ -50,6 +61,12 @@ class RestCommandDefinitionMember(CommandDefinitionMember):
     response_content_type = terminal_attribute(str, 'response_content_type')
     url = terminal_attribute(str, 'url')
     operation = terminal_attribute(str, 'operation')
+    pool_size = terminal_attribute(int, 'pool_size')
+    keep_alive = terminal_attribute(bool, 'keep_alive')
+    connect_timeout = terminal_attribute(float, 'connect_timeout')
+    read_timeout = terminal_attribute(float, 'read_timeout')
+    max_retries = terminal_attribute(int, 'max_retries')
+    retry_backoff = terminal_attribute(float, 'retry_backoff')
 
 
 class ParameterDefinitionMember(Member):
@@ -77,6 +94,7 @@ class CommandMember(Member):
     submitter = terminal_attribute(str, 'submitter')
     timestamp = terminal_attribute(datetime, 'timestamp')
     parameters = collection_attribute(IParameter, 'parameters')
+    status = terminal_attribute(str, 'status')
 
 
 class ShellCommandMember(CommandMember):
@@ -87,6 +105,14 @@ class ShellCommandMember(CommandMember):
     output_string = terminal_attribute(str, 'output_string')
     error_string = terminal_attribute(str, 'error_string')
     exit_code = terminal_attribute(int, 'exit_code')
+    wall_time = terminal_attribute(float, 'wall_time')
+    user_time = terminal_attribute(float, 'user_time')
+    system_time = terminal_attribute(float, 'system_time')
+    max_rss = terminal_attribute(int, 'max_rss')
+    stdout_bytes = terminal_attribute(int, 'stdout_bytes')
+    stderr_bytes = terminal_attribute(int, 'stderr_bytes')
+    is_output_truncated = terminal_attribute(bool, 'is_output_truncated')
+    is_error_truncated = terminal_attribute(bool, 'is_error_truncated')
 
 
 class RestCommandMember(CommandMember):
@@ -97,6 +123,7 @@ class RestCommandMember(CommandMember):
     response_status_code = terminal_attribute(int, 'response_status_code')
     response_headers = terminal_attribute(dict, 'response_headers')
     response_body = terminal_attribute(str, 'response_body')
+    is_response_truncated = terminal_attribute(bool, 'is_response_truncated')
 
 class ParameterMember(Member):
     relation = 'http://telex.org/relations/parameter'
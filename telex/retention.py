@@ -0,0 +1,292 @@
+"""
+Retention of the command history for the telex server.
+
+The command pruner deletes the commands which have expired under the
+retention policy of their command definition (a maximum age in days
+and/or a maximum number of commands to keep), optionally archiving them
+to gzip compressed JSON lines files first. Commands are deleted in
+batches of bounded size, each in a short transaction of its own, so the
+pruner never holds locks on the command tables for long.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import datetime
+import gzip
+import json
+import logging
+import os
+import re
+from threading import Event
+from threading import Thread
+
+from pyramid.threadlocal import get_current_registry
+from pytz import timezone
+from sqlalchemy import and_
+from sqlalchemy import or_
+from sqlalchemy import select
+
+from telex.constants import COMMAND_STATUS
+from telex.interfaces import ICommandPruner
+from telex.utils import get_setting
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['CommandPruner',
+           'start_command_pruner',
+           ]
+
+
+class CommandPruner(object):
+    """
+    Deletes (and optionally archives) expired commands from the RDB
+    command tables.
+
+    Commands which are queued or running are never deleted.
+    """
+    #: Status values of commands which must not be deleted.
+    ACTIVE_STATUSES = frozenset([COMMAND_STATUS.QUEUED,
+                                 COMMAND_STATUS.RUNNING])
+
+    def __init__(self, metadata, max_age=None, max_count=None,
+                 batch_size=500, batch_pause=0.0, archive_directory=None):
+        """
+        :param metadata: Bound metadata holding the telex tables (as
+          returned by :func:`telex.rdb.create_metadata`).
+        :param int max_age: Default number of days to keep commands for
+          command definitions which do not set `retention_days`; `None`
+          keeps them forever.
+        :param int max_count: Default number of commands to keep for
+          command definitions which do not set `retention_count`; `None`
+          keeps all of them.
+        :param int batch_size: Maximum number of commands to delete per
+          transaction.
+        :param float batch_pause: Number of seconds to pause between two
+          batches (gives other transactions a chance to get at the tables).
+        :param str archive_directory: If given, expired commands are
+          appended to compressed JSON lines files in this directory (one
+          file per command definition and pruning run) before they are
+          deleted.
+        """
+        self.__metadata = metadata
+        self.__tables = metadata.tables
+        self.max_age = max_age
+        self.max_count = max_count
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.archive_directory = archive_directory
+        self.__stop_event = Event()
+        self.__thread = None
+        self.__logger = logging.getLogger(__name__)
+
+    def prune(self, now=None):
+        """
+        Deletes all expired commands.
+
+        :param now: Reference time for the maximum age (defaults to the
+          current time).
+        :returns: Number of deleted commands.
+        """
+        if now is None:
+            now = datetime.datetime.now(timezone('UTC'))
+        cmd_def_tbl = self.__tables['command_definition']
+        engine = self.__metadata.bind
+        cmd_defs = engine.execute(
+                        select([cmd_def_tbl.c.command_definition_id,
+                                cmd_def_tbl.c.name,
+                                cmd_def_tbl.c.retention_days,
+                                cmd_def_tbl.c.retention_count])).fetchall()
+        total = 0
+        for cmd_def_id, name, days, count in cmd_defs:
+            if days is None:
+                days = self.max_age
+            if count is None:
+                count = self.max_count
+            criterion = self.__make_expiry_criterion(engine, cmd_def_id,
+                                                     days, count, now)
+            if not criterion is None:
+                num_pruned = self.__prune(engine, name, criterion, now)
+                if num_pruned > 0:
+                    self.__logger.info('Pruned %d commands for command '
+                                       'definition "%s".', num_pruned, name)
+                total += num_pruned
+        return total
+
+    def start(self, interval):
+        """
+        Starts a daemon thread pruning every `interval` seconds.
+        """
+        if self.__thread is None:
+            self.__stop_event.clear()
+            self.__thread = Thread(target=self.__run, args=(interval,),
+                                   name='telex-command-pruner')
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def stop(self):
+        """
+        Stops the pruning thread (after the current batch).
+        """
+        if not self.__thread is None:
+            self.__stop_event.set()
+            self.__thread.join()
+            self.__thread = None
+            self.__stop_event.clear()
+
+    def __run(self, interval):
+        while not self.__stop_event.wait(interval):
+            try:
+                self.prune()
+            except Exception: # catch Exception pylint: disable=W0703
+                self.__logger.exception('Error pruning commands.')
+
+    def __make_expiry_criterion(self, engine, command_definition_id,
+                                max_age, max_count, now):
+        cmd_tbl = self.__tables['command']
+        criteria = []
+        if max_age:
+            cutoff = now - datetime.timedelta(days=max_age)
+            criteria.append(cmd_tbl.c.timestamp < cutoff)
+        if max_count:
+            # Look up the oldest command we keep; everything before it in
+            # (timestamp, ID) order expires.
+            oldest = engine.execute(
+                    select([cmd_tbl.c.timestamp, cmd_tbl.c.command_id])
+                    .where(cmd_tbl.c.command_definition_id
+                                            == command_definition_id)
+                    .order_by(cmd_tbl.c.timestamp.desc(),
+                              cmd_tbl.c.command_id.desc())
+                    .offset(max_count - 1)
+                    .limit(1)).fetchone()
+            if not oldest is None:
+                timestamp, cmd_id = oldest
+                criteria.append(
+                    or_(cmd_tbl.c.timestamp < timestamp,
+                        and_(cmd_tbl.c.timestamp == timestamp,
+                             cmd_tbl.c.command_id < cmd_id)))
+        if criteria:
+            criterion = and_(cmd_tbl.c.command_definition_id
+                                                == command_definition_id,
+                             ~cmd_tbl.c.status.in_(
+                                            sorted(self.ACTIVE_STATUSES)),
+                             or_(*criteria))
+        else:
+            criterion = None
+        return criterion
+
+    def __prune(self, engine, name, criterion, now):
+        cmd_tbl = self.__tables['command']
+        query = select([cmd_tbl.c.command_id]) \
+                    .where(criterion) \
+                    .order_by(cmd_tbl.c.timestamp, cmd_tbl.c.command_id) \
+                    .limit(self.batch_size)
+        if self.archive_directory is None:
+            archive_path = None
+        else:
+            archive_path = os.path.join(
+                        self.archive_directory,
+                        '%s-%s.jsonl.gz' % (re.sub(r'[^\w.-]', '_', name),
+                                            now.strftime('%Y%m%dT%H%M%S')))
+        total = 0
+        while not self.__stop_event.is_set():
+            with engine.begin() as conn:
+                cmd_ids = [row[0] for row in conn.execute(query)]
+                if cmd_ids:
+                    if not archive_path is None:
+                        # The archive is written before the deletion is
+                        # committed; if the commit fails, the commands are
+                        # archived again by the next run.
+                        self.__archive(conn, archive_path, cmd_ids)
+                    self.__delete(conn, cmd_ids)
+            total += len(cmd_ids)
+            if len(cmd_ids) < self.batch_size:
+                break
+            if self.batch_pause:
+                self.__stop_event.wait(self.batch_pause)
+        return total
+
+    def __archive(self, conn, path, command_ids):
+        cmd_tbl = self.__tables['command']
+        sub_tbls = [self.__tables['shell_command'],
+                    self.__tables['rest_command']]
+        prm_tbl = self.__tables['parameter']
+        prm_def_tbl = self.__tables['parameter_definition']
+        cmd_def_tbl = self.__tables['command_definition']
+        cols = list(cmd_tbl.c) + [cmd_def_tbl.c.name]
+        from_clause = cmd_tbl.join(cmd_def_tbl)
+        for sub_tbl in sub_tbls:
+            cols.extend([col for col in sub_tbl.c if not col.primary_key])
+            from_clause = from_clause.outerjoin(sub_tbl)
+        records = []
+        for row in conn.execute(
+                    select(cols)
+                    .select_from(from_clause)
+                    .where(cmd_tbl.c.command_id.in_(command_ids))
+                    .order_by(cmd_tbl.c.timestamp, cmd_tbl.c.command_id)):
+            record = dict(zip([col.name for col in cols], row))
+            record['command_definition'] = record.pop('name')
+            record['parameters'] = []
+            records.append(record)
+        records_by_id = dict([(rec['command_id'], rec) for rec in records])
+        for cmd_id, prm_name, prm_value in conn.execute(
+                    select([prm_tbl.c.command_id, prm_def_tbl.c.name,
+                            prm_tbl.c.value])
+                    .select_from(prm_tbl.join(prm_def_tbl))
+                    .where(prm_tbl.c.command_id.in_(command_ids))
+                    .order_by(prm_tbl.c.parameter_id)):
+            records_by_id[cmd_id]['parameters'].append(
+                                        dict(name=prm_name, value=prm_value))
+        archive_file = gzip.open(path, 'ab')
+        try:
+            for record in records:
+                line = json.dumps(record, default=_json_default,
+                                  sort_keys=True)
+                archive_file.write((line + '\n').encode('utf-8'))
+        finally:
+            archive_file.close()
+
+    def __delete(self, conn, command_ids):
+        for tbl_name in ('parameter', 'shell_command_output',
+                         'shell_command', 'rest_command', 'command'):
+            tbl = self.__tables[tbl_name]
+            conn.execute(tbl.delete()
+                         .where(tbl.c.command_id.in_(command_ids)))
+
+
+def start_command_pruner(metadata):
+    """
+    Creates a command pruner for the given metadata from the
+    "telex.retention.*" application settings, registers it with the current
+    registry and starts it. Nothing is started if the
+    "telex.retention.interval" setting is not set.
+
+    :returns: :class:`CommandPruner` instance or `None`.
+    """
+    interval = get_setting('telex.retention.interval', None, float)
+    if interval:
+        pruner = CommandPruner(
+                metadata,
+                max_age=get_setting('telex.retention.max_age', None, int),
+                max_count=get_setting('telex.retention.max_count', None,
+                                      int),
+                batch_size=get_setting('telex.retention.batch_size', 500,
+                                       int),
+                batch_pause=get_setting('telex.retention.batch_pause', 0.0,
+                                        float),
+                archive_directory=
+                        get_setting('telex.retention.archive_directory'))
+        get_current_registry().registerUtility(pruner, ICommandPruner)
+        pruner.start(interval)
+    else:
+        pruner = None
+    return pruner
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        result = value.isoformat()
+    else:
+        raise TypeError('Can not serialize %r.' % value)
+    return result
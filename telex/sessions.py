@@ -0,0 +1,189 @@
+"""
+Pooled HTTP sessions for the telex server.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import cookielib
+from requests.compat import urlparse
+from requests.exceptions import ConnectionError
+from requests.exceptions import Timeout
+from requests.packages.urllib3.exceptions import ReadTimeoutError # pylint: disable=F0401
+from requests.packages.urllib3.util.retry import Retry # pylint: disable=F0401
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['HttpSessionRegistry',
+           'ResponseBodyTimeout',
+           'is_text_content_type',
+           'send_request',
+           'spool_response_body',
+           ]
+
+
+class ResponseBodyTimeout(Timeout):
+    """
+    Raised when the read timeout expires while reading a streamed response
+    body (i.e., after the response headers were received).
+    """
+
+
+class HttpSessionRegistry(object):
+    """
+    Process-wide registry of pooled HTTP sessions.
+
+    There is one session per host and pool configuration; connections to
+    the host are kept alive and reused by all commands using the same
+    configuration. Sessions do not store cookies so no state leaks from
+    one command to the next.
+    """
+    #: Status codes of responses which are retried (for idempotent request
+    #: methods only).
+    RETRY_STATUS_CODES = frozenset([502, 503, 504])
+    __sessions = {}
+    __lock = Lock()
+
+    @classmethod
+    def get(cls, url, pool_size=10, max_retries=0, retry_backoff=0):
+        """
+        Returns the session for the host in the given URL with the given
+        pool configuration, creating it on first use.
+
+        :param int pool_size: Maximum number of connections to keep alive.
+        :param int max_retries: Maximum number of retries. Connection errors
+          are retried for all request methods, read errors and responses
+          with a status code in :attr:`RETRY_STATUS_CODES` for idempotent
+          request methods only.
+        :param float retry_backoff: Backoff factor for the retries; the n-th
+          retry sleeps for `retry_backoff * 2 ** (n - 1)` seconds.
+        """
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.netloc, pool_size, max_retries,
+               retry_backoff)
+        with cls.__lock:
+            session = cls.__sessions.get(key)
+            if session is None:
+                session = cls.__make_session(pool_size, max_retries,
+                                             retry_backoff)
+                cls.__sessions[key] = session
+        return session
+
+    @classmethod
+    def clear(cls):
+        """
+        Closes all sessions.
+        """
+        with cls.__lock:
+            for session in cls.__sessions.values():
+                session.close()
+            cls.__sessions.clear()
+
+    @classmethod
+    def __make_session(cls, pool_size, max_retries, retry_backoff):
+        session = requests.Session()
+        session.cookies.set_policy(
+                            cookielib.DefaultCookiePolicy(allowed_domains=[]))
+        retry = Retry(total=max_retries,
+                      backoff_factor=retry_backoff,
+                      status_forcelist=cls.RETRY_STATUS_CODES,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+
+def send_request(command_definition, url, headers=None, data=None,
+                 stream=False):
+    """
+    Sends an HTTP request for the given REST command definition through
+    the pooled session for the target host, applying the connection pool,
+    keep-alive, timeout and retry settings of the definition.
+
+    :param bool stream: If set, only the response headers are read; the
+      body needs to be read from the response (e.g., with
+      :func:`spool_response_body`).
+    :returns: :class:`requests.Response` instance.
+    """
+    cmd_def = command_definition
+    session = HttpSessionRegistry.get(url,
+                                      pool_size=cmd_def.pool_size,
+                                      max_retries=cmd_def.max_retries,
+                                      retry_backoff=cmd_def.retry_backoff)
+    if headers is None:
+        headers = {}
+    if not cmd_def.keep_alive:
+        headers['connection'] = 'close'
+    if cmd_def.connect_timeout is None and cmd_def.read_timeout is None:
+        timeout = None
+    else:
+        timeout = (cmd_def.connect_timeout, cmd_def.read_timeout)
+    return session.request(cmd_def.operation, url, headers=headers,
+                           data=data, timeout=timeout, stream=stream)
+
+
+def spool_response_body(response, spool, max_size=None, chunk_size=65536):
+    """
+    Reads the body of the given streamed response chunk by chunk into the
+    given :class:`telex.capture.OutputSpool` and closes the spool.
+
+    The body is read as is (i.e., it is not decoded). If the body is larger
+    than `max_size` bytes, only the first `max_size` bytes are spooled and
+    the connection is closed rather than returned to the pool.
+
+    :returns: `True` if the body was truncated.
+    :raises ResponseBodyTimeout: If the read timeout expires.
+    :raises requests.exceptions.ChunkedEncodingError: If the body is
+      incomplete (e.g., the connection was reset).
+    """
+    size = 0
+    is_truncated = False
+    is_complete = False
+    try:
+        for chunk in response.iter_content(chunk_size):
+            if not max_size is None and size + len(chunk) > max_size:
+                spool.write(chunk[:max_size - size])
+                is_truncated = True
+                break
+            spool.write(chunk)
+            size += len(chunk)
+        else:
+            is_complete = True
+    except ConnectionError as exc:
+        # Read timeouts while streaming surface as connection errors; they
+        # must not be mistaken for a REST service refusing connections.
+        if exc.args and isinstance(exc.args[0], ReadTimeoutError):
+            raise ResponseBodyTimeout(exc, response=response)
+        raise
+    finally:
+        spool.close()
+        if not is_complete:
+            # The connection is not returned to the pool.
+            response.close()
+    return is_truncated
+
+
+#: MIME types (besides "text/*", "*+json" and "*+xml") with textual content.
+_TEXT_MIME_TYPES = frozenset(['application/json',
+                              'application/javascript',
+                              'application/xml',
+                              'application/x-www-form-urlencoded',
+                              ])
+
+
+def is_text_content_type(content_type):
+    """
+    Checks if the given content type (which may include parameters such as
+    a charset) denotes textual content.
+    """
+    mime_type = content_type.split(';')[0].strip().lower()
+    return mime_type.startswith('text/') \
+           or mime_type.endswith('+json') or mime_type.endswith('+xml') \
+           or mime_type in _TEXT_MIME_TYPES
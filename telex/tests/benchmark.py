@@ -0,0 +1,490 @@
+"""
+Benchmark harness for the telex server.
+
+Drives the telex WSGI application in-process (the way the `app_creator`
+test fixture does) and measures the throughput and the latency
+percentiles of the command submission hot path:
+
+ * "shell_command": POSTing echo shell commands;
+ * "rest_command": POSTing REST commands against a local stand-in
+   service;
+ * "definition_crud": creating, updating and deleting shell command
+   definitions;
+ * "listing_first_page", "listing_last_page", "listing_filtered":
+   GETting pages of the shell command collection.
+
+Each scenario is run on the selected backends (memory: `configure.zcml`;
+RDB: `configure_rdb.zcml`) at each of the given command history sizes; the
+history is filled up with echo commands before the scenarios are run at a
+size. When several backends are selected, each one is run in a process of
+its own. The results are written as JSON so runs of different versions can
+be compared::
+
+  python -m telex.tests.benchmark --backend memory --backend rdb \\
+      --history 0,100,1000 --iterations 200 --output results.json
+
+This module is not collected by the test runner.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor
+information.
+
+Created on Oct 18, 2026.
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+from threading import Thread
+import time
+
+from pkg_resources import DistributionNotFound # pylint: disable=E0611
+from pkg_resources import get_distribution # pylint: disable=E0611
+from pkg_resources import resource_filename # pylint: disable=E0611
+from pyramid.compat import PY3
+from pyramid.compat import native_
+from pyramid.httpexceptions import HTTPCreated
+from pyramid.httpexceptions import HTTPOk
+from pyramid.registry import Registry
+from pytz import timezone
+import transaction
+
+from everest.configuration import Configurator
+from everest.mime import JsonMime
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from everest.rfc3339 import rfc3339
+from everest.root import RootFactory
+from everest.testing import EverestTestApp
+from everest.testing import tear_down_registry
+from telex.cache import CommandDefinitionCache
+from telex.interfaces import IRestEngine
+from telex.sessions import HttpSessionRegistry
+from telex.tests.conftest import read_resource
+
+if PY3:
+    from http.server import BaseHTTPRequestHandler # pylint: disable=F0401
+    from http.server import HTTPServer # pylint: disable=F0401
+    from socketserver import ThreadingMixIn # pylint: disable=F0401
+else:
+    from BaseHTTPServer import BaseHTTPRequestHandler # pylint: disable=F0401
+    from BaseHTTPServer import HTTPServer # pylint: disable=F0401
+    from SocketServer import ThreadingMixIn # pylint: disable=F0401
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['BenchmarkApp',
+           'RestStandIn',
+           'SCENARIOS',
+           'main',
+           'run_benchmarks',
+           'summarize',
+           ]
+
+
+#: Maps backend names to the configuration files (in this package) setting
+#: them up.
+BACKENDS = dict(memory='configure.zcml',
+                rdb='configure_rdb.zcml')
+
+SHELL_COMMANDS_PATH = '/shell-commands'
+SHELL_COMMAND_DEFINITIONS_PATH = '/shell-command-definitions'
+REST_COMMANDS_PATH = '/rest-commands'
+REST_COMMAND_DEFINITIONS_PATH = '/rest-command-definitions'
+
+SUBMITTER = 'telexbenchmarkuser'
+TEXT = 'Hello Mars!'
+PAGE_SIZE = 50
+
+REST_COMMAND_DEFINITION_TEMPLATE = """\
+{"__jsonclass__":"http://telex.org/relations/rest-command-definition",
+ "name" : "post_stand_in",
+ "label" : "POST to stand-in",
+ "submitter" : "%(submitter)s",
+ "category" : "rest",
+ "url" : "%(url)s",
+ "request_content_type" : "%(content_type)s",
+ "response_content_type" : "%(content_type)s",
+ "operation" : "POST",
+ "description" : "Command POSTing to the benchmark stand-in service."
+}"""
+
+REST_COMMAND_TEMPLATE = """\
+{"__jsonclass__":"http://telex.org/relations/rest-command",
+ "command_definition":
+   "http://localhost:6543/rest-command-definitions/post_stand_in",
+ "submitter":"%(submitter)s",
+ "parameters":
+  [{"__jsonclass__":"http://telex.org/relations/parameter",
+    "parameter_definition":
+        "http://localhost:6543/rest-command-definitions/post_stand_in/parameter-definitions/body_text",
+    "value":"%%(param)s"
+    }],
+ "timestamp":"%(timestamp)s"
+}"""
+
+SHELL_COMMAND_DEFINITION_TEMPLATE = """\
+{"__jsonclass__":"http://telex.org/relations/shell-command-definition",
+ "name" : "%(name)s",
+ "label" : "%(label)s",
+ "executable" : "echo",
+ "submitter" : "%(submitter)s",
+ "category" : "shell",
+ "description" : "Benchmark command definition."
+}"""
+
+
+class BenchmarkApp(object):
+    """
+    Context manager setting up the telex application for the given
+    backend configuration file and returning a test app for it.
+    """
+    def __init__(self, config_file_name, settings=None):
+        self.__config_file_name = config_file_name
+        self.__settings = settings
+        self.__config = None
+
+    def __enter__(self):
+        reg = Registry('telex-benchmark')
+        self.__config = Configurator(registry=reg, package='telex.tests')
+        self.__config.setup_registry(settings=self.__settings,
+                                     root_factory=RootFactory())
+        self.__config.begin()
+        try:
+            self.__config.load_zcml(self.__config_file_name)
+        finally:
+            self.__config.end()
+        wsgiapp = self.__config.make_wsgi_app()
+        # Like the app_creator fixture, keep the application registry
+        # current for the benchmark thread.
+        self.__config.begin()
+        return EverestTestApp(wsgiapp)
+
+    def __exit__(self, ext_type, value, tb):
+        transaction.abort()
+        rest_engine = self.__config.registry.queryUtility(IRestEngine)
+        if not rest_engine is None:
+            rest_engine.shutdown()
+        self.__config.end()
+        tear_down_registry(self.__config.registry)
+        Session.remove()
+        # The process-wide caches hold entities of this application.
+        CommandDefinitionCache.clear()
+        HttpSessionRegistry.clear()
+
+
+class _StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in REST service answering each POST with "201 Created" and an
+    empty JSON object.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self): # pylint:disable=C0103
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{}'
+        self.send_response(201)
+        self.send_header('Content-Type', JsonMime.mime_type_string)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): # pylint:disable=W0221
+        pass
+
+
+class RestStandIn(object):
+    """
+    Context manager running the stand-in REST service on a free local
+    port; returns the URL of the service.
+    """
+    def __init__(self):
+        self.__server = None
+
+    def __enter__(self):
+        self.__server = _StandInServer(('127.0.0.1', 0), _StandInHandler)
+        thread = Thread(target=self.__server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return 'http://127.0.0.1:%d/echo' % self.__server.server_address[1]
+
+    def __exit__(self, ext_type, value, tb):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+class _BenchmarkContext(object):
+    """
+    State shared by the scenarios run on one application.
+    """
+    def __init__(self, app, rest_url):
+        self.app = app
+        self.rest_url = rest_url
+        #: Number of commands in the shell command history.
+        self.history_size = 0
+        self.__counter = 0
+        timestamp = datetime.datetime(2012, 8, 29, 16, 20, 0,
+                                      tzinfo=timezone('UTC'))
+        tmpl_data = dict(submitter=SUBMITTER,
+                         timestamp=rfc3339(timestamp,
+                                           use_system_timezone=False))
+        self.shell_command_template = \
+            read_resource(resource_filename('telex.tests',
+                                            'echo_cmd.json.tmpl')) \
+            % tmpl_data
+        self.rest_command_template = REST_COMMAND_TEMPLATE % tmpl_data
+
+    def next_id(self):
+        self.__counter += 1
+        return self.__counter
+
+    def post(self, path, data, status=HTTPCreated.code):
+        return self.app.post(path, params=data,
+                             content_type=JsonMime.mime_type_string,
+                             status=status)
+
+    def get(self, path, params=None):
+        return self.app.get(path, params=params,
+                            headers=dict(accept=JsonMime.mime_type_string),
+                            status=HTTPOk.code)
+
+    def post_shell_command(self):
+        self.post(SHELL_COMMANDS_PATH,
+                  self.shell_command_template % dict(param=TEXT))
+        self.history_size += 1
+
+    def set_up(self):
+        """
+        Creates the echo shell command definition and the stand-in REST
+        command definition.
+        """
+        self.post(SHELL_COMMAND_DEFINITIONS_PATH,
+                  read_resource(resource_filename('telex.tests',
+                                                  'echo_cmd_def.json.tmpl')))
+        prm_def_data = read_resource(resource_filename('telex.tests',
+                                                       'echo_prm_def.json.tmpl'))
+        self.post(SHELL_COMMAND_DEFINITIONS_PATH
+                  + '/echo/parameter-definitions', prm_def_data)
+        self.post(REST_COMMAND_DEFINITIONS_PATH,
+                  REST_COMMAND_DEFINITION_TEMPLATE
+                  % dict(submitter=SUBMITTER, url=self.rest_url,
+                         content_type=JsonMime.mime_type_string))
+        # Parameter definitions need to have unique names.
+        self.post(REST_COMMAND_DEFINITIONS_PATH
+                  + '/post_stand_in/parameter-definitions',
+                  prm_def_data.replace('"text"', '"body_text"'))
+
+    def fill_history(self, size):
+        """
+        POSTs echo shell commands until the history holds (at least) the
+        given number of commands.
+        """
+        while self.history_size < size:
+            self.post_shell_command()
+
+
+def _run_shell_command(ctx):
+    ctx.post_shell_command()
+
+
+def _run_rest_command(ctx):
+    ctx.post(REST_COMMANDS_PATH, ctx.rest_command_template % dict(param=TEXT))
+
+
+def _run_definition_crud(ctx):
+    name = 'bench%d' % ctx.next_id()
+    data = dict(name=name, label='Benchmark', submitter=SUBMITTER)
+    rsp = ctx.post(SHELL_COMMAND_DEFINITIONS_PATH,
+                   SHELL_COMMAND_DEFINITION_TEMPLATE % data)
+    url = rsp.headers['Location']
+    data['label'] = 'Benchmark (updated)'
+    ctx.app.put(url, params=SHELL_COMMAND_DEFINITION_TEMPLATE % data,
+                content_type=JsonMime.mime_type_string,
+                status=HTTPOk.code)
+    ctx.app.delete(url, status=HTTPOk.code)
+
+
+def _run_listing_first_page(ctx):
+    ctx.get(SHELL_COMMANDS_PATH, params=dict(size=PAGE_SIZE))
+
+
+def _run_listing_last_page(ctx):
+    ctx.get(SHELL_COMMANDS_PATH, params=dict(size=PAGE_SIZE,
+                                             direction='desc'))
+
+
+def _run_listing_filtered(ctx):
+    ctx.get(SHELL_COMMANDS_PATH, params=dict(size=PAGE_SIZE,
+                                             command_definition='echo',
+                                             submitter=SUBMITTER))
+
+
+#: Maps scenario names to callables performing one iteration.
+SCENARIOS = dict(shell_command=_run_shell_command,
+                 rest_command=_run_rest_command,
+                 definition_crud=_run_definition_crud,
+                 listing_first_page=_run_listing_first_page,
+                 listing_last_page=_run_listing_last_page,
+                 listing_filtered=_run_listing_filtered)
+
+
+def _get_percentile(sorted_values, percent):
+    # Nearest-rank percentile.
+    idx = max(0, int(-(-len(sorted_values) * percent // 100)) - 1)
+    return sorted_values[idx]
+
+
+def summarize(latencies, elapsed):
+    """
+    Returns a dictionary with the throughput (iterations per second) and
+    the latency statistics (in milliseconds) for the given latencies (in
+    seconds) measured in the given elapsed time.
+    """
+    values = sorted(latencies)
+    if not values:
+        return dict(iterations=0, throughput=None, latency_ms=None)
+    latency_ms = dict(min=values[0] * 1000,
+                      p50=_get_percentile(values, 50) * 1000,
+                      p99=_get_percentile(values, 99) * 1000,
+                      max=values[-1] * 1000,
+                      mean=sum(values) / len(values) * 1000)
+    return dict(iterations=len(values),
+                throughput=len(values) / elapsed if elapsed > 0 else None,
+                latency_ms=latency_ms)
+
+
+def _run_scenario(ctx, func, iterations, warmup):
+    for _ in range(warmup):
+        func(ctx)
+    latencies = []
+    start = time.time()
+    for _ in range(iterations):
+        it_start = time.time()
+        func(ctx)
+        latencies.append(time.time() - it_start)
+    return summarize(latencies, time.time() - start)
+
+
+def run_benchmarks(backend, history_sizes, scenario_names, iterations,
+                   warmup=5, settings=None, log=None):
+    """
+    Runs the given scenarios on the given backend at the given history
+    sizes.
+
+    Note that the RDB backend maps the entity classes, so the other
+    backends can not be run in the same process afterwards.
+
+    :returns: List of result dictionaries (one per history size and
+      scenario).
+    """
+    results = []
+    with RestStandIn() as rest_url:
+        with BenchmarkApp(BACKENDS[backend], settings=settings) as app:
+            ctx = _BenchmarkContext(app, rest_url)
+            ctx.set_up()
+            for history_size in sorted(history_sizes):
+                ctx.fill_history(history_size)
+                for scenario_name in scenario_names:
+                    # Running a scenario may add to the history.
+                    actual_size = ctx.history_size
+                    result = _run_scenario(ctx, SCENARIOS[scenario_name],
+                                           iterations, warmup)
+                    result.update(backend=backend,
+                                  scenario=scenario_name,
+                                  history_size=actual_size)
+                    results.append(result)
+                    if not log is None:
+                        log('%s/%s at %d: %s' % (backend, scenario_name,
+                                                 actual_size,
+                                                 result['latency_ms']))
+    return results
+
+
+def _run_in_subprocess(backend, opts, scenario_names):
+    argv = [sys.executable, '-m', 'telex.tests.benchmark',
+            '--backend', backend,
+            '--history', opts.history,
+            '--iterations', str(opts.iterations),
+            '--warmup', str(opts.warmup)]
+    for scenario_name in scenario_names:
+        argv.extend(['--scenario', scenario_name])
+    output = subprocess.check_output(argv)
+    return json.loads(native_(output))['results']
+
+
+def _get_environment():
+    try:
+        version = get_distribution('telex').version
+    except DistributionNotFound:
+        version = None
+    return dict(telex_version=version,
+                python_version=platform.python_version(),
+                python_implementation=platform.python_implementation(),
+                platform=platform.platform(),
+                timestamp=rfc3339(datetime.datetime.now(timezone('UTC')),
+                                  use_system_timezone=False))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+                description='Benchmarks the telex command submission hot '
+                            'path and writes the results as JSON.')
+    parser.add_argument('--backend', action='append',
+                        choices=sorted(BACKENDS),
+                        help='Backend to benchmark (repeatable; default: '
+                             'all).')
+    parser.add_argument('--scenario', action='append',
+                        choices=sorted(SCENARIOS),
+                        help='Scenario to run (repeatable; default: all).')
+    parser.add_argument('--history', default='0,100,1000',
+                        help='Comma separated command history sizes '
+                             '(default: %(default)s).')
+    parser.add_argument('--iterations', type=int, default=100,
+                        help='Measured iterations per scenario (default: '
+                             '%(default)s).')
+    parser.add_argument('--warmup', type=int, default=5,
+                        help='Unmeasured iterations per scenario (default: '
+                             '%(default)s).')
+    parser.add_argument('--output', default='-',
+                        help='Output file ("-" for stdout; default: '
+                             '%(default)s).')
+    opts = parser.parse_args(args)
+    history_sizes = [int(size) for size in opts.history.split(',')
+                     if size.strip()]
+    scenario_names = opts.scenario or sorted(SCENARIOS)
+
+    def log(msg):
+        sys.stderr.write(msg + '\n')
+    backends = opts.backend or sorted(BACKENDS)
+    if len(backends) == 1:
+        results = run_benchmarks(backends[0], history_sizes,
+                                 scenario_names, opts.iterations,
+                                 warmup=opts.warmup, log=log)
+    else:
+        # Each backend is run in a process of its own (see
+        # :func:`run_benchmarks`).
+        results = []
+        for backend in backends:
+            results.extend(_run_in_subprocess(backend, opts,
+                                              scenario_names))
+    report = dict(environment=_get_environment(),
+                  parameters=dict(history_sizes=history_sizes,
+                                  iterations=opts.iterations,
+                                  warmup=opts.warmup,
+                                  page_size=PAGE_SIZE),
+                  results=results)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if opts.output == '-':
+        sys.stdout.write(text + '\n')
+    else:
+        with open(opts.output, 'w') as out_file:
+            out_file.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
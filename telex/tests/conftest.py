@@ -6,6 +6,7 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 Created on Sep 26, 2014.
 """
 import datetime
+import io
 import os
 import sys
 
@@ -108,20 +109,29 @@ class MockRequests(object):
     def __init__(self, app):
         self.__app = app
 
-    def __call__(self, operation, url, data=None, headers=None):
+    def __call__(self, operation, url, data=None, headers=None, **kw):
         cnt_tpe = headers.pop('content-type', None)
         op_method = getattr(self.__app, operation.lower())
-        return op_method(url, params=data, content_type=cnt_tpe,
-                         status=HTTPCreated.code)
+        app_rsp = op_method(url, params=data, content_type=cnt_tpe,
+                            status=HTTPCreated.code)
+        # The REST command streams the body from a requests response.
+        rsp = requests.Response()
+        rsp.status_code = app_rsp.status_int
+        rsp.headers.update(app_rsp.headers.items())
+        rsp.encoding = app_rsp.charset
+        rsp.raw = io.BytesIO(app_rsp.body)
+        rsp.url = url
+        return rsp
 
 
 @pytest.fixture
 def app_mocked_request(app_creator, monkeypatch):
     """
     This redirects the REST operations that are normally carried out through
-    the requests.request function to appropriate calls to our test app.
+    pooled requests sessions to appropriate calls to our test app.
     """
-    monkeypatch.setattr(requests, 'request', MockRequests(app_creator))
+    monkeypatch.setattr(requests.Session, 'request',
+                        MockRequests(app_creator))
     return app_creator
 
 
@@ -0,0 +1,36 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from telex.tests.benchmark import summarize
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+class TestSummarize(object):
+
+    def test_percentiles(self):
+        latencies = [idx / 1000.0 for idx in range(100, 0, -1)]
+        result = summarize(latencies, 2.0)
+        assert result['iterations'] == 100
+        assert result['throughput'] == 50.0
+        latency_ms = result['latency_ms']
+        assert round(latency_ms['min'], 6) == 1.0
+        assert round(latency_ms['p50'], 6) == 50.0
+        assert round(latency_ms['p99'], 6) == 99.0
+        assert round(latency_ms['max'], 6) == 100.0
+        assert round(latency_ms['mean'], 6) == 50.5
+
+    def test_single_value(self):
+        result = summarize([0.01], 0.01)
+        assert round(result['latency_ms']['p99'], 6) == 10.0
+        assert round(result['throughput'], 6) == 100.0
+
+    def test_empty(self):
+        result = summarize([], 0)
+        assert result['iterations'] == 0
+        assert result['latency_ms'] is None
@@ -0,0 +1,388 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import sys
+from threading import Event
+from threading import Thread
+from threading import Timer
+import time
+
+from pyramid.registry import Registry
+from pyramid.threadlocal import get_current_registry
+from pyramid.threadlocal import manager
+import pytest
+import transaction
+
+from telex.cache import CachedResult
+from telex.cache import CommandDefinitionCache
+from telex.cache import ResultCache
+from telex.cache import SingleFlight
+from telex.cache import make_result_key
+from telex.constants import COMMAND_STATUS
+from telex.constants import EXECUTION_MODES
+from telex.constants import VALUE_TYPES
+from telex.entities import Parameter
+from telex.entities import ShellCommand
+from telex.entities import ShellCommandDefinition
+from telex.interfaces import IResultCache
+from telex.process import ChildProcess
+from telex.process import ProcessRegistry
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+@pytest.fixture
+def cmd_def(submitter):
+    cd = ShellCommandDefinition('cached', 'Cached command.', submitter,
+                                'echo', id=1)
+    pd = cd.add_parameter_definition('text', 'Text', VALUE_TYPES.STRING)
+    pd.add_parameter_option('is_mandatory', True)
+    cd.add_parameter_definition('n', 'Number', VALUE_TYPES.INT)
+    CommandDefinitionCache.clear()
+    yield cd
+    CommandDefinitionCache.clear()
+
+
+class TestCommandDefinitionCache(object):
+
+    def test_get(self, cmd_def): # pylint:disable=W0621
+        info = CommandDefinitionCache.get(cmd_def)
+        assert info.parameter_names == set(['text', 'n'])
+        assert info.mandatory_parameter_names == set(['text'])
+        assert info.get_option('text', 'is_mandatory')
+        assert CommandDefinitionCache.get(cmd_def) is info
+        assert CommandDefinitionCache.get_statistics() == \
+                    dict(hits=1, misses=1, size=1)
+
+    def test_invalidate(self, cmd_def): # pylint:disable=W0621
+        info = CommandDefinitionCache.get(cmd_def)
+        with transaction.manager:
+            CommandDefinitionCache.invalidate(cmd_def.name)
+            assert CommandDefinitionCache.get_statistics()['size'] == 0
+            # A stale entry created before the commit is removed again.
+            CommandDefinitionCache.get(cmd_def)
+        assert CommandDefinitionCache.get_statistics()['size'] == 0
+        assert not CommandDefinitionCache.get(cmd_def) is info
+
+    def test_id_mismatch(self, cmd_def): # pylint:disable=W0621
+        info = CommandDefinitionCache.get(cmd_def)
+        cmd_def.id = 2
+        assert not CommandDefinitionCache.get(cmd_def) is info
+
+    def test_registries(self, cmd_def): # pylint:disable=W0621
+        info = CommandDefinitionCache.get(cmd_def)
+        # Another application sees its own definitions.
+        manager.push(dict(registry=Registry('other'), request=None))
+        try:
+            assert CommandDefinitionCache.get_statistics()['size'] == 0
+            assert not CommandDefinitionCache.get(cmd_def) is info
+        finally:
+            manager.pop()
+        assert CommandDefinitionCache.get(cmd_def) is info
+
+    def test_not_persisted(self, cmd_def): # pylint:disable=W0621
+        cmd_def.id = None
+        CommandDefinitionCache.get(cmd_def)
+        assert CommandDefinitionCache.get_statistics()['size'] == 0
+
+
+def _make_result(size):
+    return CachedResult(0, b'x' * size, b'')
+
+
+class TestResultCache(object):
+
+    def test_lru_eviction(self):
+        cache = ResultCache(max_size=30)
+        for key in ('a', 'b', 'c'):
+            cache.put(key, _make_result(10))
+        # Touching "a" makes "b" the least recently used entry.
+        assert not cache.get('a') is None
+        cache.put('d', _make_result(10))
+        assert cache.get('b') is None
+        assert [cache.get(key).output for key in ('a', 'c', 'd')] \
+                == [b'x' * 10] * 3
+        # Results larger than the cache are not cached at all.
+        cache.put('e', _make_result(31))
+        assert cache.get('e') is None
+        assert cache.get_statistics()['bytes'] == 30
+
+    def test_expiry(self, monkeypatch):
+        cache = ResultCache(max_age=60)
+        cache.put('a', _make_result(10))
+        assert not cache.get('a') is None
+        orig_time = time.time
+        monkeypatch.setattr(time, 'time', lambda: orig_time() + 61)
+        assert cache.get('a') is None
+        monkeypatch.undo()
+        assert cache.get_statistics()['size'] == 0
+
+    def test_directory(self, tmpdir):
+        cache = ResultCache(directory=str(tmpdir))
+        cache.put('a', CachedResult(3, b'out\n', b'err\n'))
+        # A new cache (e.g., after a restart) picks up the stored results.
+        cache = ResultCache(directory=str(tmpdir))
+        result = cache.get('a')
+        assert (result.exit_code, result.output, result.errors) \
+                == (3, b'out\n', b'err\n')
+        cache.clear()
+        assert tmpdir.listdir() == []
+
+    def test_statistics(self):
+        cache = ResultCache()
+        cache.put('a', _make_result(10))
+        for key in ('a', 'a', 'a', 'b'):
+            cache.get(key)
+        stats = cache.get_statistics()
+        assert stats == dict(hits=3, misses=1, hit_rate=0.75,
+                             bytes_saved=30, size=1, bytes=10)
+
+    def test_make_result_key(self):
+        key = make_result_key(EXECUTION_MODES.ARGV, ['echo', 'hi', '-n3'],
+                              None, {'A': '1'})
+        # The command line, the working directory and the environment
+        # matter.
+        for args, cwd, env in ((['echo', '-n3', 'hi'], None, {'A': '1'}),
+                               (['echo', 'hi', '--n=3'], None, {'A': '1'}),
+                               (['echo', 'hi', '-n3'], '/tmp', {'A': '1'}),
+                               (['echo', 'hi', '-n3'], None, {'A': '2'})):
+            assert make_result_key(EXECUTION_MODES.ARGV, args, cwd, env) \
+                    != key
+        assert make_result_key(EXECUTION_MODES.SHELL, 'echo hi -n3', None,
+                               {'A': '1'}) != key
+
+    def test_run_cached(self, submitter, tmpdir):
+        cmd_def = ShellCommandDefinition(
+                        'counter', 'Counter.', submitter,
+                        '%s -c "import sys; open(sys.argv[1], \'a\')'
+                        '.write(\'x\'); print(\'done\')"'
+                        % sys.executable,
+                        cacheable=True)
+        pd = cmd_def.add_parameter_definition('path', 'Path',
+                                              VALUE_TYPES.STRING)
+        pd.add_parameter_option('is_mandatory', True)
+        counter_path = tmpdir.join('counter')
+        cache = ResultCache()
+        reg = get_current_registry()
+        reg.registerUtility(cache, IResultCache)
+
+        def run():
+            cmd = ShellCommand.create_from_data(
+                            dict(command_definition=cmd_def,
+                                 submitter=submitter,
+                                 parameters=[Parameter(pd,
+                                                       str(counter_path))]))
+            cmd.run()
+            assert cmd.status == COMMAND_STATUS.FINISHED
+            assert cmd.exit_code == 0
+            assert cmd.output_string.strip() == 'done'
+        try:
+            for _ in range(2):
+                run()
+            # The second run was served from the cache.
+            assert counter_path.read() == 'x'
+            assert cache.get_statistics()['hits'] == 1
+            # Adding a parameter with a default value changes the command
+            # line, so the command is run again.
+            dflt_pd = cmd_def.add_parameter_definition('n', 'Number',
+                                                       VALUE_TYPES.INT)
+            dflt_pd.add_parameter_option('default_value', '1')
+            CommandDefinitionCache.clear()
+            run()
+            assert counter_path.read() == 'xx'
+        finally:
+            reg.unregisterUtility(cache, IResultCache)
+            CommandDefinitionCache.clear()
+
+
+class TestSingleFlight(object):
+
+    def _run_followers(self, key, func, num_followers):
+        results = []
+        threads = [Thread(target=lambda: results.append(
+                                                SingleFlight.run(key, func)))
+                   for _ in range(num_followers)]
+        for thread in threads:
+            thread.start()
+        # Wait until all followers are attached to the call in flight.
+        deadline = time.time() + 5
+        while SingleFlight.get_statistics()['coalesced'] \
+                < self._coalesced + num_followers and time.time() < deadline:
+            time.sleep(0.01)
+        return threads, results
+
+    def test_coalesce(self):
+        self._coalesced = SingleFlight.get_statistics()['coalesced']
+        started = Event()
+        release = Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 42
+        leader = Thread(target=lambda: SingleFlight.run('coalesce', func))
+        leader.start()
+        started.wait(5)
+        threads, results = self._run_followers('coalesce', func, 3)
+        release.set()
+        for thread in [leader] + threads:
+            thread.join(5)
+        assert len(calls) == 1
+        assert results == [(42, False)] * 3
+        assert SingleFlight.get_statistics()['in_flight'] == 0
+
+    def test_failure(self):
+        self._coalesced = SingleFlight.get_statistics()['coalesced']
+        started = Event()
+        release = Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            if len(calls) == 1:
+                started.set()
+                release.wait(5)
+                raise RuntimeError('Failed.')
+            return 42
+        errors = []
+
+        def run_leader():
+            try:
+                SingleFlight.run('failure', func)
+            except RuntimeError as err:
+                errors.append(err)
+        leader = Thread(target=run_leader)
+        leader.start()
+        started.wait(5)
+        threads, results = self._run_followers('failure', func, 2)
+        release.set()
+        for thread in [leader] + threads:
+            thread.join(5)
+        # The error is only raised for the leader; the followers make the
+        # call themselves.
+        assert len(errors) == 1
+        assert len(calls) == 3
+        assert results == [(42, True)] * 2
+
+    def test_not_shareable(self):
+        self._coalesced = SingleFlight.get_statistics()['coalesced']
+        started = Event()
+        release = Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            if len(calls) == 1:
+                started.set()
+                release.wait(5)
+                return -1
+            return 42
+        leader = Thread(target=lambda: SingleFlight.run(
+                                                'shareable', func,
+                                                is_shareable=lambda value:
+                                                                value >= 0))
+        leader.start()
+        started.wait(5)
+        results = []
+        follower = Thread(target=lambda: results.append(
+                                        SingleFlight.run(
+                                                'shareable', func,
+                                                is_shareable=lambda value:
+                                                                value >= 0)))
+        follower.start()
+        while SingleFlight.get_statistics()['coalesced'] == self._coalesced:
+            time.sleep(0.01)
+        release.set()
+        for thread in (leader, follower):
+            thread.join(5)
+        assert results == [(42, True)]
+
+    def test_timeout(self):
+        started = Event()
+        release = Event()
+
+        def func():
+            started.set()
+            release.wait(5)
+            return 42
+        leader = Thread(target=lambda: SingleFlight.run('timeout', func))
+        leader.start()
+        started.wait(5)
+        try:
+            # The follower gives up waiting and makes the call itself.
+            assert SingleFlight.run('timeout', lambda: 7, timeout=0.1) \
+                    == (7, True)
+        finally:
+            release.set()
+            leader.join(5)
+
+    def test_interrupt(self):
+        started = Event()
+        release = Event()
+
+        def func():
+            started.set()
+            release.wait(5)
+            return 42
+        leader = Thread(target=lambda: SingleFlight.run('interrupt', func))
+        leader.start()
+        started.wait(5)
+        waiter = Event()
+        Timer(0.1, waiter.set).start()
+        try:
+            # The follower stops waiting and makes the call itself.
+            assert SingleFlight.run('interrupt', lambda: 7, waiter=waiter) \
+                    == (7, True)
+            assert leader.is_alive()
+        finally:
+            release.set()
+            leader.join(5)
+
+    def test_cancel_follower(self, submitter):
+        cmd_def = ShellCommandDefinition(
+                        'sleeper', 'Sleeper.', submitter,
+                        '%s -c "import time; time.sleep(3); print(\'done\')"'
+                        % sys.executable,
+                        cacheable=True)
+        cache = ResultCache()
+        reg = get_current_registry()
+        reg.registerUtility(cache, IResultCache)
+        try:
+            leader = ShellCommand(cmd_def, submitter, [], id=101)
+            follower = ShellCommand(cmd_def, submitter, [], id=102)
+            threads = []
+            for cmd_id, cmd in ((101, leader), (102, follower)):
+                thread = Thread(target=cmd.run)
+                thread.start()
+                threads.append(thread)
+                # Wait until the leader runs its process or the follower
+                # waits for it.
+                deadline = time.time() + 5
+                if cmd is leader:
+                    is_waiting = lambda proc: not isinstance(proc,
+                                                             ChildProcess)
+                else:
+                    is_waiting = lambda proc: proc is None
+                while is_waiting(ProcessRegistry.get(cmd_id)) \
+                      and time.time() < deadline:
+                    time.sleep(0.01)
+            assert follower.cancel()
+            # The follower stops waiting for the leader right away.
+            threads[1].join(2)
+            assert not threads[1].is_alive()
+            assert threads[0].is_alive()
+            threads[0].join(10)
+        finally:
+            reg.unregisterUtility(cache, IResultCache)
+            CommandDefinitionCache.clear()
+        assert leader.status == COMMAND_STATUS.FINISHED
+        assert leader.output_string.strip() == 'done'
+        assert follower.status == COMMAND_STATUS.CANCELLED
+        assert follower.output_string == ''
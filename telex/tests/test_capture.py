@@ -0,0 +1,153 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import os
+from subprocess import PIPE
+from subprocess import Popen
+import sys
+from threading import Thread
+
+import pytest
+
+from telex.capture import OutputCapture
+from telex.capture import OutputSpool
+from telex.capture import StoredOutput
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+class TestOutputSpool(object):
+
+    def test_in_memory(self):
+        spool = OutputSpool(memory_threshold=16)
+        spool.write(b'abc')
+        spool.write(b'def')
+        spool.close()
+        assert not spool.is_spooled
+        assert spool.size == 6
+        assert spool.read(2, 3) == b'cde'
+        assert spool.getvalue() == 'abcdef'
+
+    def test_spooled(self, tmpdir):
+        spool = OutputSpool(memory_threshold=4,
+                            spool_directory=str(tmpdir))
+        spool.write(b'abc')
+        spool.write(b'def\r\n')
+        spool.write(b'ghi')
+        spool.close()
+        assert spool.is_spooled
+        assert len(tmpdir.listdir()) == 1
+        assert spool.size == 11
+        assert spool.read(4) == b'ef\r\nghi'
+        assert spool.getvalue() == 'abcdef\nghi'
+        assert spool.head == 'abcdef\nghi'
+        del spool
+        assert len(tmpdir.listdir()) == 0
+
+    def test_head_and_tail(self):
+        spool = OutputSpool(memory_threshold=OutputSpool.PREVIEW_SIZE)
+        for _ in range(4):
+            spool.write(b'x' * OutputSpool.PREVIEW_SIZE)
+        spool.write(b'end')
+        assert spool.is_spooled
+        assert spool.head == 'x' * OutputSpool.PREVIEW_SIZE
+        assert spool.tail.endswith('xend')
+        assert len(spool.tail) == OutputSpool.PREVIEW_SIZE
+
+    def test_iter_chunks(self):
+        spool = OutputSpool()
+        spool.write(b'line 1\nline')
+
+        def write_more():
+            spool.write(b' 2\n')
+            spool.close()
+        chunks = spool.iter_chunks(offset=2, poll_interval=0.1,
+                                   align_lines=True)
+        assert next(chunks) == (b'ne 1\n', 7)
+        Thread(target=write_more).start()
+        assert list(chunks) == [(b'line 2\n', 14)]
+
+    def test_iter_chunks_no_follow(self):
+        spool = OutputSpool()
+        spool.write(b'abcdef')
+        chunks = spool.iter_chunks(follow=False, chunk_size=4)
+        assert list(chunks) == [(b'abcd', 4), (b'ef', 6)]
+
+    def test_iter_chunks_size(self):
+        spool = OutputSpool()
+        spool.write(b'abcdefgh')
+        # Stops after the given number of bytes even though more output is
+        # expected.
+        chunks = spool.iter_chunks(offset=1, chunk_size=4, size=5)
+        assert list(chunks) == [(b'bcde', 5), (b'f', 6)]
+
+    def test_from_string(self):
+        spool = OutputSpool.from_string('Hello Mars!')
+        assert spool.is_closed
+        assert spool.getvalue() == 'Hello Mars!'
+
+
+class TestOutputCapture(object):
+
+    def test_capture(self, tmpdir):
+        script = 'import sys; sys.stdout.write("o" * 100000); ' \
+                 'sys.stderr.write("error")'
+        child = Popen([sys.executable, '-c', script],
+                      stdout=PIPE, stderr=PIPE)
+        capture = OutputCapture(chunk_size=1024, memory_threshold=4096,
+                                spool_directory=str(tmpdir))
+        capture.capture(child)
+        assert child.wait() == 0
+        assert capture.output.is_closed and capture.errors.is_closed
+        assert capture.output.is_spooled
+        assert capture.output.size == 100000
+        assert capture.errors.getvalue() == 'error'
+        assert not os.listdir(str(tmpdir)) == []
+
+
+class TestStoredOutput(object):
+
+    @pytest.mark.parametrize('compression', ['none', 'zlib'])
+    def test_store(self, compression):
+        data = b'0123456789' * 100
+        stored = StoredOutput(StoredOutput.OUTPUT)
+        stored.store(OutputSpool.from_string(data), compression=compression)
+        assert stored.size == len(data)
+        assert not stored.is_truncated
+        if compression == 'zlib':
+            assert len(stored.data) < len(data)
+        assert stored.get_bytes() == data
+        assert stored.to_spool().getvalue() == data.decode('utf-8')
+
+    def test_store_truncated(self):
+        spool = OutputSpool.from_string(b'a' * 50 + b'b' * 50)
+        stored = StoredOutput(StoredOutput.ERRORS)
+        stored.store(spool, max_size=10)
+        assert stored.size == 100
+        assert stored.is_truncated
+        assert stored.get_bytes() == \
+                b'aaaaa\n[... 90 bytes truncated ...]\nbbbbb'
+
+    @pytest.mark.parametrize('compression', ['none', 'zlib'])
+    def test_store_spooled(self, tmpdir, compression):
+        spool = OutputSpool(memory_threshold=1024,
+                            spool_directory=str(tmpdir))
+        for char in (b'a', b'b', b'c'):
+            spool.write(char * 100000)
+        spool.close()
+        stored = StoredOutput(StoredOutput.OUTPUT)
+        stored.store(spool, max_size=200000, compression=compression)
+        assert stored.size == 300000
+        assert stored.get_bytes() == \
+                b'a' * 100000 + b'\n[... 100000 bytes truncated ...]\n' \
+                + b'c' * 100000
+
+    def test_invalid_compression(self):
+        stored = StoredOutput(StoredOutput.OUTPUT)
+        with pytest.raises(ValueError):
+            stored.store(OutputSpool.from_string(b''), compression='lzma')
@@ -3,16 +3,25 @@ Created on Jul 8, 2014.
 """
 from pkg_resources import resource_filename # pylint: disable=E0611
 from pyramid.compat import native_
+from pyramid.httpexceptions import HTTPAccepted
 from pyramid.httpexceptions import HTTPBadRequest
 from pyramid.httpexceptions import HTTPCreated
+from pyramid.httpexceptions import HTTPOk
+from pyramid.httpexceptions import HTTPPartialContent
 from pyramid.httpexceptions import HTTPRedirection
+from pyramid.httpexceptions import HTTPServiceUnavailable
+from pyramid.threadlocal import get_current_registry
 import pytest
 
 from everest.mime import JsonMime
 from everest.representers.utils import as_representer
 from everest.resources.utils import get_root_collection
+from telex.constants import COMMAND_STATUS
+from telex.interfaces import IJobQueue
 from telex.interfaces import IShellCommand
 from telex.interfaces import IShellCommandDefinition
+from telex.jobs import JobQueue
+from telex.tests.conftest import SCRIPT
 from telex.tests.messages import ERROR_MSG
 from telex.tests.messages import INFO_MSG
 from telex.tests.messages import WARNING_MSG
@@ -53,6 +62,94 @@ class TestSimpleShellCommand(_TestTelexShellCommandBase):
         assert argv[1] == TEXT
         assert cmd_mb.command_definition == shell_cmd_def_echo
 
+    def test_output(self, app_creator, shell_cmd_def_echo, # pylint:disable=W0613
+                    cmd_data_template):
+        post_data = cmd_data_template % dict(param=TEXT)
+        rsp = app_creator.post(self.commands_path,
+                               params=post_data,
+                               content_type=JsonMime.mime_type_string,
+                               status=HTTPCreated.code)
+        cmd_url = rsp.headers['Location']
+        rsp = app_creator.get(cmd_url + '/output', status=HTTPOk.code)
+        assert native_(rsp.body).strip().endswith(TEXT)
+        rsp = app_creator.get(cmd_url + '/output',
+                              params=dict(offset=len(SCRIPT) + 1),
+                              status=HTTPOk.code)
+        assert native_(rsp.body).strip() == TEXT
+        rsp = app_creator.get(cmd_url + '/output',
+                              headers={'Range': 'bytes=-%d' % (len(TEXT) + 1)},
+                              status=HTTPPartialContent.code)
+        assert native_(rsp.body).strip() == TEXT
+        start = len(SCRIPT) + 1
+        end = start + len(TEXT) - 2
+        rsp = app_creator.get(cmd_url + '/output',
+                              headers={'Range': 'bytes=%d-%d' % (start, end)},
+                              status=HTTPPartialContent.code)
+        assert native_(rsp.body) == TEXT[:-1]
+        assert rsp.headers['Content-Range'] \
+                == 'bytes %d-%d/%d' % (start, end, start + len(TEXT) + 1)
+        rsp = app_creator.get(cmd_url + '/errors', status=HTTPOk.code)
+        assert rsp.body == b''
+
+
+class TestShellCommandBatch(_TestTelexShellCommandBase):
+    command_template_path = \
+                    resource_filename('telex.tests', 'echo_cmd.json.tmpl')
+
+    def test_batch(self, app_creator, shell_cmd_def_echo, # pylint:disable=W0613
+                   cmd_data_template):
+        texts = ['%s %d' % (TEXT, idx) for idx in range(3)]
+        post_data = '[%s]' % ','.join([cmd_data_template % dict(param=text)
+                                       for text in texts])
+        app_creator.post(self.commands_path + '/batch',
+                         params=post_data,
+                         content_type=JsonMime.mime_type_string,
+                         status=HTTPCreated.code)
+        c_coll = get_root_collection(IShellCommand)
+        cmd_mbs = list(c_coll)
+        assert len(cmd_mbs) == len(texts)
+        assert all(cmd_mb.status == COMMAND_STATUS.FINISHED
+                   for cmd_mb in cmd_mbs)
+        assert sorted([cmd_mb.output_string.strip().split(',')[1]
+                       for cmd_mb in cmd_mbs]) == texts
+
+
+class TestAsyncShellCommand(_TestTelexShellCommandBase):
+    command_template_path = \
+                    resource_filename('telex.tests', 'echo_cmd.json.tmpl')
+
+    def test_prefer_respond_async(self, app_creator, shell_cmd_def_echo, # pylint:disable=W0613
+                                  cmd_data_template):
+        post_data = cmd_data_template % dict(param=TEXT)
+        rsp = app_creator.post(self.commands_path,
+                               params=post_data,
+                               content_type=JsonMime.mime_type_string,
+                               headers={'Prefer': 'respond-async'},
+                               status=HTTPAccepted.code)
+        c_coll = get_root_collection(IShellCommand)
+        cmd_mb = next(iter(c_coll))
+        assert rsp.headers['Location'].endswith(
+                                    '%s/%s' % (self.commands_path,
+                                               cmd_mb.__name__))
+        assert cmd_mb.status == COMMAND_STATUS.QUEUED
+        assert cmd_mb.exit_code is None
+
+    def test_queue_full(self, app_creator, shell_cmd_def_echo, # pylint:disable=W0613
+                        cmd_data_template):
+        reg = get_current_registry()
+        reg.registerUtility(JobQueue(max_workers=0, max_queue_size=0,
+                                     retry_after=7),
+                            IJobQueue)
+        try:
+            post_data = cmd_data_template % dict(param=TEXT)
+            rsp = app_creator.post(self.commands_path + '?async=true',
+                                   params=post_data,
+                                   content_type=JsonMime.mime_type_string,
+                                   status=HTTPServiceUnavailable.code)
+            assert rsp.headers['Retry-After'] == '7'
+        finally:
+            reg.unregisterUtility(provided=IJobQueue)
+
 
 @pytest.mark.usefixtures('app_creator', 'shell_cmd_def_runner')
 class TestShellCommandOutput(_TestTelexShellCommandBase):
@@ -128,6 +225,15 @@ class _TestShellCommandSequentialPosts(object):
                          content_type=JsonMime.mime_type_string,
                          status=HTTPCreated.code)
 
+    def test_invalid_error_pattern(self, app_creator, cmd_def_data):
+        data = cmd_def_data.rstrip().rstrip('}') + ', "error_pattern" : "("}'
+        rsp = app_creator.post(self.command_definitions_path,
+                               params=data,
+                               content_type=JsonMime.mime_type_string,
+                               status=HTTPBadRequest.code)
+        assert native_(rsp.body).find('Invalid diagnostics pattern') != -1
+        assert len(get_root_collection(IShellCommandDefinition)) == 0
+
 
 class TestShellCommandSequentialPostsMemory(_TestShellCommandSequentialPosts):
     config_file_name = resource_filename('telex.tests', 'configure.zcml')
@@ -154,3 +260,15 @@ class TestTelexRestCommand(_TestTelexCommandBase):
                                 content_type=cnt_tpe.mime_type_string,
                                 status=HTTPCreated.code)
         assert len(list(sh_cmd_def_coll)) == 1
+
+    def test_post_proxy(self, app_mocked_request, rest_cmd):
+        cnt_tpe = JsonMime
+        post_data = as_representer(rest_cmd, cnt_tpe).to_string(rest_cmd)
+        rsp = app_mocked_request.post(self.commands_path + '?proxy=true',
+                                      params=post_data,
+                                      content_type=cnt_tpe.mime_type_string,
+                                      status=HTTPOk.code)
+        # The spooled body of the REST call response is passed through.
+        assert rsp.content_type == cnt_tpe.mime_type_string
+        assert native_(rsp.body).find('echo') != -1
+        assert not 'X-Telex-Truncated' in rsp.headers
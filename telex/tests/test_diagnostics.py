@@ -0,0 +1,58 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import pytest
+
+from telex.capture import OutputSpool
+from telex.diagnostics import DiagnosticsClassifier
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+class TestDiagnosticsClassifier(object):
+
+    def test_classify(self):
+        classifier = DiagnosticsClassifier()
+        spool = OutputSpool.from_string('starting\r\n'
+                                        'a WARN b\r\n'
+                                        'a warning b\n'
+                                        'x warn y ERROR z\n'
+                                        'never read WARN\n')
+        assert classifier.classify(spool)
+        assert classifier.warnings == ['a WARN b']
+        assert classifier.errors == ['x warn y ERROR z']
+
+    def test_incremental(self):
+        classifier = DiagnosticsClassifier()
+        assert not classifier.feed(b'one warn ')
+        assert not classifier.feed(b'line\nan err')
+        assert classifier.warnings == ['one warn line']
+        assert classifier.feed(b'or happened\nmore\n')
+        assert classifier.errors == ['an error happened']
+        # Nothing is classified after the first error.
+        assert classifier.feed(b'another error line\n')
+        assert classifier.errors == ['an error happened']
+
+    def test_close(self):
+        classifier = DiagnosticsClassifier()
+        classifier.feed(b'no newline: warn me')
+        assert classifier.warnings == []
+        classifier.close()
+        assert classifier.warnings == ['no newline: warn me']
+
+    def test_custom_patterns(self):
+        classifier = DiagnosticsClassifier(error_pattern=r'^E\d+:',
+                                           warning_pattern=r'^W\d+:')
+        spool = OutputSpool.from_string('x E1: no\nW2: careful\nE3: fatal\n')
+        assert classifier.classify(spool)
+        assert classifier.warnings == ['W2: careful']
+        assert classifier.errors == ['E3: fatal']
+
+    def test_invalid_pattern(self):
+        with pytest.raises(ValueError):
+            DiagnosticsClassifier(error_pattern='(')
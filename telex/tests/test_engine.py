@@ -0,0 +1,173 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import socket
+from threading import Lock
+from threading import Thread
+import time
+
+from pyramid.compat import PY3
+import pytest
+from requests.exceptions import ConnectionError
+
+from everest.mime import JsonMime
+from telex.constants import COMMAND_STATUS
+from telex.engine import RestCallTimeout
+from telex.engine import RestEngine
+from telex.entities import RestCommand
+from telex.entities import RestCommandDefinition
+from telex.sessions import HttpSessionRegistry
+
+if PY3:
+    from http.server import BaseHTTPRequestHandler # pylint: disable=F0401
+    from http.server import HTTPServer # pylint: disable=F0401
+    from socketserver import ThreadingMixIn # pylint: disable=F0401
+else:
+    from BaseHTTPServer import BaseHTTPRequestHandler # pylint: disable=F0401
+    from BaseHTTPServer import HTTPServer # pylint: disable=F0401
+    from SocketServer import ThreadingMixIn # pylint: disable=F0401
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Stand-in REST service answering each request after a delay and
+    recording the maximum number of concurrent requests.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self): # pylint:disable=C0103
+        srv = self.server
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with srv.lock:
+            srv.hits += 1
+            srv.active += 1
+            srv.max_active = max(srv.max_active, srv.active)
+        time.sleep(srv.delay)
+        with srv.lock:
+            srv.active -= 1
+        body = b'{}'
+        self.send_response(201)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): # pylint:disable=W0221
+        pass
+
+
+def _start_server():
+    srv = _Server(('127.0.0.1', 0), _Handler)
+    srv.lock = Lock()
+    srv.hits = 0
+    srv.active = 0
+    srv.max_active = 0
+    srv.delay = 0.1
+    thread = Thread(target=srv.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return srv
+
+
+def _stop_server(srv):
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def http_server():
+    srv = _start_server()
+    yield srv
+    _stop_server(srv)
+    HttpSessionRegistry.clear()
+
+
+@pytest.fixture
+def engine():
+    rest_engine = RestEngine(max_workers=32, max_per_host=2)
+    yield rest_engine
+    rest_engine.shutdown()
+
+
+def _make_commands(submitter, port, number):
+    cmd_def = RestCommandDefinition('get', 'GET something.', submitter,
+                                    'http://127.0.0.1:%d/' % port,
+                                    JsonMime.mime_type_string,
+                                    operation='GET', pool_size=32)
+    return [RestCommand(cmd_def, submitter, []) for _ in range(number)]
+
+
+class TestRestEngine(object):
+
+    def test_per_host_limit(self, http_server, engine, submitter): # pylint:disable=W0621
+        cmds = _make_commands(submitter, http_server.server_port, 8)
+        calls = engine.run(cmds, timeout=10)
+        assert [call.command.status for call in calls] \
+                == [COMMAND_STATUS.FINISHED] * 8
+        assert [cmd.response_status_code for cmd in cmds] == [201] * 8
+        assert http_server.max_active == 2
+
+    def test_hosts_run_concurrently(self, engine, submitter): # pylint:disable=W0621
+        srvs = [_start_server() for _ in range(4)]
+        try:
+            cmds = []
+            for srv in srvs:
+                srv.delay = 0.3
+                cmds.extend(_make_commands(submitter, srv.server_port, 2))
+            start = time.time()
+            engine.run(cmds, timeout=10)
+            # With two calls per host, all eight calls run at once.
+            assert time.time() - start < 8 * 0.3 / 2
+            assert [srv.max_active for srv in srvs] == [2] * 4
+        finally:
+            for srv in srvs:
+                _stop_server(srv)
+            HttpSessionRegistry.clear()
+
+    def test_cancel(self, http_server, engine, submitter): # pylint:disable=W0621
+        http_server.delay = 0.3
+        cmds = _make_commands(submitter, http_server.server_port, 3)
+        calls = [engine.submit(cmd) for cmd in cmds]
+        # The third call waits for one of the first two to finish.
+        assert calls[2].cancel()
+        # The command status is set when the call is waited for.
+        assert cmds[2].status == COMMAND_STATUS.RUNNING
+        engine.wait_all(calls, timeout=10)
+        assert [cmd.status for cmd in cmds] \
+                == [COMMAND_STATUS.FINISHED, COMMAND_STATUS.FINISHED,
+                    COMMAND_STATUS.CANCELLED]
+        assert http_server.hits == 2
+        assert not calls[0].cancel()
+
+    def test_timeout(self, http_server, engine, submitter): # pylint:disable=W0621
+        http_server.delay = 0.5
+        call = engine.submit(_make_commands(submitter,
+                                            http_server.server_port, 1)[0])
+        with pytest.raises(RestCallTimeout):
+            call.wait(0.05)
+        engine.wait_all([call], timeout=0.05)
+        assert call.command.status == COMMAND_STATUS.CANCELLED
+        # The response arriving later is not applied to the command.
+        time.sleep(0.6)
+        assert call.command.status == COMMAND_STATUS.CANCELLED
+        assert call.command.response is None
+
+    def test_error(self, engine, submitter): # pylint:disable=W0621
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        call = engine.submit(_make_commands(submitter, port, 1)[0])
+        with pytest.raises(ConnectionError):
+            call.wait(10)
+        assert call.command.status == COMMAND_STATUS.FAILED
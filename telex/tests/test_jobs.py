@@ -0,0 +1,185 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from threading import Event
+from threading import Lock
+from threading import current_thread
+
+from pyramid.threadlocal import get_current_registry
+import pytest
+import transaction
+
+from telex.constants import COMMAND_STATUS
+from telex.jobs import CommandJob
+from telex.jobs import JobQueue
+from telex.jobs import JobQueueFull
+from telex.jobs import run_commands
+from telex.process import ProcessRegistry
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+class TestJobQueue(object):
+
+    def test_reserve_until_full(self):
+        job_queue = JobQueue(max_workers=1, max_queue_size=1)
+        job_queue.reserve()
+        job_queue.reserve()
+        with pytest.raises(JobQueueFull):
+            job_queue.reserve()
+        job_queue.release()
+        job_queue.reserve()
+
+    def test_submit(self):
+        job_queue = JobQueue(max_workers=2, max_queue_size=0)
+        evt = Event()
+        job_queue.reserve()
+        job_queue.submit(evt.set)
+        assert evt.wait(5)
+        job_queue.shutdown()
+        # The slot was released after the job was processed.
+        job_queue.reserve()
+        job_queue.reserve()
+
+    def test_submit_on_commit(self):
+        job_queue = JobQueue(max_workers=1, max_queue_size=0)
+        evt = Event()
+        with transaction.manager:
+            job_queue.reserve()
+            job_queue.submit_on_commit(evt.set)
+            assert not evt.is_set()
+        assert evt.wait(5)
+        job_queue.shutdown()
+
+    def test_submit_on_abort(self):
+        job_queue = JobQueue(max_workers=1, max_queue_size=0)
+        evt = Event()
+        trx = transaction.begin()
+        job_queue.reserve()
+        job_queue.submit_on_commit(evt.set)
+        trx.abort()
+        assert not evt.is_set()
+        # The reserved slot was released again.
+        job_queue.reserve()
+
+
+class _CommandDefinition(object):
+    name = 'test_run_commands'
+
+
+class _Command(object):
+    command_definition = _CommandDefinition()
+    command_type = 'SHELL'
+
+    def __init__(self, barrier, fail=False):
+        self.__barrier = barrier
+        self.__fail = fail
+        self.status = None
+        self.registry = None
+        self.thread = None
+
+    def execute(self):
+        self.registry = get_current_registry()
+        self.__barrier.wait()
+        if self.__fail:
+            raise RuntimeError('Failed.')
+        return COMMAND_STATUS.FINISHED
+
+    def apply_result(self, result):
+        self.status = result
+        self.thread = current_thread()
+
+
+class _Barrier(object):
+    def __init__(self, parties):
+        self.__parties = parties
+        self.__lock = Lock()
+        self.__evt = Event()
+
+    def wait(self):
+        with self.__lock:
+            self.__parties -= 1
+            if self.__parties == 0:
+                self.__evt.set()
+        assert self.__evt.wait(5)
+
+
+def test_run_commands():
+    # All commands need to run concurrently to get past the barrier.
+    barrier = _Barrier(3)
+    cmds = [_Command(barrier), _Command(barrier, fail=True),
+            _Command(barrier)]
+    run_commands(cmds, 3)
+    assert [cmd.status for cmd in cmds] == [COMMAND_STATUS.FINISHED,
+                                            COMMAND_STATUS.FAILED,
+                                            COMMAND_STATUS.FINISHED]
+    assert all(cmd.registry is get_current_registry() for cmd in cmds)
+    # The results are applied in the calling thread.
+    assert [cmd.thread for cmd in cmds] == [current_thread(), None,
+                                            current_thread()]
+
+
+class _Member(object):
+    def __init__(self, entity):
+        self.__entity = entity
+
+    def get_entity(self):
+        return self.__entity
+
+
+class _QueuedCommand(object):
+    command_definition = _CommandDefinition()
+    command_type = 'SHELL'
+
+    def __init__(self, on_running):
+        self.id = 7
+        self.runs = 0
+        self.__on_running = on_running
+        self.__status = COMMAND_STATUS.QUEUED
+
+    @property
+    def status(self):
+        return self.__status
+
+    @status.setter
+    def status(self, value):
+        self.__status = value
+        if value == COMMAND_STATUS.RUNNING:
+            # Simulates a DELETE request coming in right after the job
+            # started the command.
+            self.__on_running(self)
+
+    def run(self):
+        self.runs += 1
+
+
+class TestCommandJob(object):
+
+    @pytest.fixture
+    def commands(self, monkeypatch):
+        cmd_mbs = {}
+        monkeypatch.setattr('telex.jobs.get_root_collection',
+                            lambda ifc: cmd_mbs)
+        return cmd_mbs
+
+    def test_cancel_while_starting(self, commands):
+        cmd = _QueuedCommand(lambda cmd: ProcessRegistry.get(cmd.id).kill(
+                                                COMMAND_STATUS.CANCELLED))
+        commands['7'] = _Member(cmd)
+        CommandJob(get_current_registry(), None, '7')()
+        assert cmd.runs == 0
+        assert cmd.status == COMMAND_STATUS.CANCELLED
+        assert ProcessRegistry.get(cmd.id) is None
+
+    def test_deleted_while_starting(self, commands):
+        cmd = _QueuedCommand(lambda cmd: commands.pop('7'))
+        commands['7'] = _Member(cmd)
+        # The job ends quietly.
+        CommandJob(get_current_registry(), None, '7')()
+        assert cmd.runs == 0
+        assert ProcessRegistry.get(cmd.id) is None
@@ -0,0 +1,93 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import sys
+
+import pytest
+
+from telex.entities import ShellCommand
+from telex.entities import ShellCommandDefinition
+from telex.metrics import Counter
+from telex.metrics import Histogram
+from telex.metrics import MetricsRegistry
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+class TestMetrics(object):
+
+    def test_counter(self):
+        counter = Counter('test_total', 'Test "counter".', ('name',))
+        counter.inc(name='a')
+        counter.inc(2, name='b\n"quoted"')
+        assert counter.get(name='a') == 1
+        assert counter.render() == \
+                ['# HELP test_total Test "counter".',
+                 '# TYPE test_total counter',
+                 'test_total{name="a"} 1',
+                 'test_total{name="b\\n\\"quoted\\""} 2']
+        with pytest.raises(ValueError):
+            counter.inc(other='a')
+
+    def test_histogram(self):
+        histogram = Histogram('test_seconds', 'Test histogram.',
+                              buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        assert histogram.get_count() == 4
+        assert histogram.render()[2:] == \
+                ['test_seconds_bucket{le="0.1"} 2',
+                 'test_seconds_bucket{le="1.0"} 3',
+                 'test_seconds_bucket{le="+Inf"} 4',
+                 'test_seconds_sum 2.65',
+                 'test_seconds_count 4']
+
+    def test_registry(self):
+        MetricsRegistry.clear()
+        try:
+            counter = MetricsRegistry.counter('test_total', 'Test.', ('a',))
+            assert MetricsRegistry.counter('test_total', 'Test.',
+                                           ('a',)) is counter
+            with pytest.raises(ValueError):
+                MetricsRegistry.histogram('test_total', 'Test.', ('a',))
+            counter.inc(a='x')
+            assert MetricsRegistry.render() == \
+                    '# HELP test_total Test.\n' \
+                    '# TYPE test_total counter\n' \
+                    'test_total{a="x"} 1\n'
+        finally:
+            MetricsRegistry.clear()
+
+    def test_command_run(self, submitter):
+        MetricsRegistry.clear()
+        try:
+            cmd_def = ShellCommandDefinition(
+                            'exit', 'Exit.', submitter,
+                            '%s -c "import sys; sys.stdout.write(\'abc\'); '
+                            'sys.exit(3)"' % sys.executable)
+            for _ in range(2):
+                ShellCommand(cmd_def, submitter, []).run()
+            labels = dict(definition='exit', command_type='SHELL')
+            assert MetricsRegistry.histogram(
+                        'telex_command_run_seconds', '',
+                        ('definition', 'command_type')) \
+                    .get_count(**labels) == 2
+            assert MetricsRegistry.counter(
+                        'telex_command_exit_codes_total', '',
+                        ('definition', 'command_type', 'exit_code')) \
+                    .get(exit_code=3, **labels) == 2
+            assert MetricsRegistry.histogram(
+                        'telex_command_spawn_seconds', '',
+                        ('definition', 'execution_mode')) \
+                    .get_count(definition='exit',
+                               execution_mode='SHELL') == 2
+            text = MetricsRegistry.render()
+            assert 'telex_command_output_bytes_sum{definition="exit",' \
+                   'command_type="SHELL",stream="OUTPUT"} 6' in text
+        finally:
+            MetricsRegistry.clear()
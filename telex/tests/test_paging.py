@@ -0,0 +1,58 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import datetime
+
+import pytest
+from pytz import timezone
+
+from everest.querying.specifications import FilterSpecificationFactory
+from telex.paging import InvalidCursor
+from telex.paging import decode_cursor
+from telex.paging import encode_cursor
+from telex.paging import make_keyset_specification
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+class _Item(object):
+    def __init__(self, timestamp, id): # pylint: disable=W0622
+        self.timestamp = timestamp
+        self.id = id
+
+
+class TestKeysetPaging(object):
+
+    def test_cursor(self):
+        for timestamp in (datetime.datetime(2026, 10, 18, 12, 30, 1, 5),
+                          datetime.datetime(2026, 10, 18, 12, 30, 1,
+                                            tzinfo=timezone('UTC'))):
+            cursor = encode_cursor(timestamp, 42)
+            assert decode_cursor(cursor) == (timestamp, 42)
+
+    def test_invalid_cursor(self):
+        for cursor in ('', 'not a cursor',
+                       encode_cursor(datetime.datetime.now(), 1)[:-4]):
+            with pytest.raises(InvalidCursor):
+                decode_cursor(cursor)
+
+    @pytest.mark.parametrize('descending', [False, True])
+    def test_keyset_specification(self, descending):
+        times = [datetime.datetime(2026, 10, 18, hour) for hour in (1, 2)]
+        items = [_Item(times[0], 1), _Item(times[0], 2), _Item(times[0], 3),
+                 _Item(times[1], 4)]
+        if descending:
+            items.reverse()
+        last = items[1]
+        timestamp, id_ = decode_cursor(encode_cursor(last.timestamp,
+                                                     last.id))
+        spec = make_keyset_specification(FilterSpecificationFactory(),
+                                         timestamp, id_,
+                                         descending=descending)
+        assert [item for item in items if spec.is_satisfied_by(item)] \
+                == items[2:]
@@ -0,0 +1,228 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import signal
+import sys
+from threading import Thread
+import time
+
+import pytest
+
+from telex.capture import OutputCapture
+from telex.constants import COMMAND_STATUS
+from telex.constants import EXECUTION_MODES
+from telex.constants import VALUE_TYPES
+from telex.entities import Parameter
+from telex.entities import ShellCommand
+from telex.entities import ShellCommandDefinition
+from telex.forkserver import ForkServerError
+from telex.forkserver import ForkServerPool
+from telex.forkserver import get_fork_server_pool
+from telex.process import ChildProcess
+from telex.process import ProcessRegistry
+from telex.process import ResourceLimits
+from telex.process import spawn
+from telex.process import wait_for_child
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+LOOP_SCRIPT = 'while True: pass'
+#: Allocates (and touches) 64MB and burns some CPU time.
+BUSY_SCRIPT = 'import sys, time; ' \
+              'data = bytearray(64 * 1024 * 1024); ' \
+              'end = time.time() + 0.2; ' \
+              '[None for _ in iter(lambda: time.time() < end, False)]; ' \
+              'sys.stdout.write(\'x\' * 1000); sys.stderr.write(\'e\')'
+
+
+@pytest.fixture
+def loop_cmd_def(submitter):
+    return ShellCommandDefinition('loop',
+                                  'Endless loop.',
+                                  submitter,
+                                  '%s -c "%s"' % (sys.executable,
+                                                  LOOP_SCRIPT))
+
+
+class TestShellCommandLimits(object):
+
+    def test_timeout(self, loop_cmd_def, submitter): # pylint:disable=W0621
+        loop_cmd_def.timeout = 1
+        cmd = ShellCommand(loop_cmd_def, submitter, [], id=1)
+        cmd.run()
+        assert cmd.status == COMMAND_STATUS.TIMED_OUT
+        assert cmd.exit_code != 0
+
+    def test_cpu_time_limit(self, loop_cmd_def, submitter): # pylint:disable=W0621
+        loop_cmd_def.cpu_time_limit = 1
+        cmd = ShellCommand(loop_cmd_def, submitter, [], id=2)
+        cmd.run()
+        assert cmd.status == COMMAND_STATUS.LIMIT_EXCEEDED
+
+    def test_exceeded_limit(self):
+        exit_code = 128 + signal.SIGXCPU
+        assert ChildProcess(None).exceeded_limit(-signal.SIGXCPU)
+        assert not ChildProcess(None).exceeded_limit(-signal.SIGKILL)
+        # Only a shell maps signals to exit codes above 128.
+        assert not ChildProcess(None).exceeded_limit(exit_code)
+        assert ChildProcess(None, is_shell=True).exceeded_limit(exit_code)
+
+    def test_cancel(self, loop_cmd_def, submitter): # pylint:disable=W0621
+        cmd = ShellCommand(loop_cmd_def, submitter, [], id=3)
+        thread = Thread(target=cmd.run)
+        thread.start()
+        for _ in range(50):
+            if not ProcessRegistry.get(cmd.id) is None:
+                break
+            time.sleep(0.1)
+        assert cmd.cancel()
+        thread.join(10)
+        assert not thread.is_alive()
+        assert cmd.status == COMMAND_STATUS.CANCELLED
+        assert not cmd.cancel()
+
+    def test_cancel_pending(self, loop_cmd_def, submitter): # pylint:disable=W0621
+        cmd = ShellCommand(loop_cmd_def, submitter, [], id=4)
+        assert cmd.cancel()
+        assert cmd.status == COMMAND_STATUS.CANCELLED
+
+
+class TestResourceUsage(object):
+
+    def test_wait_for_child(self):
+        child = spawn([sys.executable, '-c', BUSY_SCRIPT], ResourceLimits())
+        child.communicate()
+        exit_code, usage = wait_for_child(child)
+        # The process had been reaped already.
+        assert exit_code == 0
+        assert usage is None
+        child = spawn([sys.executable, '-c', 'import sys; sys.exit(3)'],
+                      ResourceLimits())
+        exit_code, usage = wait_for_child(child)
+        assert exit_code == 3
+        assert child.returncode == 3
+        assert usage.user_time >= 0
+        assert usage.max_rss > 0
+
+    @pytest.mark.parametrize('mode', [EXECUTION_MODES.ARGV,
+                                      EXECUTION_MODES.PYTHON_POOL])
+    def test_shell_command(self, submitter, tmpdir, mode):
+        script = tmpdir.join('busy.py')
+        script.write(BUSY_SCRIPT)
+        cmd_def = ShellCommandDefinition('busy', 'Busy.', submitter,
+                                         '%s %s' % (sys.executable, script),
+                                         execution_mode=mode)
+        cmd = ShellCommand(cmd_def, submitter, [], id=6)
+        try:
+            cmd.run()
+        finally:
+            if mode == EXECUTION_MODES.PYTHON_POOL:
+                get_fork_server_pool(sys.executable).shutdown()
+        assert cmd.status == COMMAND_STATUS.FINISHED
+        assert cmd.wall_time >= 0.2
+        assert cmd.user_time + cmd.system_time > 0.1
+        assert cmd.max_rss > 64 * 1024 * 1024
+        assert cmd.stdout_bytes == 1000
+        assert cmd.stderr_bytes == 1
+
+
+class TestShellCommandExecutionModes(object):
+
+    @pytest.mark.parametrize('mode', [EXECUTION_MODES.SHELL,
+                                      EXECUTION_MODES.ARGV])
+    def test_arguments(self, submitter, mode):
+        cmd_def = ShellCommandDefinition(
+                        'args',
+                        'Print arguments.',
+                        submitter,
+                        '%s -c "import sys; print(sys.argv[1:])"'
+                        % sys.executable,
+                        execution_mode=mode)
+        pd_pos = cmd_def.add_parameter_definition('text', 'Text',
+                                                  VALUE_TYPES.STRING)
+        pd_pos.add_parameter_option('is_mandatory', True)
+        pd_opt = cmd_def.add_parameter_definition('n', 'Number',
+                                                  VALUE_TYPES.INT)
+        pd_opt.add_parameter_option('is_mandatory', False)
+        prms = [Parameter(pd_pos, 'it\'s "quoted" $HOME'),
+                Parameter(pd_opt, 3)]
+        cmd = ShellCommand(cmd_def, submitter, prms)
+        cmd.run()
+        assert cmd.status == COMMAND_STATUS.FINISHED
+        assert cmd.output_string.strip() == \
+                str(['it\'s "quoted" $HOME', '-n3'])
+
+    def test_executable_argv(self, submitter):
+        cmd_def = ShellCommandDefinition('args', 'Arguments.', submitter,
+                                         'echo "a b" c')
+        argv = cmd_def.executable_argv
+        assert argv == ['echo', 'a b', 'c']
+        assert cmd_def.executable_argv is argv
+        cmd_def.executable = 'ls'
+        assert cmd_def.executable_argv == ['ls']
+
+
+class TestForkServerPool(object):
+
+    def test_run(self, tmpdir):
+        script = tmpdir.join('script.py')
+        script.write('import os, sys\n'
+                     'sys.stdout.write(" ".join(sys.argv[1:]))\n'
+                     'sys.stderr.write(os.getcwd())\n'
+                     'sys.exit(int(sys.argv[1]))\n')
+        pool = ForkServerPool(size=1)
+        try:
+            for exit_code in (0, 3):
+                child = pool.spawn([str(script), str(exit_code), 'a b'],
+                                   ResourceLimits(), cwd=str(tmpdir))
+                capture = OutputCapture()
+                capture.capture(child)
+                assert child.wait() == exit_code
+                assert capture.output.getvalue() == '%d a b' % exit_code
+                assert capture.errors.getvalue() == str(tmpdir)
+        finally:
+            pool.shutdown()
+
+    def test_checkout_timeout(self, tmpdir):
+        script = tmpdir.join('loop.py')
+        script.write(LOOP_SCRIPT)
+        pool = ForkServerPool(size=1, checkout_timeout=0.1)
+        try:
+            child = pool.spawn([str(script)], ResourceLimits())
+            with pytest.raises(ForkServerError):
+                pool.spawn([str(script)], ResourceLimits())
+            # Releasing the unfinished script kills it and returns the
+            # worker to the pool.
+            child.release()
+            assert child.returncode == -signal.SIGKILL
+            child = pool.spawn([str(tmpdir.join('missing.py'))],
+                               ResourceLimits())
+            assert child.wait() != 0
+            child.release()
+        finally:
+            pool.shutdown()
+
+    def test_invalid_args(self):
+        pool = ForkServerPool()
+        with pytest.raises(ValueError):
+            pool.spawn(['-c', LOOP_SCRIPT], ResourceLimits())
+
+    def test_timeout(self, loop_cmd_def, submitter, tmpdir): # pylint:disable=W0621
+        script = tmpdir.join('loop.py')
+        script.write(LOOP_SCRIPT)
+        loop_cmd_def.executable = '%s %s' % (sys.executable, script)
+        loop_cmd_def.execution_mode = EXECUTION_MODES.PYTHON_POOL
+        loop_cmd_def.timeout = 1
+        cmd = ShellCommand(loop_cmd_def, submitter, [], id=5)
+        try:
+            cmd.run()
+        finally:
+            get_fork_server_pool(sys.executable).shutdown()
+        assert cmd.status == COMMAND_STATUS.TIMED_OUT
+        assert cmd.exit_code != 0
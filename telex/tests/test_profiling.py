@@ -0,0 +1,161 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import os
+import pstats
+import tempfile
+from threading import Event
+from threading import Thread
+import time
+
+import pytest
+
+from telex.profiling import Profiler
+from telex.profiling import ProfilerBusy
+from telex.profiling import ProfilingSession
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+def _busy_wait(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+def _blocked(started, release):
+    started.set()
+    release.wait(5)
+
+
+def _wait_until_stopped(session, timeout=5.0):
+    end = time.time() + timeout
+    while session.is_active and time.time() < end:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def profiler():
+    yield Profiler
+    Profiler.stop()
+
+
+class TestProfilingSession(object):
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            ProfilingSession(duration=0)
+        with pytest.raises(ValueError):
+            ProfilingSession(max_requests=0)
+        with pytest.raises(ValueError):
+            ProfilingSession(interval=-1)
+
+    def test_max_requests(self, profiler):
+        session = profiler.start(max_requests=2, interval=0.001)
+        for _ in range(3):
+            with profiler.profile('echo'):
+                _busy_wait(0.02)
+        _wait_until_stopped(session)
+        status = session.get_status()
+        assert not status['active']
+        assert status['requests'] == 2
+        assert status['samples'] > 0
+
+    def test_nested_blocks_count_once(self, profiler):
+        session = profiler.start(max_requests=5, interval=0.001)
+        with profiler.profile('echo'):
+            with profiler.profile('echo'):
+                _busy_wait(0.01)
+        assert session.num_requests == 1
+
+    def test_definition_filter(self, profiler):
+        session = profiler.start(duration=5, definition='echo',
+                                 interval=0.001)
+        with profiler.profile('other'):
+            _busy_wait(0.02)
+        assert session.num_requests == 0
+        with profiler.profile('echo'):
+            _busy_wait(0.02)
+        assert session.num_requests == 1
+
+    def test_duration(self, profiler):
+        session = profiler.start(duration=0.05, interval=0.001)
+        _wait_until_stopped(session)
+        assert not session.is_active
+        with profiler.profile('echo'):
+            pass
+        assert session.num_requests == 0
+
+    def test_busy(self, profiler):
+        profiler.start(duration=5)
+        with pytest.raises(ProfilerBusy):
+            profiler.start(duration=5)
+        session = profiler.stop()
+        _wait_until_stopped(session)
+        assert not profiler.start(duration=5) is session
+
+    def test_disabled(self):
+        # Profiled blocks run normally without a session.
+        with Profiler.profile('echo'):
+            pass
+
+
+class TestProfileFormats(object):
+    # The samples are taken manually while a profiled thread is blocked in
+    # a known function; the sampler thread does not get to take any.
+    INTERVAL = 60
+
+    def _sample_blocked(self, session, num_samples):
+        started = Event()
+        release = Event()
+
+        def run():
+            assert session.enter('echo')
+            try:
+                _blocked(started, release)
+            finally:
+                session.exit()
+        thread = Thread(target=run)
+        thread.start()
+        try:
+            assert started.wait(5)
+            for _ in range(num_samples):
+                session.take_samples()
+        finally:
+            release.set()
+            thread.join(5)
+
+    def test_collapsed(self):
+        session = ProfilingSession(max_requests=1, interval=self.INTERVAL)
+        session.start()
+        self._sample_blocked(session, 3)
+        assert session.num_samples == 3
+        lines = session.to_collapsed().splitlines()
+        assert len(lines) == 1
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) == 3
+        assert 'run (%s' % __file__.rstrip('c') in stack
+        assert '_blocked (%s' % __file__.rstrip('c') in stack
+
+    def test_pstats(self):
+        session = ProfilingSession(max_requests=1, interval=self.INTERVAL)
+        session.start()
+        self._sample_blocked(session, 3)
+        fd, path = tempfile.mkstemp(suffix='.pstats')
+        try:
+            with os.fdopen(fd, 'wb') as pstats_file:
+                pstats_file.write(session.to_pstats())
+            stats = pstats.Stats(path)
+        finally:
+            os.remove(path)
+        funcs = [func for func in stats.stats if func[2] == '_blocked']
+        assert len(funcs) == 1
+        _, num_calls, _, inclusive_time, callers = stats.stats[funcs[0]]
+        assert num_calls == 3
+        assert inclusive_time == 3 * self.INTERVAL
+        assert [caller[2] for caller in callers] == ['run']
@@ -0,0 +1,228 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from sqlalchemy import Boolean
+from sqlalchemy import Column
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import String
+from sqlalchemy import Table
+from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+import pytest
+
+from everest.repositories.rdb.utils import clear_mappers
+from pyramid import testing
+from telex.constants import VALUE_TYPES
+from telex.entities import Parameter
+from telex.entities import ParameterDefinition
+from telex.entities import ParameterOption
+from telex.entities import ShellCommand
+from telex.entities import ShellCommandDefinition
+from telex.rdb import create_metadata
+from telex.rdb import get_loader_strategy
+from telex.rdb import upgrade_schema
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+def test_upgrade_schema():
+    engine = create_engine('sqlite://')
+    old_metadata = MetaData(bind=engine)
+    Table('command', old_metadata,
+          Column('command_id', Integer, primary_key=True),
+          Column('submitter', String, nullable=False))
+    old_metadata.create_all()
+    engine.execute("INSERT INTO command (submitter) VALUES ('me')")
+    metadata = MetaData(bind=engine)
+    Table('command', metadata,
+          Column('command_id', Integer, primary_key=True),
+          Column('submitter', String, nullable=False, index=True),
+          Column('status', String, nullable=False, default='PENDING',
+                 info=dict(upgrade_value='FINISHED')),
+          Column('is_cached', Boolean, nullable=False, default=False),
+          Column('timeout', Integer, nullable=True))
+    upgrade_schema(metadata)
+    # Running the upgrade again does not change anything.
+    upgrade_schema(metadata)
+    inspector = inspect(engine)
+    assert set([col['name'] for col in inspector.get_columns('command')]) \
+            == set(['command_id', 'submitter', 'status', 'is_cached',
+                    'timeout'])
+    assert [idx['name'] for idx in inspector.get_indexes('command')] \
+            == ['ix_command_submitter']
+    # The existing row gets the upgrade value rather than the default.
+    row = engine.execute('SELECT status, is_cached, timeout '
+                         'FROM command').fetchone()
+    assert tuple(row) == ('FINISHED', False, None)
+    metadata.tables['command'].insert().execute(submitter='you')
+    row = engine.execute("SELECT status FROM command "
+                         "WHERE submitter = 'you'").fetchone()
+    assert tuple(row) == ('PENDING',)
+
+
+class TestLoaderStrategies(object):
+    NUM_COMMANDS = 100
+    statements = None
+
+    @pytest.fixture
+    def session(self, request):
+        # The strategy to configure can be passed as indirect parameter.
+        strategy = getattr(request, 'param', None)
+        settings = {}
+        if not strategy is None:
+            settings['telex.rdb.loader_strategy'] = strategy
+        testing.setUp(settings=settings)
+        engine = create_engine('sqlite://')
+        create_metadata(engine)
+        try:
+            session = Session(bind=engine)
+            cmd_def = ShellCommandDefinition('echo', 'Echo', 'me', 'echo')
+            prm_defs = []
+            for name in ('first', 'second'):
+                prm_def = ParameterDefinition(name, name.title(), cmd_def,
+                                              VALUE_TYPES.STRING)
+                ParameterOption(prm_def, 'is_mandatory', 'true')
+                prm_defs.append(prm_def)
+            for idx in range(self.NUM_COMMANDS):
+                prms = [Parameter(prm_def, '%s-%d' % (prm_def.name, idx))
+                        for prm_def in prm_defs]
+                session.add(ShellCommand(cmd_def, 'me', prms,
+                                         environment=''))
+            session.commit()
+            session.expunge_all()
+            self.statements = []
+
+            def record(conn, cursor, statement, *args): # pylint: disable=W0613
+                self.statements.append(statement)
+            event.listen(engine, 'before_cursor_execute', record)
+            yield session
+        finally:
+            clear_mappers()
+            testing.tearDown()
+
+    def _count_listing_queries(self, query, num_commands):
+        del self.statements[:]
+        cmds = query.order_by(ShellCommand.id).limit(num_commands).all()
+        # Access everything needed to render a command member.
+        for cmd in cmds:
+            assert cmd.command_definition.executable == 'echo'
+            assert sorted([prm.parameter_definition.name
+                           for prm in cmd.parameters]) == ['first', 'second']
+        assert len(cmds) == num_commands
+        return len(self.statements)
+
+    def test_configured_strategy(self, session):
+        # The mappers load eagerly with the default strategy, so the number
+        # of queries does not depend on the number of commands listed.
+        assert get_loader_strategy() == 'selectin'
+        query = session.query(ShellCommand)
+        num_queries = self._count_listing_queries(query, 10)
+        session.expunge_all()
+        assert self._count_listing_queries(query, self.NUM_COMMANDS) \
+                == num_queries
+
+    @pytest.mark.parametrize('session', ['joined', 'subquery', 'selectin'],
+                             indirect=True)
+    def test_eager_strategies(self, session):
+        num_queries = self._count_listing_queries(session.query(ShellCommand),
+                                                  10)
+        session.expunge_all()
+        assert self._count_listing_queries(session.query(ShellCommand),
+                                           self.NUM_COMMANDS) == num_queries
+
+    @pytest.mark.parametrize('session', ['select'], indirect=True)
+    def test_lazy_strategy(self, session):
+        assert self._count_listing_queries(session.query(ShellCommand),
+                                           self.NUM_COMMANDS) \
+                > self.NUM_COMMANDS
+
+    def test_invalid_strategy(self):
+        with pytest.raises(ValueError):
+            get_loader_strategy('eager')
+
+
+def test_stored_outputs():
+    engine = create_engine('sqlite://')
+    create_metadata(engine)
+    try:
+        session = Session(bind=engine)
+        cmd_def = ShellCommandDefinition('echo', 'Echo', 'me', 'echo')
+        cmd = ShellCommand(cmd_def, 'me', [], environment='')
+        cmd.output_string = 'Hello Mars!\n' * 1000
+        cmd.error_string = ''
+        cmd.exit_code = 0
+        session.add(cmd)
+        session.commit()
+        session.expunge_all()
+        statements = []
+
+        def record(conn, cursor, statement, *args): # pylint: disable=W0613
+            statements.append(statement)
+        event.listen(engine, 'before_cursor_execute', record)
+        cmd = session.query(ShellCommand).one()
+        assert cmd.exit_code == 0
+        # Reading the command does not touch the output table.
+        assert not [stmt for stmt in statements
+                    if 'shell_command_output' in stmt]
+        assert not cmd.is_output_truncated
+        # Reading the flags does not load the output data.
+        assert not [stmt for stmt in statements
+                    if 'shell_command_output.data' in stmt]
+        assert cmd.output_string == 'Hello Mars!\n' * 1000
+        assert cmd.error_string == ''
+    finally:
+        clear_mappers()
+
+
+def test_max_output_size():
+    engine = create_engine('sqlite://')
+    create_metadata(engine)
+    try:
+        session = Session(bind=engine)
+        cmd_def = ShellCommandDefinition('echo', 'Echo', 'me', 'echo',
+                                         max_output_size=10)
+        cmd = ShellCommand(cmd_def, 'me', [], environment='')
+        cmd.output_string = 'a' * 50 + 'b' * 50
+        # The output is only stored when the command is flushed.
+        assert cmd.stored_outputs == {}
+        assert not cmd.is_output_truncated
+        session.add(cmd)
+        session.commit()
+        session.expunge_all()
+        cmd = session.query(ShellCommand).one()
+        assert cmd.is_output_truncated
+        assert cmd.output_string == \
+                'aaaaa\n[... 90 bytes truncated ...]\nbbbbb'
+    finally:
+        clear_mappers()
+
+
+def test_resource_usage():
+    engine = create_engine('sqlite://')
+    create_metadata(engine)
+    try:
+        session = Session(bind=engine)
+        cmd_def = ShellCommandDefinition('echo', 'Echo', 'me', 'echo')
+        cmd = ShellCommand(cmd_def, 'me', [], environment=dict(LANG='C'))
+        cmd.run()
+        names = ('wall_time', 'user_time', 'system_time', 'max_rss',
+                 'stdout_bytes', 'stderr_bytes')
+        usage = [getattr(cmd, name) for name in names]
+        session.add(cmd)
+        session.commit()
+        session.expunge_all()
+        loaded_cmd = session.query(ShellCommand).one()
+        assert loaded_cmd.environment == dict(LANG='C')
+        assert [getattr(loaded_cmd, name) for name in names] == usage
+        assert loaded_cmd.max_rss > 0
+        assert loaded_cmd.stdout_bytes == 1
+    finally:
+        clear_mappers()
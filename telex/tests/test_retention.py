@@ -0,0 +1,125 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import datetime
+import glob
+import gzip
+import json
+import os
+
+import pytest
+from pytz import timezone
+from sqlalchemy import create_engine
+from sqlalchemy import func
+from sqlalchemy import select
+
+from everest.repositories.rdb.utils import clear_mappers
+from telex.constants import COMMAND_STATUS
+from telex.rdb import create_metadata
+from telex.retention import CommandPruner
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+NOW = datetime.datetime(2026, 10, 18, 12, tzinfo=timezone('UTC'))
+
+
+class TestCommandPruner(object):
+
+    @pytest.fixture
+    def metadata(self):
+        engine = create_engine('sqlite://')
+        metadata = create_metadata(engine)
+        try:
+            tbls = metadata.tables
+            for cmd_def_id, name, days, count in ((1, 'by-age', 30, None),
+                                                  (2, 'by-count', None, 3),
+                                                  (3, 'forever', None, None)):
+                engine.execute(tbls['command_definition'].insert(),
+                               command_definition_id=cmd_def_id,
+                               command_definition_type='SHELL',
+                               name=name, label=name, submitter='me',
+                               retention_days=days, retention_count=count)
+                engine.execute(tbls['parameter_definition'].insert(),
+                               parameter_definition_id=cmd_def_id,
+                               command_definition_id=cmd_def_id,
+                               name='text', label='Text',
+                               value_type='STRING')
+            # Command definition ID, age in days, status.
+            cmds = [(1, 100, COMMAND_STATUS.FINISHED),
+                    (1, 60, COMMAND_STATUS.RUNNING),
+                    (1, 50, COMMAND_STATUS.FAILED),
+                    (1, 40, COMMAND_STATUS.FINISHED),
+                    (1, 10, COMMAND_STATUS.FINISHED),
+                    (3, 100, COMMAND_STATUS.FINISHED),
+                    ]
+            cmds.extend([(2, age, COMMAND_STATUS.FINISHED)
+                         for age in range(6)])
+            for idx, (cmd_def_id, age, status) in enumerate(cmds):
+                cmd_id = idx + 1
+                engine.execute(tbls['command'].insert(),
+                               command_id=cmd_id,
+                               command_type='SHELL',
+                               command_definition_id=cmd_def_id,
+                               timestamp=NOW - datetime.timedelta(days=age),
+                               submitter='me',
+                               status=status)
+                engine.execute(tbls['shell_command'].insert(),
+                               command_id=cmd_id, exit_code=0)
+                engine.execute(tbls['parameter'].insert(),
+                               command_id=cmd_id,
+                               parameter_definition_id=cmd_def_id,
+                               value='value-%d' % cmd_id)
+            yield metadata
+        finally:
+            clear_mappers()
+
+    def _get_command_ids(self, metadata):
+        cmd_tbl = metadata.tables['command']
+        return [row[0] for row in metadata.bind.execute(
+                    select([cmd_tbl.c.command_id])
+                    .order_by(cmd_tbl.c.command_id))]
+
+    def _count_rows(self, metadata, table_name):
+        return metadata.bind.execute(
+                select([func.count()])
+                .select_from(metadata.tables[table_name])).scalar()
+
+    def test_prune(self, metadata, tmpdir):
+        pruner = CommandPruner(metadata, batch_size=2,
+                               archive_directory=str(tmpdir))
+        # By age: 1, 3 and 4 expired, 2 is still running. By count: the
+        # three oldest of 7 to 12 (10 to 12).
+        assert pruner.prune(now=NOW) == 6
+        assert self._get_command_ids(metadata) == [2, 5, 6, 7, 8, 9]
+        for tbl_name in ('shell_command', 'parameter'):
+            assert self._count_rows(metadata, tbl_name) == 6
+        archive_paths = sorted(glob.glob(os.path.join(str(tmpdir), '*')))
+        assert [os.path.basename(path) for path in archive_paths] \
+                == ['by-age-20261018T120000.jsonl.gz',
+                    'by-count-20261018T120000.jsonl.gz']
+        archive_file = gzip.open(archive_paths[0], 'rb')
+        try:
+            records = [json.loads(line.decode('utf-8'))
+                       for line in archive_file]
+        finally:
+            archive_file.close()
+        assert [rec['command_id'] for rec in records] == [1, 3, 4]
+        assert records[0]['command_definition'] == 'by-age'
+        assert records[0]['exit_code'] == 0
+        assert records[0]['parameters'] == [dict(name='text',
+                                                 value='value-1')]
+        # Nothing else expires.
+        assert pruner.prune(now=NOW) == 0
+
+    def test_default_policy(self, metadata):
+        # The default applies to the command definitions without a policy
+        # of their own.
+        pruner = CommandPruner(metadata, max_age=90)
+        assert pruner.prune(now=NOW) == 7
+        assert self._get_command_ids(metadata) == [2, 5, 7, 8, 9]
@@ -0,0 +1,208 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from threading import Thread
+import time
+
+from pyramid.compat import PY3
+from requests.exceptions import ChunkedEncodingError
+from requests.exceptions import Timeout
+import pytest
+
+from everest.mime import JsonMime
+from telex.capture import OutputSpool
+from telex.entities import RestCommand
+from telex.entities import RestCommandDefinition
+from telex.sessions import HttpSessionRegistry
+from telex.sessions import ResponseBodyTimeout
+from telex.sessions import is_text_content_type
+from telex.sessions import send_request
+from telex.sessions import spool_response_body
+
+if PY3:
+    from http.server import BaseHTTPRequestHandler # pylint: disable=F0401
+    from http.server import HTTPServer # pylint: disable=F0401
+    from socketserver import ThreadingMixIn # pylint: disable=F0401
+else:
+    from BaseHTTPServer import BaseHTTPRequestHandler # pylint: disable=F0401
+    from BaseHTTPServer import HTTPServer # pylint: disable=F0401
+    from SocketServer import ThreadingMixIn # pylint: disable=F0401
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing the connection early are expected.
+        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self): # pylint:disable=C0103
+        srv = self.server
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        srv.clients.add(self.client_address)
+        srv.hits += 1
+        status = 503 if srv.hits <= srv.failures else 200
+        body = srv.body
+        self.send_response(status)
+        self.send_header('Content-Type', srv.content_type)
+        if srv.is_broken:
+            # Send an incomplete chunk and drop the connection.
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.wfile.write(b'a\r\nabc')
+            self.close_connection = True
+            return
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if srv.stall:
+            # Send half of the body, then stall.
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            time.sleep(srv.stall)
+            body = body[len(body) // 2:]
+        self.wfile.write(body)
+
+    def log_message(self, *args): # pylint:disable=W0221
+        pass
+
+
+@pytest.fixture
+def http_server():
+    srv = _Server(('127.0.0.1', 0), _Handler)
+    srv.clients = set()
+    srv.hits = 0
+    srv.failures = 0
+    srv.stall = 0
+    srv.is_broken = False
+    srv.body = b'{}'
+    srv.content_type = JsonMime.mime_type_string
+    thread = Thread(target=srv.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    HttpSessionRegistry.clear()
+
+
+def _make_definition(submitter, url, **kw):
+    return RestCommandDefinition('get', 'GET something.', submitter, url,
+                                 JsonMime.mime_type_string,
+                                 operation='GET', **kw)
+
+
+class TestSendRequest(object):
+
+    def test_keep_alive(self, http_server, submitter): # pylint:disable=W0621
+        url = 'http://127.0.0.1:%d/' % http_server.server_port
+        cmd_def = _make_definition(submitter, url)
+        for _ in range(3):
+            assert send_request(cmd_def, url).status_code == 200
+        assert len(http_server.clients) == 1
+        assert HttpSessionRegistry.get(url) is HttpSessionRegistry.get(url)
+
+    def test_no_keep_alive(self, http_server, submitter): # pylint:disable=W0621
+        url = 'http://127.0.0.1:%d/' % http_server.server_port
+        cmd_def = _make_definition(submitter, url, keep_alive=False)
+        for _ in range(3):
+            assert send_request(cmd_def, url).status_code == 200
+        assert len(http_server.clients) == 3
+
+    def test_retry(self, http_server, submitter): # pylint:disable=W0621
+        http_server.failures = 2
+        url = 'http://127.0.0.1:%d/' % http_server.server_port
+        cmd_def = _make_definition(submitter, url, max_retries=2,
+                                   read_timeout=5.0)
+        assert send_request(cmd_def, url).status_code == 200
+        assert http_server.hits == 3
+
+
+class TestResponseBody(object):
+
+    def test_spool(self, http_server, submitter, tmpdir): # pylint:disable=W0621
+        http_server.body = b'0123456789' * 20000
+        url = 'http://127.0.0.1:%d/' % http_server.server_port
+        cmd_def = _make_definition(submitter, url)
+        spool = OutputSpool(memory_threshold=1024,
+                            spool_directory=str(tmpdir))
+        rsp = send_request(cmd_def, url, stream=True)
+        assert not spool_response_body(rsp, spool, chunk_size=4096)
+        assert spool.read() == http_server.body
+        # The spool went to disk.
+        assert len(tmpdir.listdir()) == 1
+        # The connection was returned to the pool.
+        send_request(cmd_def, url)
+        assert len(http_server.clients) == 1
+
+    def test_truncate(self, http_server, submitter): # pylint:disable=W0621
+        http_server.body = b'x' * 100000
+        url = 'http://127.0.0.1:%d/' % http_server.server_port
+        cmd_def = _make_definition(submitter, url)
+        spool = OutputSpool()
+        rsp = send_request(cmd_def, url, stream=True)
+        assert spool_response_body(rsp, spool, max_size=1000,
+                                   chunk_size=4096)
+        assert spool.size == 1000
+
+    def test_read_timeout(self, http_server, submitter): # pylint:disable=W0621
+        http_server.body = b'x' * 100000
+        http_server.stall = 1
+        url = 'http://127.0.0.1:%d/' % http_server.server_port
+        cmd_def = _make_definition(submitter, url, read_timeout=0.2)
+        spool = OutputSpool()
+        rsp = send_request(cmd_def, url, stream=True)
+        with pytest.raises(ResponseBodyTimeout):
+            spool_response_body(rsp, spool, chunk_size=4096)
+        assert spool.is_closed
+        # The command fails with a timeout, not with a connection error.
+        cmd = RestCommand(cmd_def, submitter, [])
+        with pytest.raises(Timeout):
+            cmd.run()
+
+    def test_incomplete_body(self, http_server, submitter): # pylint:disable=W0621
+        http_server.is_broken = True
+        url = 'http://127.0.0.1:%d/' % http_server.server_port
+        cmd_def = _make_definition(submitter, url, read_timeout=5.0)
+        spool = OutputSpool()
+        rsp = send_request(cmd_def, url, stream=True)
+        # This is not reported as a timeout.
+        with pytest.raises(ChunkedEncodingError):
+            spool_response_body(rsp, spool)
+        assert spool.is_closed
+
+    def test_is_text_content_type(self):
+        for content_type in ('text/plain', 'application/json',
+                             'application/atom+xml; charset=UTF-8'):
+            assert is_text_content_type(content_type)
+        for content_type in ('application/octet-stream', 'image/png', ''):
+            assert not is_text_content_type(content_type)
+
+    def test_rest_command(self, http_server, submitter): # pylint:disable=W0621
+        url = 'http://127.0.0.1:%d/' % http_server.server_port
+        http_server.body = u'{"text": "\u00e4"}'.encode('utf-8')
+        http_server.content_type = 'application/json; charset=utf-8'
+        cmd = RestCommand(_make_definition(submitter, url), submitter, [])
+        cmd.run()
+        assert cmd.response_body == u'{"text": "\u00e4"}'
+        assert not cmd.is_response_truncated
+        # Binary bodies are not decoded.
+        http_server.body = b'\x00\xff'
+        http_server.content_type = 'application/octet-stream'
+        cmd_def = RestCommandDefinition('get', 'GET something.', submitter,
+                                        url, 'application/octet-stream',
+                                        operation='GET')
+        cmd = RestCommand(cmd_def, submitter, [])
+        cmd.run()
+        assert cmd.response_body is None
+        assert cmd.response_spool.read() == b'\x00\xff'
@@ -0,0 +1,86 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import json
+import re
+
+from pyramid.registry import Registry
+from pyramid.response import Response
+from pyramid.testing import DummyRequest
+
+from telex.tracing import Tracer
+from telex.tracing import format_server_timing
+from telex.tracing import tracing_tween_factory
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+class TestTracing(object):
+
+    def test_spans(self):
+        trace = Tracer.start_trace('request')
+        try:
+            with Tracer.span('parse'):
+                with Tracer.span('validate', definition='echo'):
+                    pass
+            with Tracer.span('run'):
+                pass
+            with Tracer.span('run'):
+                pass
+        finally:
+            assert Tracer.end_trace() is trace
+        root, parse, validate, run = trace.spans[:4]
+        assert [span.name for span in trace.spans] \
+                == ['request', 'parse', 'validate', 'run', 'run']
+        assert root.parent_id is None
+        assert parse.parent_id == root.span_id
+        assert validate.parent_id == parse.span_id
+        assert run.parent_id == root.span_id
+        assert len(set([span.trace_id for span in trace.spans])) == 1
+        assert all([not span.duration is None for span in trace.spans])
+        header = format_server_timing(trace)
+        assert re.match(r'^parse;dur=[\d.]+, validate;dur=[\d.]+, '
+                        r'run;dur=[\d.]+, total;dur=[\d.]+$', header)
+
+    def test_no_trace(self):
+        with Tracer.span('ignored') as span:
+            assert span is None
+        assert Tracer.get_current_trace() is None
+
+    def test_tween(self, tmpdir):
+        export_path = str(tmpdir.join('traces.jsonl'))
+        registry = Registry()
+        registry.settings = {'telex.tracing.export_path': export_path}
+
+        def handler(request): # unused pylint: disable=W0613
+            with Tracer.span('process', size=3):
+                pass
+            return Response('ok')
+        tween = tracing_tween_factory(handler, registry)
+        rsp = tween(DummyRequest(path='/commands'))
+        assert rsp.headers['Server-Timing'].startswith('process;dur=')
+        assert Tracer.get_current_trace() is None
+        with open(export_path) as export_file:
+            lines = export_file.readlines()
+        assert len(lines) == 1
+        spans = json.loads(lines[0])['resourceSpans'][0]['scopeSpans'][0] \
+                                                                    ['spans']
+        assert [span['name'] for span in spans] == ['request', 'process']
+        assert len(spans[0]['traceId']) == 32
+        assert len(spans[0]['spanId']) == 16
+        assert spans[1]['parentSpanId'] == spans[0]['spanId']
+        assert dict(key='size', value=dict(intValue='3')) \
+                in spans[1]['attributes']
+        assert dict(key='http.status_code', value=dict(intValue='200')) \
+                in spans[0]['attributes']
+
+    def test_tween_disabled(self):
+        registry = Registry()
+        registry.settings = {'telex.tracing.enabled': 'false'}
+        handler = lambda request: Response('ok')
+        assert tracing_tween_factory(handler, registry) is handler
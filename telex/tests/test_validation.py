@@ -0,0 +1,111 @@
+"""
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import pytest
+
+from telex.constants import VALUE_TYPES
+from telex.entities import Parameter
+from telex.entities import ShellCommand
+from telex.entities import ShellCommandDefinition
+from telex.validation import InvalidParameterValue
+from telex.validation import format_value
+from telex.validation import make_validator
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = []
+
+
+class TestMakeValidator(object):
+
+    def test_int(self):
+        validate = make_validator('n', VALUE_TYPES.INT,
+                                  dict(min_value=1, max_value=10))
+        assert validate('5') == 5
+        assert validate(10) == 10
+        for value in ('0', '11', 'five'):
+            with pytest.raises(InvalidParameterValue):
+                validate(value)
+
+    def test_string(self):
+        validate = make_validator('s', VALUE_TYPES.STRING,
+                                  dict(min_length=2, max_length=3))
+        assert validate('abc') == 'abc'
+        for value in ('a', 'abcd'):
+            with pytest.raises(InvalidParameterValue):
+                validate(value)
+
+    def test_boolean(self):
+        validate = make_validator('b', VALUE_TYPES.BOOLEAN, {})
+        assert validate('True') is True
+        assert validate('false') is False
+        with pytest.raises(InvalidParameterValue):
+            validate('yes')
+        assert format_value(VALUE_TYPES.BOOLEAN, validate('TRUE')) == 'true'
+
+    def test_file_extensions(self):
+        validate = make_validator('f', VALUE_TYPES.FILE,
+                                  dict(extensions='.txt, csv'))
+        assert validate('data.CSV') == 'data.CSV'
+        with pytest.raises(InvalidParameterValue):
+            validate('data.xls')
+
+    def test_default_value(self):
+        validate = make_validator('n', VALUE_TYPES.INT,
+                                  dict(default_value='3'))
+        assert validate.default_value == '3'
+        with pytest.raises(InvalidParameterValue):
+            make_validator('n', VALUE_TYPES.INT,
+                           dict(default_value='3', max_value=2))
+
+
+class TestCommandValidation(object):
+
+    @pytest.fixture
+    def cmd_def(self, submitter):
+        cd = ShellCommandDefinition('validated', 'Validated command.',
+                                    submitter, 'echo')
+        pd = cd.add_parameter_definition('text', 'Text', VALUE_TYPES.STRING)
+        pd.add_parameter_option('is_mandatory', True)
+        pd.add_parameter_option('max_length', 5)
+        pd = cd.add_parameter_definition('n', 'Number', VALUE_TYPES.INT)
+        pd.add_parameter_option('default_value', '03')
+        pd = cd.add_parameter_definition('b', 'Flag', VALUE_TYPES.BOOLEAN)
+        pd.add_parameter_option('default_value', 'True')
+        return cd
+
+    def test_default_injection(self, cmd_def, submitter): # pylint:disable=W0621
+        prm = Parameter(cmd_def.parameter_definitions[0], 'hello')
+        cmd = ShellCommand.create_from_data(
+                            dict(command_definition=cmd_def,
+                                 submitter=submitter,
+                                 parameters=[prm]))
+        # The default values are converted like submitted values.
+        assert sorted([(p.parameter_definition.name, p.value)
+                       for p in cmd.parameters]) \
+                == [('b', 'true'), ('n', '3'), ('text', 'hello')]
+
+    def test_converted_value(self, cmd_def, submitter): # pylint:disable=W0621
+        prms = [Parameter(cmd_def.parameter_definitions[0], 'hello'),
+                Parameter(cmd_def.parameter_definitions[1], '007')]
+        cmd = ShellCommand.create_from_data(
+                            dict(command_definition=cmd_def,
+                                 submitter=submitter,
+                                 parameters=prms))
+        assert [p.value for p in cmd.parameters][:2] == ['hello', '7']
+
+    def test_invalid_value(self, cmd_def, submitter): # pylint:disable=W0621
+        prm = Parameter(cmd_def.parameter_definitions[0], 'too long')
+        with pytest.raises(InvalidParameterValue):
+            ShellCommand.create_from_data(dict(command_definition=cmd_def,
+                                               submitter=submitter,
+                                               parameters=[prm]))
+
+    def test_missing_mandatory(self, cmd_def, submitter): # pylint:disable=W0621
+        with pytest.raises(TypeError):
+            ShellCommand.create_from_data(dict(command_definition=cmd_def,
+                                               submitter=submitter,
+                                               parameters=[]))
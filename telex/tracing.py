@@ -0,0 +1,313 @@
+"""
+Request tracing for the telex server.
+
+The tracing tween starts a trace for every request; code running in the
+request thread adds spans for the phases of the request processing with
+:meth:`Tracer.span`. When the request is done, the span durations are
+reported in a "Server-Timing" response header and, if an export path is
+configured, the trace is appended to that file in the OpenTelemetry
+(OTLP) JSON format, one trace per line, for a collector to pick up.
+
+Spans started outside of a traced request (e.g., in worker threads) are
+ignored, so instrumented code does not need to check for an active trace.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import binascii
+from contextlib import contextmanager
+import json
+import os
+from threading import Lock
+from threading import local
+import time
+
+from pyramid.compat import native_
+from pyramid.settings import asbool
+from pyramid.tweens import INGRESS
+import transaction
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['FileSpanExporter',
+           'Span',
+           'Trace',
+           'Tracer',
+           'format_server_timing',
+           'includeme',
+           'tracing_tween_factory',
+           ]
+
+
+class Span(object):
+    """
+    Timed phase of a traced request.
+    """
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        #: Name of the span.
+        self.name = name
+        #: ID of the trace this span belongs to (32 hex digits).
+        self.trace_id = trace_id
+        #: ID of this span (16 hex digits).
+        self.span_id = _make_id(8)
+        #: ID of the parent span (`None` for the root span).
+        self.parent_id = parent_id
+        #: Dictionary of span attributes.
+        self.attributes = dict(attributes or {})
+        #: Start time (seconds since the epoch).
+        self.start = time.time()
+        #: End time (seconds since the epoch; `None` while running).
+        self.end = None
+
+    @property
+    def duration(self):
+        "Duration of the span in seconds (`None` while running)."
+        return None if self.end is None else self.end - self.start
+
+    def finish(self):
+        """
+        Ends this span.
+        """
+        if self.end is None:
+            self.end = time.time()
+
+    def to_otlp(self):
+        """
+        Returns this span as OTLP JSON span object.
+        """
+        data = dict(traceId=self.trace_id,
+                    spanId=self.span_id,
+                    name=self.name,
+                    # Root spans are server spans; all others are internal.
+                    kind=2 if self.parent_id is None else 1,
+                    startTimeUnixNano=str(int(self.start * 1e9)),
+                    endTimeUnixNano=str(int((self.end or self.start) * 1e9)),
+                    attributes=[dict(key=key,
+                                     value=_make_otlp_value(value))
+                                for (key, value)
+                                in sorted(self.attributes.items())])
+        if not self.parent_id is None:
+            data['parentSpanId'] = self.parent_id
+        return data
+
+
+class Trace(object):
+    """
+    Spans recorded for one request.
+    """
+    def __init__(self):
+        #: ID of this trace (32 hex digits).
+        self.trace_id = _make_id(16)
+        #: All spans of this trace in the order they were started.
+        self.spans = []
+        self.__stack = []
+
+    def start_span(self, name, attributes=None):
+        """
+        Starts a new span which is a child of the innermost running span.
+        """
+        parent_id = self.__stack[-1].span_id if self.__stack else None
+        span = Span(name, self.trace_id, parent_id=parent_id,
+                    attributes=attributes)
+        self.spans.append(span)
+        self.__stack.append(span)
+        return span
+
+    def finish_span(self, span):
+        """
+        Ends the given span (and any spans started within it which are
+        still running).
+        """
+        if span in self.__stack:
+            while self.__stack:
+                top = self.__stack.pop()
+                top.finish()
+                if top is span:
+                    break
+        else:
+            span.finish()
+
+    @property
+    def root(self):
+        "The root span."
+        return self.spans[0] if self.spans else None
+
+
+class Tracer(object):
+    """
+    Keeps track of the trace of the request processed by the current
+    thread.
+    """
+    __local = local()
+
+    @classmethod
+    def start_trace(cls, name, **attributes):
+        """
+        Starts a new trace for the current thread with a root span of the
+        given name.
+        """
+        trace = Trace()
+        trace.start_span(name, attributes)
+        cls.__local.trace = trace
+        return trace
+
+    @classmethod
+    def end_trace(cls):
+        """
+        Ends the trace of the current thread and returns it (`None` if
+        there is none).
+        """
+        trace = getattr(cls.__local, 'trace', None)
+        cls.__local.trace = None
+        if not trace is None and not trace.root is None:
+            trace.finish_span(trace.root)
+        return trace
+
+    @classmethod
+    def get_current_trace(cls):
+        """
+        Returns the trace of the current thread (`None` if there is none).
+        """
+        return getattr(cls.__local, 'trace', None)
+
+    @classmethod
+    @contextmanager
+    def span(cls, name, **attributes):
+        """
+        Context manager recording a span of the given name for its block
+        (if the current thread is tracing a request).
+        """
+        trace = cls.get_current_trace()
+        if trace is None:
+            yield None
+        else:
+            span = trace.start_span(name, attributes)
+            try:
+                yield span
+            finally:
+                trace.finish_span(span)
+
+    @classmethod
+    def trace_commit(cls):
+        """
+        Records a "commit" span for the commit of the current transaction
+        (if the current thread is tracing a request).
+        """
+        trace = cls.get_current_trace()
+        if not trace is None:
+            spans = []
+
+            def before_commit():
+                spans.append(trace.start_span('commit'))
+
+            def after_commit(success): # unused pylint: disable=W0613
+                if spans:
+                    trace.finish_span(spans[0])
+            trx = transaction.get()
+            trx.addBeforeCommitHook(before_commit)
+            trx.addAfterCommitHook(after_commit)
+
+
+class FileSpanExporter(object):
+    """
+    Appends traces to a file in the OTLP JSON format (one "resourceSpans"
+    export request per line).
+    """
+    def __init__(self, path, service_name='telex'):
+        self.path = path
+        self.service_name = service_name
+        self.__lock = Lock()
+
+    def export(self, trace):
+        """
+        Appends the given trace to the export file.
+        """
+        data = dict(resourceSpans=[
+                        dict(resource=dict(attributes=[
+                                dict(key='service.name',
+                                     value=_make_otlp_value(
+                                                    self.service_name))]),
+                             scopeSpans=[
+                                dict(scope=dict(name='telex.tracing'),
+                                     spans=[span.to_otlp()
+                                            for span in trace.spans])])])
+        line = json.dumps(data, sort_keys=True) + '\n'
+        with self.__lock:
+            with open(self.path, 'a') as export_file:
+                export_file.write(line)
+
+
+def format_server_timing(trace):
+    """
+    Returns a "Server-Timing" header value for the given trace with the
+    total duration of the spans of each name (in milliseconds), in the
+    order the names first occur; the root span is reported as "total".
+    """
+    durations = {}
+    names = []
+    for span in trace.spans[1:]:
+        if span.duration is None:
+            continue
+        if not span.name in durations:
+            names.append(span.name)
+            durations[span.name] = 0.0
+        durations[span.name] += span.duration
+    entries = ['%s;dur=%.1f' % (name, durations[name] * 1000)
+               for name in names]
+    if not trace.root is None and not trace.root.duration is None:
+        entries.append('total;dur=%.1f' % (trace.root.duration * 1000))
+    return ', '.join(entries)
+
+
+def tracing_tween_factory(handler, registry):
+    """
+    Creates a tween tracing each request (see the module documentation).
+    Configured with the "telex.tracing.*" application settings.
+    """
+    settings = registry.settings or {}
+    if not asbool(settings.get('telex.tracing.enabled', True)):
+        return handler
+    do_add_header = asbool(settings.get('telex.tracing.server_timing', True))
+    export_path = settings.get('telex.tracing.export_path')
+    exporter = None if not export_path else FileSpanExporter(export_path)
+
+    def tracing_tween(request):
+        Tracer.start_trace('request', **{'http.method': request.method,
+                                         'http.target': request.path})
+        try:
+            response = handler(request)
+        finally:
+            trace = Tracer.end_trace()
+        trace.root.attributes['http.status_code'] = response.status_int
+        if do_add_header:
+            response.headers['Server-Timing'] = format_server_timing(trace)
+        if not exporter is None:
+            exporter.export(trace)
+        return response
+    return tracing_tween
+
+
+def includeme(config):
+    """
+    Pyramid include hook adding the tracing tween (as outermost tween, so
+    the commit of the request transaction is traced as well).
+    """
+    config.add_tween('telex.tracing.tracing_tween_factory', under=INGRESS)
+
+
+def _make_id(num_bytes):
+    return native_(binascii.hexlify(os.urandom(num_bytes)))
+
+
+def _make_otlp_value(value):
+    if isinstance(value, bool):
+        result = dict(boolValue=value)
+    elif isinstance(value, int):
+        result = dict(intValue=str(value))
+    elif isinstance(value, float):
+        result = dict(doubleValue=value)
+    else:
+        result = dict(stringValue=str(value))
+    return result
@@ -0,0 +1,35 @@
+"""
+Utilities for the telex server.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from pyramid.threadlocal import get_current_registry
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['get_setting',
+           ]
+
+
+def get_setting(name, default=None, converter=None):
+    """
+    Looks up the application setting with the given name in the current
+    registry.
+
+    :param str name: Setting name (e.g., "telex.jobs.max_workers").
+    :param default: Value to return if the setting was not configured.
+    :param converter: Optional callable to convert the (string) setting
+      value with.
+    """
+    settings = get_current_registry().settings or {}
+    value = settings.get(name)
+    if value is None:
+        result = default
+    elif not converter is None:
+        result = converter(value)
+    else:
+        result = value
+    return result
@@ -0,0 +1,141 @@
+"""
+Parameter validation for the telex server.
+
+This file is part of the telex project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+import datetime
+import os
+import re
+
+from pyramid.compat import string_types
+
+from everest.representers.converters import SimpleConverterRegistry
+from telex.constants import VALUE_TYPES
+
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['InvalidParameterValue',
+           'VALUE_TYPE_MAP',
+           'format_value',
+           'make_validator',
+           ]
+
+
+#: Dictionary mapping value types to their Python types.
+VALUE_TYPE_MAP = {VALUE_TYPES.BOOLEAN : bool,
+                  VALUE_TYPES.INT : int,
+                  VALUE_TYPES.DOUBLE : float,
+                  VALUE_TYPES.DATETIME : datetime.datetime,
+                  }
+
+
+class InvalidParameterValue(ValueError):
+    """
+    Raised when a parameter value does not satisfy the parameter
+    definition.
+    """
+    pass
+
+
+def make_validator(name, value_type, options):
+    """
+    Compiles a validator for values of the parameter with the given name,
+    value type and options (as returned by
+    :attr:`telex.entities.ParameterDefinition.options`).
+
+    The validator is a callable taking a value (usually a representation
+    string) and returning it converted to the Python type for the value
+    type; it raises :class:`InvalidParameterValue` if the conversion fails
+    or the value violates any of the length, range or extension options.
+    The `default_value` option is converted and checked once, at compile
+    time, and is available as the `default_value` attribute of the
+    validator (`None` if no default was configured).
+    """
+    convert = _make_converter(name, value_type)
+    checks = []
+    min_length = options.get('min_length')
+    if not min_length is None:
+        checks.append((lambda value: len(value) >= min_length,
+                       'at least %d characters long' % min_length))
+    max_length = options.get('max_length')
+    if not max_length is None:
+        checks.append((lambda value: len(value) <= max_length,
+                       'at most %d characters long' % max_length))
+    min_value = options.get('min_value')
+    if not min_value is None:
+        checks.append((lambda value: value >= min_value,
+                       'at least %s' % min_value))
+    max_value = options.get('max_value')
+    if not max_value is None:
+        checks.append((lambda value: value <= max_value,
+                       'at most %s' % max_value))
+    extensions = options.get('extensions')
+    if extensions:
+        exts = frozenset([ext.lstrip('.').lower()
+                          for ext in re.split(r'[\s,;]+', extensions)
+                          if ext])
+        checks.append((lambda value:
+                            os.path.splitext(value)[1][1:].lower() in exts,
+                       'a file name with one of the extensions %s'
+                       % ', '.join(sorted(exts))))
+
+    def validate(value):
+        py_value = convert(value)
+        for check, requirement in checks:
+            if not check(py_value):
+                raise InvalidParameterValue('The value "%s" for parameter '
+                                            '"%s" is invalid; it must be %s.'
+                                            % (value, name, requirement))
+        return py_value
+    default_value = options.get('default_value')
+    if not default_value is None:
+        validate(default_value)
+    validate.default_value = default_value
+    return validate
+
+
+def _make_converter(name, value_type):
+    py_type = VALUE_TYPE_MAP.get(value_type)
+    if py_type is bool:
+        def convert(value):
+            if isinstance(value, string_types):
+                lower_value = value.lower()
+                if not lower_value in ('true', 'false'):
+                    raise InvalidParameterValue(
+                        'The value "%s" for parameter "%s" is not a valid '
+                        'boolean ("true" or "false").' % (value, name))
+                value = lower_value == 'true'
+            return value
+    elif not py_type is None:
+        def convert(value):
+            if isinstance(value, string_types):
+                try:
+                    value = SimpleConverterRegistry.\
+                                convert_from_representation(value, py_type)
+                except Exception: # catch Exception pylint: disable=W0703
+                    raise InvalidParameterValue(
+                        'The value "%s" for parameter "%s" is not a valid '
+                        '%s value.' % (value, name, value_type.lower()))
+            return value
+    else:
+        def convert(value):
+            if not isinstance(value, string_types):
+                value = str(value)
+            return value
+    return convert
+
+
+def format_value(value_type, value):
+    """
+    Returns the canonical string representation of the given value (as
+    returned by a validator for the given value type), e.g., "true" for
+    `True` or "7" for 7. String values are returned as they are.
+    """
+    py_type = VALUE_TYPE_MAP.get(value_type)
+    if not py_type is None and isinstance(value, py_type):
+        value = SimpleConverterRegistry.convert_to_representation(value,
+                                                                  py_type)
+    return value
@@ -6,32 +6,201 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 Created on Jul 7, 2014.
 """
+import datetime
+from functools import reduce as func_reduce
+from functools import wraps
+import json
 import os
-import re
 
+from pyramid.encode import urlencode
+from pyramid.httpexceptions import HTTPAccepted
+from pyramid.httpexceptions import HTTPBadGateway
 from pyramid.httpexceptions import HTTPBadRequest
+from pyramid.httpexceptions import HTTPConflict
 from pyramid.httpexceptions import HTTPCreated
+from pyramid.httpexceptions import HTTPError
+from pyramid.httpexceptions import HTTPGatewayTimeout
+from pyramid.httpexceptions import HTTPNotFound
+from pyramid.httpexceptions import HTTPOk
+from pyramid.httpexceptions import HTTPPartialContent
+from pyramid.httpexceptions import HTTPRequestRangeNotSatisfiable
+from pyramid.httpexceptions import HTTPServiceUnavailable
 from pyramid.httpexceptions import HTTPUnauthorized
 from pyramid.httpexceptions import status_map
+from pyramid.response import Response
+from pyramid.settings import asbool
 from pyramid.threadlocal import get_current_registry
+from requests.exceptions import ChunkedEncodingError
 from requests.exceptions import ConnectionError
+from requests.exceptions import ContentDecodingError
+from requests.exceptions import Timeout
 
 from everest.interfaces import IUserMessageNotifier
+from everest.mime import TextPlainMime
+from everest.querying.utils import get_filter_specification_factory
+from everest.querying.utils import get_order_specification_factory
+from everest.representers.converters import SimpleConverterRegistry
+from everest.representers.interfaces import IMemberDataElement
+from everest.resources.base import Link
+from everest.resources.utils import get_member_class
+from everest.resources.utils import provides_member_resource
+from everest.url import UrlPartsConverter
+from everest.utils import get_traceback
+from everest.views.base import ResourceView
+from everest.views.deletemember import DeleteMemberView
+from everest.views.getcollection import GetCollectionView
 from everest.views.postcollection import PostCollectionView
+from everest.views.putmember import PutMemberView
 from pyramid.httpexceptions import HTTPInternalServerError
+from telex.cache import CommandDefinitionCache
+from telex.cache import SingleFlight
+from telex.cache import get_result_cache
+from telex.capture import CaptureRegistry
+from telex.capture import StoredOutput
+from telex.constants import COMMAND_STATUS
+from telex.diagnostics import DiagnosticsClassifier
+from telex.engine import RestCallTimeout
+from telex.engine import get_rest_engine
+from telex.interfaces import IShellCommand
+from telex.jobs import CommandJob
+from telex.jobs import JobQueueFull
+from telex.jobs import get_job_queue
+from telex.jobs import run_commands
+from telex.metrics import MetricsRegistry
+from telex.paging import decode_cursor
+from telex.paging import encode_cursor
+from telex.paging import make_keyset_specification
+from telex.profiling import Profiler
+from telex.profiling import ProfilerBusy
+from telex.tracing import Tracer
+from telex.utils import get_setting
 
 
 __docformat__ = 'reStructuredText en'
-__all__ = ['PostRestCommandCollectionView',
+__all__ = ['DeleteCommandDefinitionMemberView',
+           'DeleteShellCommandMemberView',
+           'GetCommandCollectionView',
+           'GetShellCommandOutputView',
+           'PostCommandBatchView',
+           'PostCommandDefinitionCollectionView',
+           'PostParameterDefinitionCollectionView',
+           'PostRestCommandCollectionView',
            'PostShellCommandCollectionView',
+           'PutCommandDefinitionMemberView',
+           'delete_profiler_view',
+           'get_cache_statistics_view',
+           'get_metrics_view',
+           'get_profiler_view',
+           'post_profiler_view',
            ]
 
 
-class PostShellCommandCollectionView(PostCollectionView):
-    error_line_pat = re.compile('.* error .*', re.I)
-    warning_line_pat = re.compile('.* warn .*', re.I)
+def _get_command_definition_name(resource):
+    # Returns the command definition name of a single command resource (an
+    # empty string for collections).
+    if provides_member_resource(resource):
+        cmd_def_name = resource.get_entity().command_definition.name
+    else:
+        cmd_def_name = ''
+    return cmd_def_name
 
+
+def _timed(get_result):
+    # Records the time taken by the given _get_result method of a command
+    # collection view, labelled by view and (for single commands) command
+    # definition.
+    @wraps(get_result)
+    def wrapper(view, resource):
+        cmd_def_name = _get_command_definition_name(resource)
+        histogram = MetricsRegistry.histogram(
+                                'telex_view_seconds',
+                                'Time taken to process command requests.',
+                                ('view', 'definition'))
+        with histogram.time(view=view.__class__.__name__,
+                            definition=cmd_def_name):
+            return get_result(view, resource)
+    return wrapper
+
+
+def _profiled(get_result):
+    # Marks the given _get_result method of a command collection view as
+    # profiled code (see telex.profiling).
+    @wraps(get_result)
+    def wrapper(view, resource):
+        with Profiler.profile(_get_command_definition_name(resource)):
+            return get_result(view, resource)
+    return wrapper
+
+
+class _TracingViewMixin(object):
+    """
+    Mixin for modifying views recording tracing spans for parsing the
+    request data, processing it, committing the transaction and rendering
+    the response.
+    """
+    def _extract_request_data(self):
+        with Tracer.span('parse'):
+            return super(_TracingViewMixin, self)._extract_request_data()
+
+    def _process_request_data(self, data):
+        Tracer.trace_commit()
+        with Tracer.span('process'):
+            return super(_TracingViewMixin, self)._process_request_data(data)
+
+    def _update_response_body(self, resource):
+        with Tracer.span('render'):
+            return super(_TracingViewMixin, self) \
+                        ._update_response_body(resource)
+
+
+class PostShellCommandCollectionView(_TracingViewMixin, PostCollectionView):
+    #: Class used to classify the error output of failed commands.
+    diagnostics_classifier_class = DiagnosticsClassifier
+
+    @_timed
+    @_profiled
     def _get_result(self, resource):
+        if self._is_async_request():
+            result = self.__submit(resource)
+        else:
+            result = self.__run(resource)
+        return result
+
+    def _is_async_request(self):
+        """
+        Checks if the client asked for asynchronous execution, either with
+        a "Prefer: respond-async" header or with an "async" query parameter.
+        """
+        prefs = [pref.strip().lower()
+                 for pref in self.request.headers.get('Prefer', '').split(',')]
+        return 'respond-async' in prefs \
+               or asbool(self.request.GET.get('async', False))
+
+    def __submit(self, resource):
+        # Queues the command for execution in a worker thread once the
+        # current transaction has been committed and responds with a 202
+        # Accepted; the Location header points to the new command member
+        # which can be polled for the execution status.
+        job_queue = get_job_queue()
+        try:
+            job_queue.reserve()
+        except JobQueueFull:
+            http_exc = HTTPServiceUnavailable(
+                            'The command queue is full. Please try again '
+                            'later.',
+                            headers=[('Retry-After',
+                                      str(job_queue.retry_after))])
+            result = self.request.get_response(http_exc)
+        else:
+            resource.get_entity().status = COMMAND_STATUS.QUEUED
+            job = CommandJob(get_current_registry(), IShellCommand,
+                             resource.__name__)
+            job_queue.submit_on_commit(job)
+            self.request.response.status = self._status(HTTPAccepted)
+            result = PostCollectionView._get_result(self, resource)
+        return result
+
+    def __run(self, resource):
         cmd_ent = resource.get_entity()
         # This is where the command is run.
         cmd_ent.run()
@@ -40,17 +209,18 @@ class PostShellCommandCollectionView(PostCollectionView):
             # We attempt to extract error and warning messages from the
             # stderr output. If only warnings were encountered, the user has
             # the option to submit again ignoring the warnings.
-            # An output line is considered an error if it contains a
-            # " ERROR " marker and a warning if it contains a " WARN " marker
-            # (both case insensitive).
-            errors = []
-            warnings = []
-            for line in cmd_ent.error_string.split(os.linesep):
-                if self.error_line_pat.match(line):
-                    errors.append(line)
-                    break
-                elif self.warning_line_pat.match(line):
-                    warnings.append(line)
+            # The patterns marking error and warning lines can be
+            # configured for each command definition; the stderr output is
+            # scanned incrementally up to the first error line.
+            classifier = self.diagnostics_classifier_class \
+                                .from_command_definition(
+                                            cmd_ent.command_definition)
+            spool = cmd_ent.error_spool
+            if not spool is None:
+                with Tracer.span('classify'):
+                    classifier.classify(spool)
+            errors = classifier.errors
+            warnings = classifier.warnings
             if len(errors) == 0 and len(warnings) > 0:
                 if self._enable_messaging:
                     # This triggers a 307 response.
@@ -61,19 +231,19 @@ class PostShellCommandCollectionView(PostCollectionView):
                 else:
                     msg = os.linesep.join(
                             ['The command triggered the following '
-                             'warnings:',
-                             cmd_ent.error_string])
+                             'warnings:'] + warnings)
                     http_exc = HTTPBadRequest(msg)
                     result = self.request.get_response(http_exc)
             else:
-                err_msg = len(errors) == 0 and cmd_ent.error_string \
+                # Only excerpts of large outputs are put in the message.
+                err_msg = len(errors) == 0 and _get_excerpt(spool) \
                           or os.linesep.join(errors)
                 msg = os.linesep.join(
                             ['The command terminated abnormally.',
                              'Error output:',
                              err_msg,
                              'Standard output:',
-                             cmd_ent.output_string])
+                             _get_excerpt(cmd_ent.output_spool)])
                 http_exc = HTTPBadRequest(msg)
                 result = self.request.get_response(http_exc)
         if result is None:
@@ -81,13 +251,312 @@ class PostShellCommandCollectionView(PostCollectionView):
         return result
 
 
-class PostRestCommandCollectionView(PostCollectionView):
+class GetCommandCollectionView(GetCollectionView):
+    """
+    View for GET requests on command collections.
+
+    Pages through the commands in `(timestamp, id)` order using keyset
+    paging: the "next" link of a full page carries a "cursor" query
+    parameter encoding the key of the last command on the page, and the
+    next page selects the commands following that key (so deep pages do
+    not get slower). The page size is set with the "size" query parameter
+    and the order with "direction" ("asc", the default, or "desc").
+
+    The commands can be filtered with the query parameters in
+    :attr:`filter_parameters` (in addition to the "q" filter expression).
+    Requests with "start" or "sort" query parameters are served with
+    everest's offset paging instead.
+    """
+    #: Map of filter query parameter names to (resource attribute name,
+    #: filter specification factory method name, value type) tuples.
+    filter_parameters = dict(submitter=('submitter', 'create_equal_to',
+                                        str),
+                             command_definition=('command_definition.name',
+                                                 'create_equal_to', str),
+                             exit_code=('exit_code', 'create_equal_to',
+                                        int),
+                             since=('timestamp',
+                                    'create_greater_than_or_equal_to',
+                                    datetime.datetime),
+                             until=('timestamp', 'create_less_than',
+                                    datetime.datetime),
+                             )
+
+    def _prepare_resource(self):
+        params = self.request.params
+        if 'start' in params or 'sort' in params:
+            result = GetCollectionView._prepare_resource(self)
+        else:
+            try:
+                size = self.__page_collection()
+            except ValueError as err:
+                raise HTTPBadRequest(str(err))
+            self.context.add_link(_UrlLink(self.context, 'self',
+                                           self.request.url,
+                                           title=self.context.title))
+            members = list(self.context)
+            if len(members) == size:
+                last_cmd = members[-1].get_entity()
+                next_params = self.request.GET.copy()
+                next_params['cursor'] = encode_cursor(last_cmd.timestamp,
+                                                      last_cmd.id)
+                next_url = '%s?%s' % (self.request.path_url,
+                                      urlencode(list(next_params.items())))
+                self.context.add_link(_UrlLink(self.context, 'next',
+                                               next_url,
+                                               title=self.context.title))
+            result = self.context
+        return result
+
+    def __page_collection(self):
+        params = self.request.params
+        spec_fac = get_filter_specification_factory()
+        specs = []
+        query_string = params.get('q')
+        if not query_string is None:
+            specs.append(
+                UrlPartsConverter.make_filter_specification(query_string))
+        member_cls = get_member_class(self.context)
+        for name in sorted(self.filter_parameters.keys()):
+            value = params.get(name)
+            if value is None:
+                continue
+            attr_name, factory_name, value_type = self.filter_parameters[name]
+            if not hasattr(member_cls, attr_name.split('.')[0]):
+                raise ValueError('Can not filter %s by "%s".'
+                                 % (self.context.title, name))
+            if not value_type is str:
+                try:
+                    value = SimpleConverterRegistry.\
+                                convert_from_representation(value, value_type)
+                except Exception: # catch Exception pylint: disable=W0703
+                    raise ValueError('Invalid value "%s" for filter "%s".'
+                                     % (value, name))
+            specs.append(getattr(spec_fac, factory_name)(attr_name, value))
+        direction = params.get('direction', 'asc')
+        if not direction in ('asc', 'desc'):
+            raise ValueError('Invalid direction "%s" (valid directions: '
+                             'asc, desc).' % direction)
+        is_descending = direction == 'desc'
+        cursor = params.get('cursor')
+        if not cursor is None:
+            timestamp, cmd_id = decode_cursor(cursor)
+            specs.append(make_keyset_specification(spec_fac, timestamp,
+                                                   cmd_id,
+                                                   descending=is_descending))
+        if specs:
+            self.context.filter = func_reduce(spec_fac.create_conjunction,
+                                              specs)
+        ord_fac = get_order_specification_factory()
+        if is_descending:
+            create_order = ord_fac.create_descending
+        else:
+            create_order = ord_fac.create_ascending
+        self.context.order = ord_fac.create_conjunction(
+                                                create_order('timestamp'),
+                                                create_order('id'))
+        try:
+            size = int(params.get('size', self.context.default_limit))
+        except ValueError:
+            raise ValueError('Invalid page size.')
+        if size < 1:
+            raise ValueError('The page size must be positive.')
+        if not self.context.max_limit is None:
+            size = min(size, self.context.max_limit)
+        self.context.slice = slice(0, size)
+        return size
+
+
+class _UrlLink(Link):
+    """
+    Link with a fixed URL (rather than one generated from the linked
+    resource).
+    """
+    def __init__(self, linked_resource, rel, url, **kw):
+        Link.__init__(self, linked_resource, rel, **kw)
+        self.__url = url
+
+    @property
+    def href(self):
+        return self.__url
+
+
+class GetShellCommandOutputView(ResourceView):
+    """
+    View for GET requests on the "output" and "errors" sub-resources of
+    shell command members.
+
+    Streams the standard output (or standard error) of the command while
+    it is being produced, either as chunked plain text or, if the client
+    accepts "text/event-stream", as Server-Sent Events. Clients can resume
+    at a byte offset passed with the "offset" query parameter, a "Range"
+    header or (for event streams) a "Last-Event-ID" header; with
+    "follow=false", only the output available at the time of the request
+    is sent.
+    """
+    #: Maximum number of bytes to send per chunk.
+    chunk_size = 64 * 1024
+    #: Maximum number of seconds to wait for new output before checking
+    #: again.
+    poll_interval = 1.0
+    #: MIME type string for Server-Sent Events.
+    event_stream_mime_type_string = 'text/event-stream'
+
+    def __call__(self):
+        self._logger.debug('Request URL: %s.', self.request.url)
+        try:
+            result = self.__get_response()
+        except HTTPError as http_exc:
+            result = self.request.get_response(http_exc)
+        except Exception as err: # catch Exception pylint: disable=W0703
+            result = self._handle_unknown_exception(str(err),
+                                                    get_traceback())
+        return result
+
+    def __get_response(self):
+        cmd_ent = self.context.get_entity()
+        do_get_errors = self.request.view_name == 'errors'
+        # While the command is running, we stream from its live capture.
+        capture = CaptureRegistry.get(cmd_ent.id)
+        if not capture is None:
+            spool = capture.errors if do_get_errors else capture.output
+        else:
+            spool = cmd_ent.error_spool if do_get_errors \
+                    else cmd_ent.output_spool
+        mime_type_strings = [TextPlainMime.mime_type_string,
+                             self.event_stream_mime_type_string]
+        is_event_stream = \
+            self.request.accept.best_match(mime_type_strings) \
+                        == self.event_stream_mime_type_string
+        response = self.request.response
+        if is_event_stream:
+            response.content_type = self.event_stream_mime_type_string
+            response.headers['Cache-Control'] = 'no-cache'
+        else:
+            response.content_type = TextPlainMime.mime_type_string
+            response.charset = 'utf-8'
+        if spool is None:
+            # The command has not been started yet.
+            response.headers['Retry-After'] = str(int(self.poll_interval))
+            response.body = b''
+        else:
+            offset = self.__get_offset(spool, is_event_stream)
+            follow = asbool(self.request.GET.get('follow', True))
+            size = None
+            if not self.request.range is None and not is_event_stream \
+               and spool.is_closed:
+                # The size of the output is known - send a proper partial
+                # response.
+                if offset >= spool.size:
+                    raise HTTPRequestRangeNotSatisfiable(
+                                headers=[('Content-Range',
+                                          'bytes */%d' % spool.size)])
+                # The range end is exclusive; it is not set for suffix and
+                # open ranges.
+                end = self.request.range.end
+                if end is None or end > spool.size:
+                    end = spool.size
+                size = end - offset
+                response.status_int = HTTPPartialContent.code
+                response.headers['Content-Range'] = \
+                        'bytes %d-%d/%d' % (offset, end - 1, spool.size)
+                response.content_length = size
+            chunks = spool.iter_chunks(offset=offset, follow=follow,
+                                       chunk_size=self.chunk_size,
+                                       poll_interval=self.poll_interval,
+                                       align_lines=is_event_stream,
+                                       size=size)
+            if is_event_stream:
+                response.app_iter = self.__iter_events(spool, chunks)
+            else:
+                response.app_iter = (data for (data, _) in chunks)
+        return response
+
+    def __get_offset(self, spool, is_event_stream):
+        last_event_id = self.request.headers.get('Last-Event-ID')
+        offset_param = self.request.GET.get('offset')
+        try:
+            if is_event_stream and not last_event_id is None:
+                offset = int(last_event_id)
+            elif not offset_param is None:
+                offset = int(offset_param)
+            elif not self.request.range is None:
+                offset = self.request.range.start
+                if offset < 0:
+                    # Suffix range ("bytes=-N").
+                    offset = max(0, spool.size + offset)
+            else:
+                offset = 0
+        except ValueError:
+            raise HTTPBadRequest('Invalid output offset.')
+        if offset < 0:
+            raise HTTPBadRequest('The output offset must not be negative.')
+        return offset
+
+    def __iter_events(self, spool, chunks):
+        for data, offset in chunks:
+            lines = data.decode('utf-8', 'replace').rstrip('\n').split('\n')
+            event = 'id: %d\n%s\n' \
+                    % (offset,
+                       ''.join(['data: %s\n' % line for line in lines]))
+            yield event.encode('utf-8')
+        if spool.is_closed:
+            # Tell the client that the output is complete so it does not
+            # reconnect.
+            yield b'event: end\ndata: \n\n'
+
+
+class DeleteShellCommandMemberView(DeleteMemberView):
+    """
+    View for DELETE requests on shell command members.
+
+    A command that is running or waiting to be run is cancelled (killing
+    the process group of a running command) and kept so its final status
+    can be inspected; any other command is deleted.
+    """
+    def __call__(self):
+        self._logger.debug('DELETE Request received on %s' % self.request.url)
+        try:
+            is_cancelled = self.context.get_entity().cancel()
+        except Exception as err: # catch Exception pylint: disable=W0703
+            response = self._handle_unknown_exception(str(err),
+                                                      get_traceback())
+        else:
+            if is_cancelled:
+                response = self.request.get_response(HTTPOk())
+            else:
+                response = DeleteMemberView.__call__(self)
+        return response
+
+
+class PostRestCommandCollectionView(_TracingViewMixin, PostCollectionView):
+    """
+    View for POST requests on REST command collections.
 
+    Runs the new command and responds with its representation or, if the
+    "proxy" query parameter is set, with the body of the REST call response
+    as is (with the content type of the REST call response).
+    """
+    @_timed
     def _get_result(self, resource):
         cmd_ent = resource.get_entity()
-        # This is where the command is run.
+        # This is where the command is run. The remote call is made by the
+        # shared REST engine which limits the concurrent calls per host.
+        # The outcome of the call is applied to the command here, in the
+        # thread owning its repository session.
+        call = get_rest_engine().submit(cmd_ent)
         try:
-            cmd_ent.run()
+            call.wait(get_setting('telex.rest.timeout', None, float),
+                      cancel_on_timeout=True)
+        except (Timeout, RestCallTimeout), exc:
+            # The REST service did not respond within the timeouts
+            # configured for the command definition (or the engine did not
+            # get to the call in time) or stopped sending the response body.
+            # This needs to come first as connect timeouts are connection
+            # errors, too.
+            msg = 'Timeout waiting for REST service.' \
+                  '\nException details: ' + str(exc)
+            result = self.request.get_response(HTTPGatewayTimeout(msg))
         except ConnectionError, exc:
             # The REST service was unavailable (connection refused). The best
             # thing we can do is to report this as an internal server error on
@@ -95,6 +564,11 @@ class PostRestCommandCollectionView(PostCollectionView):
             msg = 'Could  not connect to REST service.' \
                   '\nException details: ' + str(exc)
             result = self.request.get_response(HTTPInternalServerError(msg))
+        except (ChunkedEncodingError, ContentDecodingError), exc:
+            # The REST service sent an incomplete or invalid response body.
+            msg = 'Invalid response from REST service.' \
+                  '\nException details: ' + str(exc)
+            result = self.request.get_response(HTTPBadGateway(msg))
         else:
             if cmd_ent.response_status_code == HTTPUnauthorized.code:
                 result = self.request.get_response(HTTPUnauthorized())
@@ -105,6 +579,278 @@ class PostRestCommandCollectionView(PostCollectionView):
                           % (http_exc_cls.code, http_exc_cls.title)
                 http_exc = HTTPBadRequest(message)
                 result = self.request.get_response(http_exc)
+            elif asbool(self.request.GET.get('proxy', False)):
+                result = self.__proxy_response(cmd_ent)
             else:
                 result = PostCollectionView._get_result(self, resource)
-        return result
\ No newline at end of file
+        return result
+
+    def __proxy_response(self, cmd_ent):
+        # The spooled body is passed through in chunks without decoding.
+        rsp = self.request.response
+        content_type = cmd_ent.response_headers.get('content-type')
+        if not content_type is None:
+            rsp.headers['Content-Type'] = content_type
+        if cmd_ent.is_response_truncated:
+            rsp.headers['X-Telex-Truncated'] = 'true'
+        spool = cmd_ent.response_spool
+        rsp.app_iter = (chunk for (chunk, _) in
+                        spool.iter_chunks(follow=False))
+        rsp.content_length = spool.size
+        return rsp
+
+
+class PostCommandBatchView(_TracingViewMixin, PostCollectionView):
+    """
+    View for POST requests on the "batch" sub-resource of command
+    collections.
+
+    The client POSTs a collection representation holding the commands to
+    run. All commands are parsed and added to the collection in one
+    transaction before any of them is run; the commands are then run
+    concurrently (shell commands in at most "telex.batch.max_workers"
+    threads, REST commands by the shared REST engine). The response holds
+    a representation of the new commands with their individual status and
+    exit code; a failing command does not fail the batch.
+    """
+    def _get_response_mime_type(self):
+        # The base view takes a view name to be a representer name; the
+        # "batch" view negotiates its response MIME type like the unnamed
+        # collection views.
+        view_name = self.request.view_name
+        self.request.view_name = ''
+        try:
+            return PostCollectionView._get_response_mime_type(self)
+        finally:
+            self.request.view_name = view_name
+
+    @_timed
+    def _get_result(self, resource):
+        if provides_member_resource(resource):
+            cmd_ents = [resource.get_entity()]
+        else:
+            cmd_ents = [mb.get_entity() for mb in resource]
+        # The commands need IDs for the process and capture registries.
+        self.context.get_aggregate().sync_with_repository()
+        # Load everything the commands need here - the repository session
+        # must not be used concurrently from the worker threads, which only
+        # run the command processes.
+        for cmd_ent in cmd_ents:
+            list(cmd_ent.command_definition.parameter_definitions)
+            for prm in cmd_ent.parameters:
+                list(prm.parameter_definition.parameter_options)
+        rest_engine = get_rest_engine()
+        rest_calls = [rest_engine.submit(cmd_ent) for cmd_ent in cmd_ents
+                      if cmd_ent.command_type == 'REST']
+        run_commands([cmd_ent for cmd_ent in cmd_ents
+                      if cmd_ent.command_type != 'REST'],
+                     get_setting('telex.batch.max_workers', 8, int))
+        rest_engine.wait_all(rest_calls,
+                             timeout=get_setting('telex.rest.timeout', None,
+                                                 float))
+        return PostCollectionView._get_result(self, resource)
+
+
+class PostCommandDefinitionCollectionView(PostCollectionView):
+    """
+    View for POST requests on command definition collections.
+
+    Rejects shell command definitions with invalid diagnostics patterns.
+    """
+    def _process_request_data(self, data):
+        _check_diagnostics_patterns(data)
+        return PostCollectionView._process_request_data(self, data)
+
+
+class PutCommandDefinitionMemberView(PutMemberView):
+    """
+    View for PUT (and FAKE_PUT) requests on command definition members.
+
+    Rejects shell command definitions with invalid diagnostics patterns
+    and invalidates the cached definition snapshot.
+    """
+    def _process_request_data(self, data):
+        _check_diagnostics_patterns(data)
+        CommandDefinitionCache.invalidate(self.context.name)
+        result = PutMemberView._process_request_data(self, data)
+        # The update may have renamed the definition.
+        CommandDefinitionCache.invalidate(self.context.name)
+        return result
+
+
+class DeleteCommandDefinitionMemberView(DeleteMemberView):
+    """
+    View for DELETE requests on command definition members.
+
+    Invalidates the cached definition snapshot.
+    """
+    def __call__(self):
+        CommandDefinitionCache.invalidate(self.context.name)
+        return DeleteMemberView.__call__(self)
+
+
+class PostParameterDefinitionCollectionView(PostCollectionView):
+    """
+    View for POST requests on parameter definition collections.
+
+    Invalidates the cached snapshots of the command definitions the new
+    parameter definitions were added to.
+    """
+    def _get_result(self, resource):
+        if provides_member_resource(resource):
+            prm_defs = [resource.get_entity()]
+        else:
+            prm_defs = [mb.get_entity() for mb in resource]
+        for prm_def in prm_defs:
+            if not prm_def.command_definition is None:
+                CommandDefinitionCache.invalidate(
+                                        prm_def.command_definition.name)
+        return PostCollectionView._get_result(self, resource)
+
+
+def _check_diagnostics_patterns(data):
+    # Checks the diagnostics patterns in the given command definition
+    # request data before the definitions are created or updated;
+    # otherwise, an invalid pattern only shows when a command fails.
+    if IMemberDataElement.providedBy(data): # pylint: disable=E1101
+        mb_data_els = [data]
+    else:
+        mb_data_els = data.get_members()
+    for mb_data_el in mb_data_els:
+        patterns = {}
+        for name in ('error_pattern', 'warning_pattern'):
+            try:
+                patterns[name] = mb_data_el.get_attribute(name)
+            except AttributeError:
+                pass
+        try:
+            DiagnosticsClassifier(**patterns)
+        except ValueError as err:
+            raise HTTPBadRequest(str(err))
+
+
+def _get_excerpt(spool):
+    # Returns the output held by the given spool, leaving out all but the
+    # head and the tail of large outputs.
+    if spool is None:
+        text = ''
+    elif spool.size <= 2 * spool.PREVIEW_SIZE:
+        text = spool.getvalue()
+    else:
+        text = spool.head \
+               + StoredOutput.TRUNCATION_MARKER \
+                    % (spool.size - 2 * spool.PREVIEW_SIZE) \
+               + spool.tail
+    return text
+
+
+def _make_json_response(data, status=None):
+    # The "json" renderer is taken by the everest resource renderer, so
+    # plain data are rendered here.
+    rsp = Response(json.dumps(data, sort_keys=True),
+                   content_type='application/json', charset='utf-8')
+    rsp.headers['Cache-Control'] = 'no-cache'
+    if not status is None:
+        rsp.status = status
+    return rsp
+
+
+def get_cache_statistics_view(context, request): # unused pylint: disable=W0613
+    """
+    View for GET requests on the "cache-statistics" service view returning
+    the statistics of the command definition cache, of the result cache
+    and of the coalescing of identical running commands as JSON.
+    """
+    return _make_json_response(
+                dict(definitions=CommandDefinitionCache.get_statistics(),
+                     results=get_result_cache().get_statistics(),
+                     in_flight=SingleFlight.get_statistics()))
+
+
+def get_metrics_view(context, request): # unused pylint: disable=W0613
+    """
+    View for GET requests on the "metrics" service view returning all
+    metrics in the Prometheus text exposition format.
+    """
+    # Passing headers to the response constructor would drop the content
+    # type.
+    rsp = Response(MetricsRegistry.render(),
+                   content_type='text/plain', charset='utf-8')
+    rsp.headers['Cache-Control'] = 'no-cache'
+    return rsp
+
+
+def post_profiler_view(context, request): # unused pylint: disable=W0613
+    """
+    View for POST requests on the "profiler" service view starting a
+    sampling profiler session.
+
+    The session ends after the number of seconds given with the "seconds"
+    query parameter or after the number of profiled requests given with
+    the "requests" query parameter, whichever comes first, and never runs
+    longer than "telex.profiling.max_duration" seconds. With the
+    "definition" query parameter, only commands of the command definition
+    with that name are profiled; "interval" sets the number of seconds
+    between samples. Responds with the session status as JSON.
+    """
+    params = request.params
+    max_duration = get_setting('telex.profiling.max_duration', 300, float)
+    try:
+        duration = min(float(params.get('seconds', max_duration)),
+                       max_duration)
+        max_requests = params.get('requests')
+        if not max_requests is None:
+            max_requests = int(max_requests)
+        interval = float(params.get('interval',
+                                    get_setting('telex.profiling.interval',
+                                                0.005, float)))
+        session = Profiler.start(duration=duration,
+                                 max_requests=max_requests,
+                                 definition=params.get('definition'),
+                                 interval=interval)
+    except ValueError as err:
+        raise HTTPBadRequest(str(err))
+    except ProfilerBusy as err:
+        raise HTTPConflict(str(err))
+    return _make_json_response(session.get_status(),
+                               status=HTTPAccepted().status)
+
+
+def get_profiler_view(context, request): # unused pylint: disable=W0613
+    """
+    View for GET requests on the "profiler" service view returning the
+    status of the current (or last) profiling session as JSON or, with the
+    "format" query parameter, the samples collected so far, either as
+    collapsed stacks ("collapsed") or as pstats file ("pstats").
+    """
+    session = Profiler.get_session()
+    if session is None:
+        raise HTTPNotFound('No profiling session was started.')
+    fmt = request.params.get('format')
+    if fmt is None:
+        result = _make_json_response(session.get_status())
+    elif fmt == 'collapsed':
+        result = Response(session.to_collapsed(),
+                          content_type='text/plain', charset='utf-8')
+    elif fmt == 'pstats':
+        result = Response(session.to_pstats(),
+                          content_type='application/octet-stream')
+        result.headers['Content-Disposition'] = \
+                                    'attachment; filename="telex.pstats"'
+    else:
+        raise HTTPBadRequest('Invalid profile format "%s" (valid formats: '
+                             'collapsed, pstats).' % fmt)
+    result.headers['Cache-Control'] = 'no-cache'
+    return result
+
+
+def delete_profiler_view(context, request): # unused pylint: disable=W0613
+    """
+    View for DELETE requests on the "profiler" service view stopping the
+    active profiling session. Responds with the session status as JSON;
+    the samples remain available until the next session is started.
+    """
+    session = Profiler.stop()
+    if session is None:
+        raise HTTPNotFound('No profiling session was started.')
+    return _make_json_response(session.get_status())